@@ -336,6 +336,7 @@ def run_full_pipeline(pdf_file, extraction_method):
                     step_7_critique,
                 )
                 from deep_reading_steps.semantic_router import generate_semantic_index
+                from deep_reading_steps.semantic_index import index_exists as semantic_index_exists
 
                 sections = common.load_md_sections(md_path)
                 paper_basename = basename
@@ -350,8 +351,7 @@ def run_full_pipeline(pdf_file, extraction_method):
                 os.environ["DEEP_READING_OUTPUT_DIR"] = paper_output_dir
 
                 # Semantic index
-                index_path = os.path.join(paper_output_dir, "semantic_index.json")
-                if not os.path.exists(index_path):
+                if not semantic_index_exists(paper_output_dir):
                     full_text = "\n\n".join(sections.values())
                     log_q.put("正在生成语义索引...")
                     generate_semantic_index(full_text, paper_output_dir)
@@ -537,6 +537,7 @@ def run_batch(folder_path, skip_processed, extraction_method="PaddleOCR (远程A
     def worker():
         try:
             with OutputCapture(log_q):
+                from paper_classifier import pdf_page_count
                 from smart_scholar_lib import SmartScholar
                 from state_manager import StateManager
 
@@ -615,11 +616,16 @@ def run_batch(folder_path, skip_processed, extraction_method="PaddleOCR (远程A
                             progress_data.append([bname, "-", "失败(提取)", f"{time.time() - t0:.1f}s"])
                             continue
 
-                        # 2. Classify
-                        with open(extracted_md_path, "r", encoding="utf-8") as f:
-                            preview = f.read(5000)
-                        paper_type = scholar.classify_paper(preview)
-                        log_q.put(f"  分类结果: {paper_type}")
+                        # 2. Classify（本地启发式优先，仅模糊论文调用 LLM；结果记入状态库）
+                        classification = state_mgr.get_classification(pdf_path)
+                        if not classification:
+                            with open(extracted_md_path, "r", encoding="utf-8") as f:
+                                content = f.read()
+                            classification = scholar.classify_paper_detailed(content, pdf_page_count(pdf_path))
+                            state_mgr.record_classification(pdf_path, classification)
+                        paper_type = classification["type"]
+                        log_q.put(f"  分类结果: {paper_type} "
+                                  f"({classification['method']}, 置信度 {classification['confidence']:.2f})")
 
                         if paper_type == "IGNORE":
                             state_mgr.mark_completed(pdf_path, None, "IGNORE")
@@ -1081,14 +1087,15 @@ def run_md_reading(mode, md_file, folder_path, skip_processed):
 # Tab 6: 中文重述 backend
 # ---------------------------------------------------------------------------
 
-def run_translation(mode, single_file, folder_path, model, max_chars, extraction_method, max_workers):
+def run_translation(mode, single_file, folder_path, model, max_chars, extraction_method, max_workers,
+                    compact_glossary=False):
     """
     Generator → yields (log, progress_df, total_status, preview, download_file).
     Handles single-file (PDF or MD) and batch-folder modes.
     """
     import pandas as pd
     from translation_pipeline import (
-        translate_md_file, translate_pdf_file, collect_files,
+        translate_md_file, translate_pdf_file, translate_folder, collect_files,
     )
 
     _cancel_event.clear()
@@ -1097,6 +1104,7 @@ def run_translation(mode, single_file, folder_path, model, max_chars, extraction
     progress_data = []   # [[filename, type, status, elapsed], ...]
     result = {}
     max_chars = int(max_chars)
+    glossary_mode = "compact" if compact_glossary else "full"
 
     empty_df = pd.DataFrame(columns=["文件名", "类型", "状态", "耗时"])
 
@@ -1117,9 +1125,48 @@ def run_translation(mode, single_file, folder_path, model, max_chars, extraction
             yield f"文件夹中未找到 PDF 或 MD 文件：{folder_path}", empty_df, "", "", None
             return
 
+    def folder_worker():
+        # All files share one global pool of max_workers; rows are updated in place.
+        row_of = {}
+        for fpath in files:
+            ftype = "PDF" if fpath.lower().endswith(".pdf") else "MD"
+            row_of[fpath] = len(progress_data)
+            progress_data.append([os.path.basename(fpath), ftype, "排队", ""])
+
+        def on_progress(fpath, st):
+            stage = st["stage"]
+            if stage == "重述" and st["total"]:
+                stage = f"重述 {st['done']}/{st['total']}"
+            elif stage == "失败":
+                stage = f"失败: {st['error']}"
+            row = progress_data[row_of[fpath]]
+            row[2] = stage
+            row[3] = f"{st['elapsed']:.1f}s" if st["stage"] != "排队" else ""
+
+        results = translate_folder(
+            files,
+            log_cb=log_q.put,
+            cancel_check=lambda: _cancel_event.is_set(),
+            progress_cb=on_progress,
+            model=model,
+            max_chars=max_chars,
+            extraction_method=extraction_method,
+            max_workers=int(max_workers),
+            glossary_mode=glossary_mode,
+        )
+        for r in results:
+            if r["status"] == "完成":
+                result["last_cn"] = r["cn_path"]
+                result["last_glossary"] = r["glossary_path"]
+
     def worker():
         try:
             with OutputCapture(log_q):
+                if mode != "单文件":
+                    folder_worker()
+                    log_q.put("\n中文重述处理完成。")
+                    return
+
                 for idx, fpath in enumerate(files, 1):
                     if _cancel_event.is_set():
                         log_q.put("已被用户取消。")
@@ -1144,6 +1191,7 @@ def run_translation(mode, single_file, folder_path, model, max_chars, extraction
                                 max_chars=max_chars,
                                 extraction_method=extraction_method,
                                 max_workers=int(max_workers),
+                                glossary_mode=glossary_mode,
                             )
                         else:
                             cn_path, glossary_path = translate_md_file(
@@ -1153,6 +1201,7 @@ def run_translation(mode, single_file, folder_path, model, max_chars, extraction
                                 model=model,
                                 max_chars=max_chars,
                                 max_workers=int(max_workers),
+                                glossary_mode=glossary_mode,
                             )
 
                         elapsed = f"{time.time() - t0:.1f}s"
@@ -1185,8 +1234,10 @@ def run_translation(mode, single_file, folder_path, model, max_chars, extraction
     while True:
         done = _drain_queue(log_q, log_lines)
         log_text = "\n".join(log_lines)
-        df = pd.DataFrame(progress_data, columns=["文件名", "类型", "状态", "耗时"]) if progress_data else empty_df
-        total = f"已处理: {len(progress_data)} / {len(files)} 个文件"
+        rows = [list(r) for r in progress_data]
+        df = pd.DataFrame(rows, columns=["文件名", "类型", "状态", "耗时"]) if rows else empty_df
+        finished = sum(1 for r in rows if r[2] in ("完成", "已取消") or r[2].startswith("失败"))
+        total = f"已处理: {finished} / {len(files)} 个文件"
         yield log_text, df, total, "", None
         if done:
             break
@@ -1517,6 +1568,11 @@ def build_ui():
                         value=5,
                         info="同时发出的 API 请求数，deepseek-chat 建议 5，reasoner 建议 3",
                     )
+                    tr_compact = gr.Checkbox(
+                        label="精简词典注入",
+                        value=False,
+                        info="每块只附带其中出现的术语，减少提示词长度；补译步骤仍用完整词典",
+                    )
                     tr_btn = gr.Button("开始重述", variant="primary")
                     tr_cancel = gr.Button("停止", variant="stop")
 
@@ -1545,7 +1601,7 @@ def build_ui():
 
             tr_btn.click(
                 fn=run_translation,
-                inputs=[tr_mode, tr_file, tr_folder, tr_model, tr_chunk, tr_extract, tr_workers],
+                inputs=[tr_mode, tr_file, tr_folder, tr_model, tr_chunk, tr_extract, tr_workers, tr_compact],
                 outputs=[tr_log, tr_df, tr_total, tr_preview, tr_dl],
             )
             tr_cancel.click(fn=_request_cancel, outputs=[tr_total])
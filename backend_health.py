@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Extraction backend health tracking with a circuit breaker.
+
+extract_with_fallback() used to try the remote PaddleOCR API for every PDF
+and wait through all retries and timeouts before falling back, even when the
+endpoint had been down for the whole batch.  BackendHealth records outcomes
+per backend ("remote", "local") in a small SQLite file shared by every
+process of a batch run (paddleocr_pipeline.py is launched once per PDF):
+
+- closed:    backend is used normally; consecutive failures are counted
+- open:      after failure_threshold consecutive failures the backend is
+             skipped outright until cooldown seconds have passed
+- half_open: after the cooldown exactly one caller is let through as a
+             probe (with fewer retries); success closes the breaker, failure
+             re-opens it with a doubled cooldown (capped at max_cooldown)
+
+Usage:
+    python backend_health.py status [--db paddleocr_md/.backend_health.db]
+    python backend_health.py reset [remote|local]
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_NAME = ".backend_health.db"
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_COOLDOWN = 300        # seconds an open breaker skips the backend
+DEFAULT_MAX_COOLDOWN = 3600
+DEFAULT_PROBE_TIMEOUT = 900   # a probe not reported back within this is presumed dead
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS backends (
+    name        TEXT PRIMARY KEY,
+    state       TEXT NOT NULL DEFAULT 'closed',
+    failures    INTEGER NOT NULL DEFAULT 0,
+    cooldown    REAL NOT NULL DEFAULT 0,
+    opened_at   REAL NOT NULL DEFAULT 0,
+    probe_at    REAL NOT NULL DEFAULT 0,
+    last_error  TEXT,
+    updated_at  REAL
+);
+"""
+
+
+def default_db_path(out_dir: str = "paddleocr_md") -> str:
+    """$PADDLEOCR_HEALTH_DB, else <out_dir>/.backend_health.db."""
+    return os.getenv("PADDLEOCR_HEALTH_DB") or os.path.join(out_dir, DEFAULT_DB_NAME)
+
+
+class BackendHealth:
+    """
+    Cross-process circuit breaker.  Every call opens a short connection and
+    runs its read-modify-write inside BEGIN IMMEDIATE, so concurrent batch
+    workers never both win the half-open probe.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        cooldown: float = DEFAULT_COOLDOWN,
+        max_cooldown: float = DEFAULT_MAX_COOLDOWN,
+        probe_timeout: float = DEFAULT_PROBE_TIMEOUT,
+    ):
+        self.db_path = os.path.abspath(db_path)
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown = float(cooldown)
+        self.max_cooldown = float(max_cooldown)
+        self.probe_timeout = float(probe_timeout)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _connect(self):
+        """Short connection in an immediate (write-locked) transaction."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _row(self, conn, name: str) -> sqlite3.Row:
+        conn.execute("INSERT OR IGNORE INTO backends (name) VALUES (?)", (name,))
+        return conn.execute("SELECT * FROM backends WHERE name = ?", (name,)).fetchone()
+
+    def allow(self, name: str) -> Tuple[bool, bool]:
+        """
+        Should the caller try backend *name* now?
+
+        Returns (allowed, is_probe).  is_probe is True for the single caller
+        admitted while the breaker is half-open; it should keep the attempt
+        cheap (few retries) and must report the outcome.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = self._row(conn, name)
+            state = row["state"]
+            if state == CLOSED:
+                return True, False
+            if state == OPEN and now - row["opened_at"] < row["cooldown"]:
+                return False, False
+            if state == HALF_OPEN and now - row["probe_at"] < self.probe_timeout:
+                return False, False
+            # Cooldown elapsed (or the previous probe never reported): this caller probes
+            conn.execute(
+                "UPDATE backends SET state = ?, probe_at = ?, updated_at = ? WHERE name = ?",
+                (HALF_OPEN, now, now, name),
+            )
+            return True, True
+
+    def record_success(self, name: str) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            row = self._row(conn, name)
+            if row["state"] != CLOSED:
+                logger.info(f"Backend '{name}' recovered, circuit closed")
+            conn.execute(
+                "UPDATE backends SET state = ?, failures = 0, cooldown = 0, last_error = NULL, "
+                "updated_at = ? WHERE name = ?",
+                (CLOSED, now, name),
+            )
+
+    def record_failure(self, name: str, error: str = "", trip: bool = False) -> None:
+        """
+        Count a failure.  The breaker opens after failure_threshold consecutive
+        failures, immediately for a failed probe, or when *trip* is set (the
+        backend is unusable, e.g. not installed).
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = self._row(conn, name)
+            failures = row["failures"] + 1
+            state, cooldown, opened_at = row["state"], row["cooldown"], row["opened_at"]
+            if state == HALF_OPEN:
+                state, opened_at = OPEN, now
+                cooldown = min(self.max_cooldown, max(self.cooldown, cooldown * 2))
+            elif trip or failures >= self.failure_threshold:
+                if state != OPEN:
+                    opened_at = now
+                state = OPEN
+                cooldown = max(cooldown, self.cooldown)
+            if state == OPEN and row["state"] != OPEN:
+                logger.warning(
+                    f"Backend '{name}' circuit open after {failures} failure(s); "
+                    f"skipping it for {cooldown:.0f}s ({error[:120]})"
+                )
+            conn.execute(
+                "UPDATE backends SET state = ?, failures = ?, cooldown = ?, opened_at = ?, "
+                "last_error = ?, updated_at = ? WHERE name = ?",
+                (state, failures, cooldown, opened_at, error[:500], now, name),
+            )
+
+    def release(self, name: str) -> None:
+        """End a probe whose outcome says nothing about the backend (e.g. a corrupt PDF)."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE backends SET state = ?, opened_at = 0, updated_at = ? "
+                "WHERE name = ? AND state = ?",
+                (OPEN, time.time(), name, HALF_OPEN),
+            )
+
+    def status(self) -> List[Dict]:
+        with self._connect() as conn:
+            return [dict(r) for r in conn.execute("SELECT * FROM backends ORDER BY name")]
+
+    def reset(self, name: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            if name:
+                conn.execute("DELETE FROM backends WHERE name = ?", (name,))
+            else:
+                conn.execute("DELETE FROM backends")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Extraction backend circuit breaker state")
+    parser.add_argument("--db", default=default_db_path(), help="SQLite state file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Show breaker state per backend")
+    p_reset = sub.add_parser("reset", help="Close the breaker (all backends if none given)")
+    p_reset.add_argument("name", nargs="?")
+    args = parser.parse_args()
+
+    health = BackendHealth(args.db)
+    if args.command == "status":
+        now = time.time()
+        for r in health.status():
+            remaining = max(0.0, r["opened_at"] + r["cooldown"] - now) if r["state"] == OPEN else 0.0
+            print(f"{r['name']:8s} {r['state']:9s} failures={r['failures']} "
+                  f"retry_in={remaining:.0f}s last_error={r['last_error'] or ''}")
+    elif args.command == "reset":
+        health.reset(args.name)
+        print("OK")
+
+
+if __name__ == "__main__":
+    main()
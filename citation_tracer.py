@@ -8,6 +8,8 @@ from dotenv import load_dotenv
 from openai import OpenAI
 import json_repair
 
+from reference_store import ReferenceStore, DEFAULT_DB_PATH, paper_id_from_path
+
 # Load environment variables
 load_dotenv()
 
@@ -255,6 +257,8 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("segmented_md", help="Path to full paper MD")
     parser.add_argument("references_xlsx", help="Path to references Excel")
+    parser.add_argument("--store", default=DEFAULT_DB_PATH, help="Corpus-level reference store (SQLite)")
+    parser.add_argument("--no-store", action="store_true", help="Do not write citation contexts to the store")
     args = parser.parse_args()
     
     # Setup Output
@@ -346,5 +350,14 @@ def main():
     logger.info(f"Saved trace log to {out_md}")
     logger.info(f"Saved extended Excel to {out_xlsx}")
 
+    if not args.no_store:
+        paper_id = paper_id_from_path(args.references_xlsx)
+        refs = df.fillna("").to_dict("records")
+        with ReferenceStore(args.store) as store:
+            if not store.is_ingested(paper_id):
+                store.ingest_references(paper_id, refs, source_path=os.path.abspath(args.segmented_md))
+            store.ingest_contexts(paper_id, refs, results)
+        logger.info(f"Saved citation contexts for {paper_id} to reference store")
+
 if __name__ == "__main__":
     main()
@@ -65,10 +65,10 @@ def main():
     
     # NEW: Semantic Indexing Layer (to handle bad segmentation)
     from deep_reading_steps.semantic_router import generate_semantic_index
+    from deep_reading_steps.semantic_index import index_exists
     
     # Check if index exists or needs generation
-    index_path = os.path.join(paper_output_dir, "semantic_index.json")
-    if not os.path.exists(index_path):
+    if not index_exists(paper_output_dir):
         # Extract full text for indexing
         # Note: In broken MDs, Section 1 often contains all text. 
         # We'll join all sections just to be safe.
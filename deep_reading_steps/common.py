@@ -1,11 +1,15 @@
 import os
-import json
 import logging
+import functools
 from datetime import datetime
 from openai import OpenAI
 from dotenv import load_dotenv
 import re
-import difflib
+
+from .keyword_router import EXCLUDE, EXCLUDE_KEYWORDS, QUANT_STEP_KEYWORDS, compile_router
+from .md_sections import read_md_sections
+from . import semantic_index
+from .title_index import TitleIndex
 
 # Load environment variables
 load_dotenv()
@@ -27,6 +31,26 @@ def get_deepseek_client():
         return None
     return OpenAI(api_key=DEEPSEEK_API_KEY, base_url=DEEPSEEK_BASE_URL)
 
+def load_semantic_index(output_dir):
+    """
+    The paper's semantic index (semantic_index.bin, or the legacy JSON), or None.
+    Cached per file version, so the seven steps of a paper share one load.
+    """
+    stamps = []
+    for name in (semantic_index.BIN_NAME, semantic_index.JSON_NAME):
+        try:
+            st = os.stat(os.path.join(output_dir, name))
+            stamps.append((name, st.st_mtime_ns, st.st_size))
+        except OSError:
+            pass
+    if not stamps:
+        return None
+    return _load_semantic_index(os.path.abspath(output_dir), tuple(stamps))
+
+@functools.lru_cache(maxsize=8)
+def _load_semantic_index(output_dir, stamps):
+    return semantic_index.load_index(output_dir)
+
 def get_combined_text_for_step(sections, assigned_titles, output_dir=None, step_id=None):
     """
     Retrieves and combines text for a list of assigned section titles.
@@ -34,24 +58,20 @@ def get_combined_text_for_step(sections, assigned_titles, output_dir=None, step_
     Priority 2: Smart Router format direct lookup (e.g., "1_Overview", "2_Theory").
     Priority 3: Traditional Section Retrieval (Fallback).
     """
-    combined_text = ""
     
-    # Priority 1: Semantic Index (JSON)
+    # Priority 1: Semantic Index (loaded once per paper, shared across steps)
     if output_dir and step_id:
-        index_path = os.path.join(output_dir, "semantic_index.json")
-        if os.path.exists(index_path):
-            try:
-                with open(index_path, 'r', encoding='utf-8') as f:
-                    index_data = json.load(f)
-                    chunks = index_data.get("chunks", [])
-                    # Filter chunks tagged with this step_id
-                    relevant_chunks = [c["text"] for c in chunks if step_id in c.get("tags", [])]
-                    
-                    if relevant_chunks:
-                        logger.info(f"Loaded {len(relevant_chunks)} chunks from Semantic Index for Step {step_id}")
-                        return "\n\n".join(relevant_chunks)
-            except Exception as e:
-                logger.error(f"Failed to load Semantic Index: {e}")
+        try:
+            index = load_semantic_index(output_dir)
+            if index is not None:
+                # Chunks tagged with this step_id, straight from the postings list
+                relevant_chunks = index.step_chunks(step_id)
+                
+                if relevant_chunks:
+                    logger.info(f"Loaded {len(relevant_chunks)} chunks from Semantic Index for Step {step_id}")
+                    return "\n\n".join(relevant_chunks)
+        except Exception as e:
+            logger.error(f"Failed to load Semantic Index: {e}")
 
     # Priority 2: Smart Router format direct lookup
     # Smart Router sections are like: "1_Overview", "2_Theory", "3_Data", etc.
@@ -72,70 +92,69 @@ def get_combined_text_for_step(sections, assigned_titles, output_dir=None, step_
                 return sections[key]
 
     # Priority 3: Traditional Section Retrieval (Fallback)
-    all_titles = list(sections.keys())
+    # Section bodies are decoded from the shared buffer once each here
+    positions = {title: idx for idx, title in enumerate(sections)}
+    all_titles = list(positions)
+    parts = []
     
     for title in assigned_titles:
-        if title not in sections:
+        if title not in positions:
             continue
             
         text = sections[title].strip()
-        combined_text += f"【{title}】\n{text}\n\n"
+        parts.append(f"【{title}】\n{text}\n\n")
         
         # Fallback Logic: If text is too short (< 100 chars), grab the next section
         if len(text) < 100:
-            try:
-                current_idx = all_titles.index(title)
-                if current_idx + 1 < len(all_titles):
-                    next_title = all_titles[current_idx + 1]
-                    next_text = sections[next_title].strip()
-                    combined_text += f"【{title} (Continued from {next_title})】\n{next_text}\n\n"
-                    logger.info(f"Fallback triggered: Appended {next_title} to {title}")
-            except ValueError:
-                pass
+            current_idx = positions[title]
+            if current_idx + 1 < len(all_titles):
+                next_title = all_titles[current_idx + 1]
+                next_text = sections[next_title].strip()
+                parts.append(f"【{title} (Continued from {next_title})】\n{next_text}\n\n")
+                logger.info(f"Fallback triggered: Appended {next_title} to {title}")
                 
+    combined_text = "".join(parts)
     if not combined_text.strip():
         combined_text = "No content found for assigned sections."
     
-    # Text Cleaning: Merge broken lines
-    # ... (rest of cleaning logic remains the same)
+    return _merge_broken_lines(combined_text)
+
+_SENTENCE_END = set('。？！.?!')
+
+def _merge_broken_lines(text):
+    """
+    Text Cleaning: Merge broken lines.
+    Real paragraph breaks (\n\n) are kept; a single newline is kept only after
+    sentence-ending punctuation, otherwise the lines are joined (no space after
+    a Chinese character, one space otherwise).
+    """
     # 1. First, temporarily replace real paragraph breaks (\n\n) with a placeholder
-    cleaned_text = combined_text.replace('\n\n', '<<PARA>>')
-    
     # 2. Split by single newline
-    lines = cleaned_text.split('\n')
     merged_lines = []
-    current_line = ""
+    current = []
     
-    for line in lines:
+    for line in text.replace('\n\n', '<<PARA>>').split('\n'):
         line = line.strip()
         if not line:
             continue
             
-        # If current line ends with a sentence-ending punctuation, assume it's a real break
-        # Otherwise, merge with next
-        if current_line:
-            # Check if previous line ended with punctuation (keep space if English, no space if Chinese)
-            if re.search(r'[。？！.?!]$', current_line):
-                 merged_lines.append(current_line)
-                 current_line = line
+        if current:
+            last = current[-1][-1]
+            if last in _SENTENCE_END:
+                merged_lines.append("".join(current))
+                current = [line]
+            elif '\u4e00' <= last <= '\u9fa5':
+                current.append(line)
             else:
-                 # Check if Chinese char (no space) or English (space)
-                 if re.search(r'[\u4e00-\u9fa5]$', current_line):
-                     current_line += line
-                 else:
-                     current_line += " " + line
+                current.append(" " + line)
         else:
-            current_line = line
+            current = [line]
             
-    if current_line:
-        merged_lines.append(current_line)
+    if current:
+        merged_lines.append("".join(current))
         
-    cleaned_text = "\n".join(merged_lines)
-    
     # 3. Restore paragraph breaks
-    cleaned_text = cleaned_text.replace('<<PARA>>', '\n\n')
-    
-    return cleaned_text
+    return "\n".join(merged_lines).replace('<<PARA>>', '\n\n')
 
 def call_deepseek(prompt, system_prompt="You are a helpful assistant."):
     # Enforce Clean Academic Output & Anti-Hallucination
@@ -169,53 +188,26 @@ def load_md_sections(md_path):
 
     Strips YAML frontmatter before parsing.
     Falls back to {"Full Text": content} if no sections found.
+    Sections are kept as offsets into one file buffer (a read-only SectionMap);
+    Smart Router files return a plain dict of the extracted step texts.
     """
     if not os.path.exists(md_path):
         logger.error(f"MD file not found: {md_path}")
         return {}
 
-    with open(md_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # Strip YAML frontmatter (---...--- at start of file)
-    content = re.sub(r'^---\n.*?\n---\n', '', content, flags=re.DOTALL)
-
-    sections = {}
-    current_section = None
-    current_text = []
-
-    # Detect Smart Router format
-    is_smart_router = "- Mode: quant" in content or "- Mode: qual" in content
-
-    for line in content.split('\n'):
-        # Match ## headers
-        if line.startswith("## "):
-            if current_section is not None:
-                sections[current_section] = "\n".join(current_text).strip()
-            current_section = line.lstrip("# ").strip()
-            current_text = []
-        # Match # headers (but not ## or ###)
-        elif line.startswith("# ") and not line.startswith("## "):
-            if current_section is not None:
-                sections[current_section] = "\n".join(current_text).strip()
-            current_section = line.lstrip("# ").strip()
-            current_text = []
-        else:
-            current_text.append(line)
-
-    if current_section is not None:
-        sections[current_section] = "\n".join(current_text).strip()
+    # Single pass over the headings; section bodies are decoded on access
+    parsed = read_md_sections(md_path, strip_text=True)
+    sections = parsed
 
     # Smart Router format: extract text from code blocks for each step
-    if is_smart_router and "- Mode: quant" in content:
+    if parsed.body_contains("- Mode: quant"):
         sections = _extract_smart_router_quant_sections(sections)
 
     # Fallback: if no sections found, put entire text into a single section
     if not sections:
-        stripped = content.strip()
-        if stripped:
+        sections = parsed.full_text_sections()
+        if sections:
             logger.warning("No section headers found, using full text as single section")
-            sections["Full Text"] = stripped
 
     return sections
 
@@ -311,19 +303,22 @@ def smart_chunk(text, max_tokens=8000):
     return chunks
 
 def find_section_with_fallback(sections, keywords, fallback_keywords=None):
-    context_text = ""
-    found_primary = False
+    # 主关键词与 fallback 关键词编译进同一个自动机，每个标题只扫描一次
+    router = compile_router({"primary": keywords, "fallback": fallback_keywords or []})
+    primary_text = ""
+    fallback_text = ""
     
     for title, text in sections.items():
-        if any(kw in title for kw in keywords):
-            context_text += f"【{title}】\n{text}\n\n"
-            found_primary = True
-    
-    if not found_primary and fallback_keywords:
+        groups = router.route(title)
+        if "primary" in groups:
+            primary_text += f"【{title}】\n{text}\n\n"
+        if "fallback" in groups:
+            fallback_text += f"【{title}】\n{text}\n\n"
+    
+    context_text = primary_text
+    if not primary_text and fallback_keywords:
         logger.warning(f"未找到主要关键词 {keywords}，尝试 fallback: {fallback_keywords}")
-        for title, text in sections.items():
-            if any(kw in title for kw in fallback_keywords):
-                context_text += f"【{title}】\n{text}\n\n"
+        context_text = fallback_text
     
     if not context_text:
         logger.warning(f"未找到匹配 {keywords} 或 {fallback_keywords} 的章节")
@@ -467,12 +462,13 @@ def _llm_routing(section_titles: list) -> dict:
         
         # 转换并校验 Key
         validated_routing = {i: [] for i in range(1, 8)}
+        title_index = TitleIndex(section_titles)
         for step_str, titles in raw_routing.items():
             step_id = int(step_str)
             if 1 <= step_id <= 7:
                 for t in titles:
                     # 模糊匹配校验：找到最接近的真实标题
-                    real_title = _fuzzy_match_title(t, section_titles)
+                    real_title = _fuzzy_match_title(t, section_titles, title_index)
                     if real_title:
                         if real_title not in validated_routing[step_id]:
                             validated_routing[step_id].append(real_title)
@@ -482,51 +478,31 @@ def _llm_routing(section_titles: list) -> dict:
         logger.error(f"LLM Routing parsing failed: {e}")
         return {}
 
-def _fuzzy_match_title(target, candidates):
+def _fuzzy_match_title(target, candidates, index=None):
     """
     在 candidates 中找到与 target 最相似的标题。
     用于处理 LLM 可能产生的细微标点或空格差异。
+    批量校验时传入预先构建的 TitleIndex，避免每次查找都重新规范化全部候选。
     """
-    if target in candidates:
-        return target
-        
-    # 尝试去标点去空格匹配
-    def normalize(s):
-        return re.sub(r'\s+|[^\w\u4e00-\u9fa5]', '', s).lower()
-        
-    target_norm = normalize(target)
-    for cand in candidates:
-        if normalize(cand) == target_norm:
-            return cand
-            
-    # 使用 difflib 找最相似
-    matches = difflib.get_close_matches(target, candidates, n=1, cutoff=0.8)
-    return matches[0] if matches else None
+    if index is None:
+        index = TitleIndex(candidates)
+    return index.resolve(target)
 
 def _rule_based_routing(section_titles: list) -> dict:
     """
     增强的本地规则路由（双语 + 多标签）
+    
+    关键词库见 keyword_router.QUANT_STEP_KEYWORDS / EXCLUDE_KEYWORDS，
+    所有步骤的关键词编译成一个自动机，每个标题只扫描一次。
     """
     routing = {i: [] for i in range(1, 8)}
-    
-    # 关键词库 (Lower case for matching)
-    keywords = {
-        1: ["abstract", "introduction", "overview", "preface", "摘要", "引言", "绪论", "问题的提出", "研究背景"],
-        2: ["literature", "theory", "hypothesis", "background", "framework", "文献", "理论", "假说", "假设", "背景", "框架", "机理", "逻辑"],
-        3: ["data", "sample", "source", "material", "design", "数据", "样本", "来源", "资料", "设计"],
-        4: ["variable", "measure", "indicator", "descriptive", "definition", "design", "变量", "测度", "测量", "指标", "描述", "定义", "设计"],
-        5: ["model", "method", "strategy", "identification", "equation", "design", "模型", "方法", "策略", "识别", "方程", "设计"],
-        6: ["result", "finding", "empirical", "analysis", "discussion", "结果", "发现", "实证", "分析", "回归", "检验"],
-        7: ["conclusion", "limitation", "policy", "implication", "future", "discussion", "结论", "局限", "不足", "政策", "启示", "展望", "结语"]
-    }
-    
-    exclude_keywords = ["reference", "参考文献", "appendix", "附录", "acknowledgement", "致谢"]
+    router = compile_router(QUANT_STEP_KEYWORDS, EXCLUDE_KEYWORDS)
 
     for title in section_titles:
-        title_lower = title.lower()
+        scores = router.scores(title)
         
         # 跳过排除项
-        if any(kw in title_lower for kw in exclude_keywords):
+        if EXCLUDE in scores:
             continue
             
         # 特殊处理：无标题引言 (Preface / 空标题)
@@ -534,18 +510,10 @@ def _rule_based_routing(section_titles: list) -> dict:
             routing[1].append(title)
             continue
             
-        # 多标签匹配
-        matched_any = False
-        for step, kws in keywords.items():
-            if any(kw in title_lower for kw in kws):
-                if title not in routing[step]:
-                    routing[step].append(title)
-                matched_any = True
-        
-        # 如果没匹配上任何步骤，根据位置放入
-        if not matched_any:
-            # 暂时不处理，留给位置兜底
-            pass
+        # 多标签匹配；没匹配上任何步骤的标题留给位置兜底
+        for step in scores:
+            if title not in routing[step]:
+                routing[step].append(title)
             
     return routing
 
@@ -0,0 +1,169 @@
+"""
+章节路由关键词引擎
+
+_rule_based_routing、find_section_with_fallback、两个社会科学分析器的
+get_combined_text、SmartSegmentRouter 的 _fallback_classification /
+_detect_paper_type 原先都对每个标题做 `any(kw in title_lower for kw in kws)`
+的嵌套循环。KeywordRouter 把所有步骤/层级的关键词一次编译成一个
+Aho-Corasick 自动机，对每个标题只扫描一遍，返回所有命中的分组及得分
+（命中的不同关键词个数）。
+
+匹配语义与原先一致：小写后的子串匹配（"iv" 也会命中 "derivative"），
+分组顺序即声明顺序。相同关键词集合的路由器在进程内只编译一次。
+"""
+
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+# QUANT 七步法（deep_reading_steps.common._rule_based_routing）
+QUANT_STEP_KEYWORDS = {
+    1: ["abstract", "introduction", "overview", "preface", "摘要", "引言", "绪论", "问题的提出", "研究背景"],
+    2: ["literature", "theory", "hypothesis", "background", "framework", "文献", "理论", "假说", "假设", "背景", "框架", "机理", "逻辑"],
+    3: ["data", "sample", "source", "material", "design", "数据", "样本", "来源", "资料", "设计"],
+    4: ["variable", "measure", "indicator", "descriptive", "definition", "design", "变量", "测度", "测量", "指标", "描述", "定义", "设计"],
+    5: ["model", "method", "strategy", "identification", "equation", "design", "模型", "方法", "策略", "识别", "方程", "设计"],
+    6: ["result", "finding", "empirical", "analysis", "discussion", "结果", "发现", "实证", "分析", "回归", "检验"],
+    7: ["conclusion", "limitation", "policy", "implication", "future", "discussion", "结论", "局限", "不足", "政策", "启示", "展望", "结语"],
+}
+
+# QUAL 四层金字塔（social_science_analyzer / social_science_analyzer_v2）
+QUAL_LAYER_KEYWORDS = {
+    "L1_Context": ["abstract", "introduction", "background", "摘要", "引言", "背景", "绪论", "问题提出"],
+    "L2_Theory": ["literature", "theory", "theoretical", "文献", "综述", "理论", "基础", "研究现状"],
+    "L3_Logic": ["method", "result", "finding", "case", "analysis", "方法", "设计", "案例", "结果", "分析", "实证", "模型", "路径", "机制"],
+    "L4_Value": ["discussion", "conclusion", "implication", "讨论", "结论", "启示", "展望", "建议", "结语"],
+}
+
+# 不参与路由的章节
+EXCLUDE_KEYWORDS = ["reference", "参考文献", "appendix", "附录", "acknowledgement", "致谢"]
+
+EXCLUDE = "__exclude__"
+
+
+class KeywordRouter:
+    """多组关键词的 Aho-Corasick 自动机（线程安全，构建后只读）。"""
+
+    def __init__(self, groups: Dict[Hashable, Iterable[str]], exclude: Iterable[str] = ()):
+        self.groups: List[Hashable] = list(groups.keys())
+        self._keywords: List[str] = []
+        keyword_groups: Dict[str, List[Hashable]] = {}
+        for group, keywords in list(groups.items()) + [(EXCLUDE, exclude)]:
+            for kw in keywords:
+                kw = kw.lower()
+                if not kw:
+                    continue
+                if kw not in keyword_groups:
+                    keyword_groups[kw] = []
+                    self._keywords.append(kw)
+                if group not in keyword_groups[kw]:
+                    keyword_groups[kw].append(group)
+        self._keyword_groups = [keyword_groups[kw] for kw in self._keywords]
+        self._build()
+
+    def _build(self) -> None:
+        # goto[node][char] -> node; out[node] -> 关键词编号
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[List[int]] = [[]]
+        for idx, kw in enumerate(self._keywords):
+            node = 0
+            for ch in kw:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(idx)
+
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def _matched(self, text: str) -> List[int]:
+        """单次扫描：text 中出现的关键词编号（去重，按首次出现顺序）。"""
+        node, found, seen = 0, [], set()
+        goto, fail, out = self._goto, self._fail, self._out
+        for ch in text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for idx in out[node]:
+                if idx not in seen:
+                    seen.add(idx)
+                    found.append(idx)
+        return found
+
+    def matched_keywords(self, text: str) -> List[str]:
+        """text 中出现的所有关键词（去重，按首次出现顺序）。"""
+        return [self._keywords[idx] for idx in self._matched(text)]
+
+    def scores(self, text: str) -> Dict[Hashable, int]:
+        """
+        一次扫描得到 {分组: 命中的不同关键词个数}，只含命中的分组，按声明顺序。
+        命中排除词时返回 {EXCLUDE: n}（调用方通常直接跳过该标题）。
+        """
+        counts: Dict[Hashable, int] = {}
+        for idx in self._matched(text):
+            for group in self._keyword_groups[idx]:
+                counts[group] = counts.get(group, 0) + 1
+        if EXCLUDE in counts:
+            return {EXCLUDE: counts[EXCLUDE]}
+        return {g: counts[g] for g in self.groups if g in counts}
+
+    def route(self, text: str) -> List[Hashable]:
+        """命中的分组（声明顺序）；命中排除词时为空。"""
+        return [g for g in self.scores(text) if g != EXCLUDE]
+
+    def first(self, text: str) -> Optional[Hashable]:
+        """声明顺序中第一个命中的分组。"""
+        groups = self.route(text)
+        return groups[0] if groups else None
+
+    def is_excluded(self, text: str) -> bool:
+        return EXCLUDE in self.scores(text)
+
+    def route_titles(self, titles: Sequence[str]) -> Dict[Hashable, List[str]]:
+        """{分组: [命中的标题...]}（多标签，排除词命中的标题跳过）。"""
+        routing: Dict[Hashable, List[str]] = {g: [] for g in self.groups}
+        for title in titles:
+            for group in self.route(title):
+                if title not in routing[group]:
+                    routing[group].append(title)
+        return routing
+
+
+_routers: Dict[Tuple, KeywordRouter] = {}
+
+
+def compile_router(groups: Dict[Hashable, Iterable[str]], exclude: Iterable[str] = ()) -> KeywordRouter:
+    """相同关键词集合返回同一个已编译的路由器。"""
+    key = (tuple((g, tuple(kws)) for g, kws in groups.items()), tuple(exclude))
+    router = _routers.get(key)
+    if router is None:
+        router = _routers[key] = KeywordRouter(groups, exclude)
+    return router
+
+
+def keyword_matcher(keywords: Iterable[str]) -> KeywordRouter:
+    """单组关键词的路由器（用于"标题是否包含任一关键词"）。"""
+    return compile_router({"match": list(keywords)})
+
+
+def route_sections(sections: Dict[str, str], router: KeywordRouter) -> Dict[Hashable, str]:
+    """按章节标题一次扫描，把每个分组命中的章节正文依次拼接（空标题/空正文跳过）。"""
+    combined: Dict[Hashable, List[str]] = {g: [] for g in router.groups}
+    for title, text in sections.items():
+        if not title or not text:
+            continue
+        for group in router.route(title):
+            combined[group].append(text + "\n")
+    return {g: "".join(parts) for g, parts in combined.items()}
@@ -0,0 +1,128 @@
+"""
+Markdown 章节单遍解析
+
+common.load_md_sections（QUANT）与 social_science_analyzer_v2.load_segmented_md
+（QUAL）原先各自读入整个文件、用 DOTALL 正则剥离 frontmatter、split 成行列表，
+再为每个章节 join 出一份字符串副本。这里统一为：
+
+- iter_sections：在 bytes / mmap 上单遍扫描标题行，产出
+  (标题, 层级, 正文起点, 正文终点)，偏移均为字节偏移
+- SectionMap：只读 Mapping，所有章节正文都是同一个共享缓冲区上的偏移，
+  访问时才解码（QUANT 去首尾空白，QUAL 保持原样）
+- read_md_sections：两个加载器共用的入口
+
+标题判定与原先逐行逻辑一致：以 "# " 或 "## " 开头的行（### 不算），标题文本为
+line.lstrip("# ").strip()；重复标题后者覆盖前者；第一个标题之前的内容不计入章节。
+"""
+
+import mmap
+import re
+from typing import Dict, Iterator, Mapping, Tuple, Union
+
+Buffer = Union[bytes, mmap.mmap]
+
+_RE_HEADING = re.compile(rb'^(#{1,2}) [^\n]*', re.MULTILINE)
+
+
+def load_buffer(path: str, use_mmap: bool = False) -> Buffer:
+    """
+    读入文件为一个共享缓冲区。默认一次性读入 bytes；use_mmap=True 时只读映射
+    （Windows 上映射期间文件无法被替换，所以不作为默认）。换行按文本模式统一为 \n。
+    """
+    with open(path, 'rb') as f:
+        if use_mmap:
+            try:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # 空文件无法映射
+                return b''
+        else:
+            buf = f.read()
+    if buf.find(b'\r') != -1:
+        # 与文本模式读取一致：\r\n 与单独的 \r 都视为换行（此时只能复制一份）
+        buf = buf[:].replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    return buf
+
+
+def frontmatter_end(buf: Buffer) -> int:
+    """YAML frontmatter（开头的 ---...---）之后的字节偏移，没有时为 0。"""
+    if buf[:4] != b'---\n':
+        return 0
+    end_idx = buf.find(b'\n---\n', 4)
+    return end_idx + 5 if end_idx != -1 else 0
+
+
+def iter_sections(buf: Buffer, start: int = 0) -> Iterator[Tuple[str, int, int, int]]:
+    """
+    单遍扫描 buf[start:] 中的 # / ## 标题。
+
+    产出 (标题, 层级, 正文起点, 正文终点)：正文不含标题行本身及前后换行；
+    终点 < 起点表示标题后紧跟下一个标题（或文件结束），即没有任何正文行。
+    """
+    pending = None
+    for match in _RE_HEADING.finditer(buf, start):
+        if pending is not None:
+            yield pending + (match.start() - 1,)
+        title = match.group(0).decode('utf-8').lstrip('# ').strip()
+        pending = (title, len(match.group(1)), match.end() + 1)
+    if pending is not None:
+        yield pending + (len(buf),)
+
+
+class SectionMap(Mapping):
+    """章节标题 → 正文的只读映射；正文以 (起点, 终点) 偏移保存在共享缓冲区中。"""
+
+    def __init__(self, buf: Buffer, body_start: int = 0, strip_text: bool = True):
+        self.buffer = buf
+        self.body_start = body_start
+        self.strip_text = strip_text
+        self._spans: Dict[str, Tuple[int, int, bool]] = {}
+
+    def add(self, title: str, start: int, end: int, strip_text: bool = None) -> None:
+        if strip_text is None:
+            strip_text = self.strip_text
+        self._spans[title] = (start, end, strip_text)
+
+    def span(self, title: str) -> Tuple[int, int]:
+        start, end, _ = self._spans[title]
+        return start, max(start, end)
+
+    def __getitem__(self, title: str) -> str:
+        start, end, strip_text = self._spans[title]
+        text = self.buffer[start:end].decode('utf-8') if end > start else ''
+        return text.strip() if strip_text else text
+
+    def __iter__(self):
+        return iter(self._spans)
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def body_contains(self, needle: str) -> bool:
+        """frontmatter 之后的正文是否包含 needle（用于 Smart Router 格式检测）。"""
+        return self.buffer.find(needle.encode('utf-8'), self.body_start) != -1
+
+    def full_text_sections(self) -> "SectionMap":
+        """没有任何章节时的回退：{"Full Text": 去首尾空白的全文}（全文为空时为空映射）。"""
+        fallback = SectionMap(self.buffer, self.body_start, self.strip_text)
+        if self.buffer[self.body_start:].decode('utf-8').strip():
+            fallback.add("Full Text", self.body_start, len(self.buffer), strip_text=True)
+        return fallback
+
+
+def read_md_sections(path: str, strip_text: bool = True, keep_empty: bool = True,
+                     use_mmap: bool = False) -> SectionMap:
+    """
+    解析 Markdown 文件的 # / ## 章节（frontmatter 已跳过）。
+
+    strip_text：正文是否去首尾空白（QUANT 加载器去除，QUAL 加载器保持原样）
+    keep_empty：标题后没有任何正文行时是否仍保留该章节（QUAL 加载器不保留）
+    """
+    buf = load_buffer(path, use_mmap)
+    body_start = frontmatter_end(buf)
+    sections = SectionMap(buf, body_start, strip_text)
+    for title, _level, start, end in iter_sections(buf, body_start):
+        if end < start and not keep_empty:
+            continue
+        sections.add(title, start, end)
+    return sections
@@ -0,0 +1,144 @@
+"""
+Compact on-disk format for the semantic index.
+
+semantic_index.json used to be the only format: full chunk texts inside
+pretty-printed JSON, re-opened and fully json.load()-ed by
+get_combined_text_for_step once per step (seven times per paper, nine with
+the step 4 / step 7 fallbacks) just to filter chunks by tag.
+
+semantic_index.bin is laid out as
+
+    MAGIC (8 bytes) | header length (uint32, little-endian) | header | blob
+
+where the header is compact JSON holding the chunk offsets table
+([[start, end], ...] into the blob), the chunk tags, and the step -> chunk-id
+postings list, and the blob is all chunk texts in UTF-8, back to back.
+The file is read into one bytes buffer (the chunk texts are never run
+through a JSON parser) and a chunk is only decoded when a step asks for it.
+It is deliberately not kept memory-mapped: loaded indexes are cached for the
+process, and on Windows a mapped file cannot be replaced or deleted.
+semantic_index.json is still written next to it as a debugging export, and
+indexes that only have the JSON file are loaded from it.
+"""
+
+import json
+import logging
+import os
+import struct
+from typing import Dict, Iterable, List, Optional
+
+from frontmatter_store import atomic_write
+
+logger = logging.getLogger(__name__)
+
+BIN_NAME = "semantic_index.bin"
+JSON_NAME = "semantic_index.json"
+
+MAGIC = b"SEMIDX01"
+_HEADER_LEN = struct.Struct("<I")
+
+
+class SemanticIndex:
+    """Chunk texts addressed by id, with a step -> chunk-id postings list."""
+
+    def __init__(self, blob, offsets: List[List[int]], tags: List[List[int]],
+                 postings: Dict[int, List[int]], blob_start: int = 0):
+        self._blob = blob
+        self._blob_start = blob_start
+        self.offsets = offsets
+        self.tags = tags
+        self.postings = postings
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[Dict]) -> "SemanticIndex":
+        """Build from generate_semantic_index-style dicts ({"id", "text", "tags"})."""
+        parts, offsets, tags, postings = [], [], [], {}
+        pos = 0
+        for chunk_id, chunk in enumerate(chunks):
+            data = chunk.get("text", "").encode("utf-8")
+            parts.append(data)
+            offsets.append([pos, pos + len(data)])
+            pos += len(data)
+            chunk_tags = list(chunk.get("tags", []))
+            tags.append(chunk_tags)
+            for step_id in chunk_tags:
+                if isinstance(step_id, int) and chunk_id not in postings.setdefault(step_id, []):
+                    postings[step_id].append(chunk_id)
+        return cls(b"".join(parts), offsets, tags, postings)
+
+    @classmethod
+    def from_json(cls, path: str) -> "SemanticIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_chunks(json.load(f).get("chunks", []))
+
+    @classmethod
+    def from_bin(cls, path: str) -> "SemanticIndex":
+        # Read into bytes rather than keeping a mapping open: loaded indexes are
+        # cached for the process, and on Windows a mapped file cannot be replaced
+        # or deleted (regenerating the index, removing a paper's output directory)
+        with open(path, "rb") as f:
+            buf = f.read()
+        if buf[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a semantic index file: {path}")
+        header_start = len(MAGIC) + _HEADER_LEN.size
+        (header_len,) = _HEADER_LEN.unpack_from(buf, len(MAGIC))
+        header = json.loads(buf[header_start:header_start + header_len].decode("utf-8"))
+        postings = {int(step): ids for step, ids in header["postings"].items()}
+        return cls(buf, header["offsets"], header["tags"], postings,
+                   blob_start=header_start + header_len)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def chunk_text(self, chunk_id: int) -> str:
+        start, end = self.offsets[chunk_id]
+        base = self._blob_start
+        return self._blob[base + start:base + end].decode("utf-8")
+
+    def step_chunks(self, step_id: int) -> List[str]:
+        """Texts of the chunks tagged with *step_id*, in chunk order."""
+        return [self.chunk_text(chunk_id) for chunk_id in self.postings.get(step_id, [])]
+
+    def to_json(self) -> Dict:
+        """The debugging export (same shape as the original semantic_index.json)."""
+        return {"chunks": [
+            {"id": chunk_id, "text": self.chunk_text(chunk_id), "tags": self.tags[chunk_id]}
+            for chunk_id in range(len(self))
+        ]}
+
+    def to_bytes(self) -> bytes:
+        header = json.dumps({
+            "offsets": self.offsets,
+            "tags": self.tags,
+            "postings": {str(step): ids for step, ids in sorted(self.postings.items())},
+        }, separators=(",", ":")).encode("utf-8")
+        blob = self._blob[self._blob_start:self._blob_start + (self.offsets[-1][1] if self.offsets else 0)]
+        return MAGIC + _HEADER_LEN.pack(len(header)) + header + bytes(blob)
+
+    def save(self, output_dir: str, export_json: bool = True) -> str:
+        """Write semantic_index.bin (and the JSON export); returns the .bin path."""
+        bin_path = os.path.join(output_dir, BIN_NAME)
+        atomic_write(bin_path, self.to_bytes())
+        if export_json:
+            with open(os.path.join(output_dir, JSON_NAME), "w", encoding="utf-8") as f:
+                json.dump(self.to_json(), f, ensure_ascii=False, indent=2)
+        return bin_path
+
+
+def index_exists(output_dir: str) -> bool:
+    """Whether *output_dir* already has a semantic index in either format."""
+    return any(os.path.exists(os.path.join(output_dir, name)) for name in (BIN_NAME, JSON_NAME))
+
+
+def load_index(output_dir: str) -> Optional[SemanticIndex]:
+    """Load the index of one paper: the .bin file if present, else the JSON file, else None."""
+    bin_path = os.path.join(output_dir, BIN_NAME)
+    if os.path.exists(bin_path):
+        try:
+            return SemanticIndex.from_bin(bin_path)
+        except (ValueError, KeyError, struct.error) as e:
+            logger.warning(f"Ignoring unreadable {bin_path}: {e}")
+    json_path = os.path.join(output_dir, JSON_NAME)
+    if os.path.exists(json_path):
+        return SemanticIndex.from_json(json_path)
+    return None
@@ -1,8 +1,8 @@
-import os
 import re
 import json
 import logging
 from .common import smart_chunk, call_deepseek
+from .semantic_index import SemanticIndex
 
 logger = logging.getLogger(__name__)
 
@@ -89,7 +89,7 @@ SYSTEM_PROMPT = """你是一个专业的学术论文结构分析师。
 def generate_semantic_index(full_text, output_dir):
     """
     Splits the full text into chunks, asks LLM to tag each chunk with step IDs,
-    and saves the result to semantic_index.json.
+    and saves the result to semantic_index.bin (plus a semantic_index.json export).
     """
     logger.info("Starting Semantic Indexing...")
 
@@ -134,10 +134,8 @@ def generate_semantic_index(full_text, output_dir):
             "tags": tags
         })
     
-    # Save to file
-    index_path = os.path.join(output_dir, "semantic_index.json")
-    with open(index_path, 'w', encoding='utf-8') as f:
-        json.dump({"chunks": indexed_chunks}, f, ensure_ascii=False, indent=2)
+    # Save to file: semantic_index.bin for the steps, semantic_index.json for debugging
+    index_path = SemanticIndex.from_chunks(indexed_chunks).save(output_dir, export_json=True)
         
     logger.info(f"Semantic index saved to {index_path}")
     return index_path
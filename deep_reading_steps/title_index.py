@@ -0,0 +1,112 @@
+"""
+章节标题模糊解析索引
+
+LLM 返回的路由标题常有标点、空格或 OCR 噪声差异，需要解析回原文中的真实标题。
+原先 _fuzzy_match_title 每次查找都重新规范化全部候选，再调用
+difflib.get_close_matches（对标题长度二次、对候选数线性），PaddleOCR 输出里
+有上百个 ## 标题时路由校验明显变慢。TitleIndex 每个文档只构建一次：
+
+1. 精确匹配 → 规范化（去空白/标点、小写）后精确匹配，都是字典查找
+2. 字符 bigram 倒排索引筛选候选：每次插入/删除最多破坏 2 个 bigram，
+   k 次编辑后共享 bigram 数低于 |bigrams(target)| - 2k 的候选不可能达到阈值，直接跳过
+3. 对剩余候选用带上界的插入/删除编辑距离打分：相似度 = 1 - 距离 / 两者总长
+   （即 2 * LCS / 总长，与 difflib ratio 同尺度，cutoff 仍为 0.8），
+   取不低于 cutoff 的最高分（同分取原顺序靠前者）
+
+_llm_routing 的标题校验和 SmartSegmentRouter.segment_by_routing 共用。
+"""
+
+import re
+from typing import Dict, List, Optional, Sequence, Set
+
+DEFAULT_CUTOFF = 0.8
+
+_RE_NORMALIZE = re.compile(r'\s+|[^\w\u4e00-\u9fa5]')
+
+
+def normalize_title(title: str) -> str:
+    """去空白与标点并小写。"""
+    return _RE_NORMALIZE.sub('', title).lower()
+
+
+def _bigrams(s: str) -> Set[str]:
+    if len(s) < 2:
+        return {s} if s else set()
+    return {s[i:i + 2] for i in range(len(s) - 1)}
+
+
+def bounded_indel_distance(a: str, b: str, limit: int) -> int:
+    """
+    只含插入/删除的编辑距离（len(a) + len(b) - 2 * LCS）；
+    超过 limit 时提前返回 limit + 1。
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            if ca == cb:
+                current[j] = previous[j - 1]
+            else:
+                current[j] = min(previous[j], current[j - 1]) + 1
+            if current[j] < row_min:
+                row_min = current[j]
+        if row_min > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class TitleIndex:
+    """一个文档的标题索引（构建后只读）。"""
+
+    def __init__(self, titles: Sequence[str]):
+        self.titles: List[str] = list(titles)
+        self._exact: Dict[str, str] = {}
+        self._normalized: Dict[str, str] = {}
+        self._norms: List[str] = []
+        self._postings: Dict[str, List[int]] = {}
+        for idx, title in enumerate(self.titles):
+            self._exact.setdefault(title, title)
+            norm = normalize_title(title)
+            self._normalized.setdefault(norm, title)
+            self._norms.append(norm)
+            for gram in _bigrams(norm):
+                self._postings.setdefault(gram, []).append(idx)
+
+    def __contains__(self, title: str) -> bool:
+        return title in self._exact
+
+    def resolve(self, target: str, cutoff: float = DEFAULT_CUTOFF) -> Optional[str]:
+        """target 对应的真实标题，找不到时返回 None。"""
+        if target in self._exact:
+            return target
+        norm = normalize_title(target)
+        if norm in self._normalized:
+            return self._normalized[norm]
+        if not norm:
+            return None
+
+        grams = _bigrams(norm)
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for idx in self._postings.get(gram, ()):
+                shared[idx] = shared.get(idx, 0) + 1
+
+        best_idx, best_score = None, cutoff
+        for idx, cand in enumerate(self._norms):
+            total = len(norm) + len(cand)
+            limit = int((1.0 - cutoff) * total + 1e-9)
+            if abs(len(norm) - len(cand)) > limit or shared.get(idx, 0) < len(grams) - 2 * limit:
+                continue
+            distance = bounded_indel_distance(norm, cand, limit)
+            if distance > limit:
+                continue
+            score = 1.0 - distance / total
+            if score > best_score or (best_idx is None and score >= best_score):
+                best_idx, best_score = idx, score
+        return self.titles[best_idx] if best_idx is not None else None
@@ -8,6 +8,9 @@ from dotenv import load_dotenv
 from openai import OpenAI
 import json_repair
 
+from reference_parser import parse_references, DEFAULT_MIN_CONFIDENCE
+from reference_store import ReferenceStore, DEFAULT_DB_PATH
+
 # Load environment variables
 load_dotenv()
 
@@ -185,10 +188,76 @@ def extract_references_with_llm(raw_text, batch_size=15):
     
     return all_parsed
 
+# --- STAGE 2 (FAST PATH): RULE-BASED PARSING ---
+def _ref_key(text):
+    return re.sub(r"\W+", "", str(text or "")).lower()[:40]
+
+
+def extract_references_hybrid(raw_text, min_confidence=DEFAULT_MIN_CONFIDENCE, store=None):
+    """
+    先用 reference_parser 的规则解析常见格式（GB/T 7714 / APA / Chicago），
+    只把置信度低于 min_confidence 的条目交给 LLM。
+    传入 store（ReferenceStore）时，语料库中已解析过的条目直接复用。
+    LLM 结果按 raw_text 回填到原条目位置，匹配不上的追加到末尾。
+    """
+    parsed, pending = parse_references(raw_text, min_confidence=min_confidence)
+    for ref in parsed:
+        ref["parse_source"] = "rule"
+
+    if store is not None and pending:
+        still_pending = []
+        for idx, entry in pending:
+            known = store.lookup_raw(entry)
+            if known:
+                known.pop("work_id", None)
+                parsed.append(dict(known, raw_text=entry, parse_source="store", _index=idx))
+            else:
+                still_pending.append((idx, entry))
+        pending = still_pending
+    logger.info(f"Rule-based parser: {len(parsed)} resolved, {len(pending)} routed to LLM")
+
+    if not pending:
+        parsed.sort(key=lambda r: r["_index"])
+        for ref in parsed:
+            ref.pop("_index", None)
+        return parsed
+
+    llm_refs = extract_references_with_llm("\n\n".join(entry for _, entry in pending))
+    unmatched = []
+    pending_keys = [(idx, _ref_key(entry)) for idx, entry in pending]
+    used = set()
+    for ref in llm_refs:
+        if not isinstance(ref, dict):
+            continue
+        ref["parse_source"] = "llm"
+        key = _ref_key(ref.get("raw_text"))
+        slot = None
+        if key:
+            for idx, pkey in pending_keys:
+                if idx not in used and (pkey.startswith(key[:20]) or key.startswith(pkey[:20])):
+                    slot = idx
+                    break
+        if slot is None:
+            unmatched.append(ref)
+        else:
+            used.add(slot)
+            ref["_index"] = slot
+            parsed.append(ref)
+
+    parsed.sort(key=lambda r: r["_index"])
+    for ref in parsed:
+        ref.pop("_index", None)
+    return parsed + unmatched
+
 # --- MAIN PIPELINE ---
 def main():
-    parser = argparse.ArgumentParser(description="从论文中提取参考文献（直接调用大模型）")
+    parser = argparse.ArgumentParser(description="从论文中提取参考文献（规则解析优先，低置信度条目调用大模型）")
     parser.add_argument("segmented_md", help="分段后的 Markdown 文件路径")
+    parser.add_argument("--min-confidence", type=float, default=DEFAULT_MIN_CONFIDENCE,
+                        help="规则解析置信度阈值，低于该值的条目交给 LLM（默认 %(default)s）")
+    parser.add_argument("--llm-only", action="store_true", help="跳过规则解析，全部条目交给 LLM")
+    parser.add_argument("--store", default=DEFAULT_DB_PATH, help="语料级参考文献库路径（SQLite）")
+    parser.add_argument("--no-store", action="store_true", help="不读写语料级参考文献库")
     args = parser.parse_args()
     
     # Setup Paths
@@ -214,20 +283,29 @@ def main():
         logger.error("References text too short, aborting.")
         return
 
-    # 2. Direct LLM Extraction
-    logger.info("Phase 2: Extracting references with LLM...")
-    parsed_refs = extract_references_with_llm(raw_text)
+    store = None if args.no_store else ReferenceStore(args.store)
+
+    # 2. Rule-based fast path, LLM for the rest
+    if args.llm_only:
+        logger.info("Phase 2: Extracting references with LLM...")
+        parsed_refs = extract_references_with_llm(raw_text)
+    else:
+        logger.info("Phase 2: Parsing references (rules first, LLM fallback)...")
+        parsed_refs = extract_references_hybrid(raw_text, min_confidence=args.min_confidence, store=store)
     logger.info(f"Total references extracted: {len(parsed_refs)}")
     
     if not parsed_refs:
         logger.error("No references extracted.")
+        if store:
+            store.close()
         return
     
     # 3. Save to Excel
     df = pd.DataFrame(parsed_refs)
     
     # 确保列顺序
-    column_order = ["author", "year", "title", "journal", "vol_issue", "pages", "raw_text"]
+    column_order = ["author", "year", "title", "journal", "vol_issue", "pages", "raw_text",
+                    "parse_source", "style", "confidence"]
     existing_cols = [c for c in column_order if c in df.columns]
     other_cols = [c for c in df.columns if c not in column_order]
     df = df[existing_cols + other_cols]
@@ -236,5 +314,10 @@ def main():
     df.to_excel(out_path, index=False)
     logger.info(f"Saved {len(parsed_refs)} references to {out_path}")
 
+    # 4. Corpus-level store
+    if store:
+        store.ingest_references(base_name, parsed_refs, source_path=os.path.abspath(args.segmented_md))
+        store.close()
+
 if __name__ == "__main__":
     main()
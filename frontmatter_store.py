@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+In-memory frontmatter editing for a paper output directory.
+
+The post-processing scripts (inject_dataview_summaries, inject_obsidian_meta,
+inject_qual_metadata, link_social_science_docs, qual_metadata_extractor)
+all touch the same step / layer notes.  Each of them used to re-open the
+file, re-parse its YAML and rewrite or append to it on its own, so one
+paper went through several read-parse-write cycles and an interrupted
+write could leave a half-written note in the vault.
+
+PaperNotes loads the directory once; every tool mutates the parsed Note
+objects (frontmatter dict + body) and save() writes each changed note
+exactly once via a temp file in the same directory and os.replace(), so a
+note on disk is always either the old or the new version.
+
+    notes = PaperNotes(paper_dir, lambda name: name.endswith("_Value.md"))
+    for note in notes:
+        note.update_metadata({"title": "..."}, default_tags=DEFAULT_TAGS)
+        note.append_section("\\n\\n## Navigation\\n...", markers=("## Navigation",))
+    notes.save()
+"""
+
+import copy
+import logging
+import os
+import stat
+import tempfile
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAGS = ("paper", "deep-reading")
+
+
+def _file_mode(path: str) -> int:
+    """Permission bits *path* has, or would get from a plain open() if it does not exist yet."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def atomic_write(path: str, data: Union[str, bytes]) -> None:
+    """
+    Write *data* (text as UTF-8, or bytes) to *path* through a temp file in
+    the same directory and os.replace().  The temp file gets the mode of the
+    file it replaces (mkstemp creates it 0600).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    try:
+        if isinstance(data, str):
+            f = os.fdopen(fd, "w", encoding="utf-8")
+        else:
+            f = os.fdopen(fd, "wb")
+        with f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, _file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def parse_note(content: str) -> Tuple[Dict, str]:
+    """
+    Split *content* into (frontmatter, body).  Without a closing '---' the
+    whole content is kept as the body.  A closed block whose YAML does not
+    parse (or is not a mapping) yields empty frontmatter but is still cut
+    from the body, so writing new frontmatter replaces it instead of stacking
+    a second block on top; Note keeps the raw block while its metadata is
+    left unchanged.
+    """
+    if not content.startswith("---\n"):
+        return {}, content
+    end_idx = content.find("\n---\n", 4)
+    if end_idx == -1:
+        return {}, content
+    body = content[end_idx + 5:]
+    try:
+        metadata = yaml.safe_load(content[4:end_idx]) or {}
+    except yaml.YAMLError as e:
+        logger.warning(f"Failed to parse existing frontmatter: {e}")
+        return {}, body
+    if not isinstance(metadata, dict):
+        return {}, body
+    return metadata, body
+
+
+def render_note(metadata: Dict, body: str) -> str:
+    """Frontmatter block + body; the body's leading blank lines are normalised so re-rendering is stable."""
+    if not metadata:
+        return body
+    body = body.lstrip("\n")
+    yaml_str = yaml.safe_dump(metadata, allow_unicode=True, sort_keys=False).strip()
+    return f"---\n{yaml_str}\n---\n\n{body}"
+
+
+def _as_tag_list(value) -> List:
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, str):
+        return [value]
+    return []
+
+
+def merge_tags(*tag_values, extra: Iterable[str] = ()) -> List:
+    """Union of tag values (list or str), first-seen order, duplicates dropped."""
+    merged = []
+    for value in list(tag_values) + [list(extra)]:
+        for tag in _as_tag_list(value):
+            if tag not in merged:
+                merged.append(tag)
+    return merged
+
+
+class Note:
+    """One Markdown note: parsed frontmatter, body, and the text it was loaded from."""
+
+    def __init__(self, name: str, path: str, content: str, original: Optional[str] = None):
+        self.name = name
+        self.path = path
+        self.metadata, self.body = parse_note(content)
+        # Raw frontmatter block as loaded; reused verbatim while the metadata is unchanged
+        self._head = content[:len(content) - len(self.body)]
+        self._loaded_metadata = copy.deepcopy(self.metadata)
+        # Text currently on disk; None means save() always writes
+        self.original = original
+
+    def update_metadata(self, metadata: Dict, default_tags: Iterable[str] = ()) -> None:
+        """Merge *metadata* over the existing frontmatter, keeping unrelated keys and unioning tags."""
+        existing_tags = self.metadata.get("tags")
+        self.metadata.update(metadata)
+        if default_tags or "tags" in metadata or existing_tags is not None:
+            self.metadata["tags"] = merge_tags(existing_tags, metadata.get("tags"), extra=default_tags)
+
+    def replace_metadata(self, metadata: Dict) -> None:
+        """Discard the existing frontmatter and use *metadata* as-is."""
+        self.metadata = dict(metadata)
+
+    def has_section(self, markers: Iterable[str]) -> bool:
+        return any(marker in self.body for marker in markers)
+
+    def append_section(self, text: str, markers: Iterable[str] = ()) -> bool:
+        """Append *text* to the body unless one of *markers* is already present."""
+        if markers and self.has_section(markers):
+            return False
+        self.body += text
+        return True
+
+    def remove_section(self, heading: str) -> bool:
+        """Cut the body from *heading* (and the blank line before it) to the end."""
+        idx = self.body.find(heading)
+        if idx == -1:
+            return False
+        prev_blank = self.body.rfind("\n\n", 0, idx)
+        self.body = self.body[:prev_blank] if prev_blank != -1 else self.body[:idx]
+        return True
+
+    def render(self) -> str:
+        if self.metadata == self._loaded_metadata:
+            return self._head + self.body
+        return render_note(self.metadata, self.body)
+
+    def save(self) -> bool:
+        """Write the note atomically if it changed; returns whether it was written."""
+        text = self.render()
+        if text == self.original:
+            return False
+        atomic_write(self.path, text)
+        self.original = text
+        return True
+
+
+class PaperNotes:
+    """The Markdown notes of one paper directory, loaded once and saved once."""
+
+    def __init__(self, directory: str, include: Optional[Callable[[str], bool]] = None):
+        self.directory = directory
+        self.notes: Dict[str, Note] = {}
+        self.all_files = sorted(f for f in os.listdir(directory) if f.endswith(".md"))
+        for name in self.all_files:
+            if include is not None and not include(name):
+                continue
+            path = os.path.join(directory, name)
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+            self.notes[name] = Note(name, path, content, original=content)
+
+    def __iter__(self) -> Iterator[Note]:
+        return iter(list(self.notes.values()))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.notes
+
+    def __getitem__(self, name: str) -> Note:
+        return self.notes[name]
+
+    def __len__(self) -> int:
+        return len(self.notes)
+
+    def get(self, name: str) -> Optional[Note]:
+        return self.notes.get(name)
+
+    def redirect(self, directory: str) -> None:
+        """Save into *directory* instead of the source directory (every note is written there)."""
+        os.makedirs(directory, exist_ok=True)
+        for note in self.notes.values():
+            note.path = os.path.join(directory, note.name)
+            note.original = None
+
+    def save(self) -> List[str]:
+        """Write every changed note once, atomically; returns the names written."""
+        written = []
+        for name, note in self.notes.items():
+            if note.save():
+                written.append(name)
+                logger.info(f"Updated {note.path}")
+        return written
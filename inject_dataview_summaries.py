@@ -1,6 +1,5 @@
 import os
 import sys
-import yaml
 import json
 import logging
 import argparse
@@ -10,6 +9,8 @@ from dotenv import load_dotenv
 # Ensure we can find local modules if needed
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from frontmatter_store import PaperNotes
+
 load_dotenv()
 
 # Configure logging
@@ -81,69 +82,47 @@ def extract_summaries(filename, content):
         logger.error(f"Error extracting summaries for {filename}: {e}")
         return {}
 
-def process_file(file_path):
-    logger.info(f"Processing {file_path}...")
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-        
-    # Separate existing Frontmatter
-    frontmatter = {}
-    body = content
-    
-    if content.startswith("---"):
-        try:
-            end_idx = content.find("\n---\n", 3)
-            if end_idx != -1:
-                fm_str = content[3:end_idx]
-                frontmatter = yaml.safe_load(fm_str)
-                body = content[end_idx+5:]
-        except Exception as e:
-            logger.warning(f"Failed to parse existing frontmatter: {e}")
+# Expected sub-part files of a deep-reading output directory
+DATAVIEW_FILES = [
+    "1_Overview.md", "2_Theory.md", "3_Data.md",
+    "4_Variables.md", "5_Identification.md",
+    "6_Results.md", "7_Critique.md"
+]
+
+def summarize_note(note):
+    """Extract summaries from the note body and merge them into its frontmatter (in memory)."""
+    logger.info(f"Processing {note.path}...")
 
     # Extract Summaries from Body
-    summaries = extract_summaries(os.path.basename(file_path), body)
+    summaries = extract_summaries(note.name, note.body)
     
     if not summaries:
         logger.warning("No summaries extracted.")
-        return
+        return False
 
     # Merge into Frontmatter (Dataview fields)
     # We prefix keys with 'dv_' to identify them easily, or just use semantic keys?
     # User said: "small title as key, summary as value".
     # Let's keep keys clean like 'research_theme'.
-    
-    for k, v in summaries.items():
-        frontmatter[k] = v
-        
-    # Reconstruct File
-    new_fm_str = yaml.safe_dump(frontmatter, allow_unicode=True, sort_keys=False).strip()
-    new_content = f"---\n{new_fm_str}\n---\n\n{body}"
-    
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(new_content)
-    logger.info(f"Updated {file_path}")
+    note.metadata.update(summaries)
+    return True
+
+def apply_dataview_summaries(notes):
+    """Summarize every DATAVIEW_FILES note of a PaperNotes directory; the caller saves."""
+    for fname in DATAVIEW_FILES:
+        if fname in notes:
+            summarize_note(notes[fname])
+        else:
+            logger.warning(f"File not found: {os.path.join(notes.directory, fname)}")
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("target_dir", help="Directory containing the 7 sub-part markdown files")
     args = parser.parse_args()
     
-    target_dir = args.target_dir
-    
-    # Expected files
-    patterns = [
-        "1_Overview.md", "2_Theory.md", "3_Data.md", 
-        "4_Variables.md", "5_Identification.md", 
-        "6_Results.md", "7_Critique.md"
-    ]
-    
-    for fname in patterns:
-        fpath = os.path.join(target_dir, fname)
-        if os.path.exists(fpath):
-            process_file(fpath)
-        else:
-            logger.warning(f"File not found: {fpath}")
+    notes = PaperNotes(args.target_dir, include=lambda name: name in DATAVIEW_FILES)
+    apply_dataview_summaries(notes)
+    notes.save()
 
 if __name__ == "__main__":
     main()
@@ -1,20 +1,18 @@
 import argparse
 import os
 import re
-import yaml
-import json
-import base64
 import io
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 from dotenv import load_dotenv
 
-load_dotenv()
+from frontmatter_store import DEFAULT_TAGS, Note, PaperNotes
+from inject_dataview_summaries import apply_dataview_summaries
+from paddleocr_extractor.md_metadata import read_markdown_metadata
+from qual_metadata_extractor.md_extractor import summarize_sections_batch
+from qual_metadata_extractor.pdf_extractor import extract_pdf_metadata
 
-try:
-    import pymupdf
-except ImportError:
-    pymupdf = None
-    print("Warning: pymupdf not installed. PDF image extraction will be disabled.")
+load_dotenv()
 
 
 def _env(name, default=None):
@@ -38,219 +36,17 @@ def is_paddleocr_md(path: str) -> bool:
         return False
 
 
-def _merge_spaced_chinese_names(text: str) -> str:
-    """
-    Merge single Chinese characters separated by spaces into plausible names.
-
-    Chinese academic papers often format author names with spaces between
-    characters, e.g. "刘　行　张昊天　田　轩" should become "刘行 张昊天 田轩".
-
-    Heuristic: scan left to right, greedily merge adjacent single CJK chars
-    into groups of 2-3 (typical Chinese name length).
-    """
-    tokens = re.split(r'[\s\u3000]+', text.strip())
-    if not tokens:
-        return text
-
-    result = []
-    buf = ""
-    for tok in tokens:
-        if len(tok) == 1 and re.match(r'^[\u4e00-\u9fff]$', tok):
-            buf += tok
-            # Flush at 3 chars (surname + 2-char given name)
-            if len(buf) >= 3:
-                result.append(buf)
-                buf = ""
-        else:
-            if buf:
-                result.append(buf)
-                buf = ""
-            result.append(tok)
-    if buf:
-        # Remaining 1-2 chars: merge with last name if possible, or keep as-is
-        if len(buf) == 1 and result and 1 <= len(result[-1]) <= 2 and re.match(r'^[\u4e00-\u9fff]+$', result[-1]):
-            result[-1] += buf
-        else:
-            result.append(buf)
-    return ' '.join(result)
-
-
 def parse_paddleocr_frontmatter(path: str) -> dict:
     """
     Parse metadata from PaddleOCR markdown file.
 
-    Reads YAML frontmatter and extracts additional metadata from content.
+    Reads YAML frontmatter and extracts additional metadata (title, authors,
+    abstract, keywords, journal, year) from the head of the content, see
+    paddleocr_extractor.md_metadata.
     """
-    if not os.path.exists(path):
-        return {}
-
-    with open(path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    metadata = {}
-
-    # Parse YAML frontmatter
-    if content.startswith("---\n"):
-        end_idx = content.find("\n---\n", 4)
-        if end_idx != -1:
-            try:
-                fm_str = content[4:end_idx]
-                metadata = yaml.safe_load(fm_str) or {}
-            except Exception:
-                pass
-
-    # Extract body content
-    body = content
-    if content.startswith("---\n"):
-        end_idx = content.find("\n---\n", 4)
-        if end_idx != -1:
-            body = content[end_idx + 5:]
-
-    # Extract additional metadata from body if not in frontmatter
-
-    # Title: prefer first # heading (actual paper title), fallback to first substantial line
-    if not metadata.get("title") or metadata.get("title", "").endswith(".pdf"):
-        found_title = False
-        for line in body.split('\n')[:30]:
-            stripped = line.strip()
-            # First priority: first `# ` heading (not `## `) that's not the filename
-            if (stripped.startswith('# ') and not stripped.startswith('## ')
-                    and not stripped.endswith('.pdf') and len(stripped) > 4):
-                metadata["title"] = stripped[2:].strip()
-                found_title = True
-                break
-        if not found_title:
-            for line in body.split('\n')[:30]:
-                stripped = line.strip()
-                # Second priority: first substantial non-header line
-                if (stripped and
-                    not stripped.startswith('#') and
-                    not stripped.startswith('*') and
-                    not stripped.startswith('-') and
-                    len(stripped) > 15):
-                    metadata["title"] = stripped
-                    break
-
-    # Abstract (Chinese and English patterns)
-    if not metadata.get("abstract"):
-        # Chinese
-        match = re.search(r'(?:摘要|内容提要)[：:]\s*(.+?)(?=\n\n|关键词|中图分类号|Keywords)', body, re.DOTALL)
-        if match:
-            metadata["abstract"] = match.group(1).strip()[:500]
-        else:
-            # English
-            match = re.search(r'Abstract[：:.]?\s*(.+?)(?=\n\n|Keywords|Introduction)', body, re.DOTALL | re.IGNORECASE)
-            if match:
-                metadata["abstract"] = match.group(1).strip()[:500]
-
-    # Keywords (Chinese)
-    if not metadata.get("keywords"):
-        match = re.search(r'关键词[：:]\s*(.+?)(?=\n|中图分类号)', body)
-        if match:
-            keywords = match.group(1)
-            # Split by semicolons, commas, or spaces (some Chinese papers use space-separated keywords)
-            parts = re.split(r'[；;,，]', keywords)
-            if len(parts) == 1 and ' ' in keywords.strip():
-                # Fallback: split by spaces
-                space_parts = keywords.strip().split()
-                # Validate: each keyword should be at least 2 chars
-                if all(len(p) >= 2 for p in space_parts):
-                    parts = space_parts
-            metadata["keywords"] = [k.strip() for k in parts if k.strip()]
-
-    # Authors (try to extract from common patterns)
-    if not metadata.get("authors"):
-        # Pattern 1: Explicit label like "作者：" or "Author:" (require colon after label)
-        author_match = re.search(r'(?:^|[^\[])(?:作者|Author)[：:]\s*(.+?)(?=\n|摘要|Abstract)', body, re.IGNORECASE)
-        if author_match:
-            authors_text = author_match.group(1).strip()
-            metadata["authors"] = [a.strip() for a in re.split(r'[,，、]', authors_text) if a.strip()]
-
-        # Pattern 2: Chinese papers - authors on line between title and abstract
-        # Typically: title line → author line → abstract
-        if not metadata.get("authors"):
-            lines = body.split('\n')
-            # Find the paper title (# heading or first substantial line) and the abstract line
-            title_idx = -1
-            abstract_idx = -1
-            for i, line in enumerate(lines[:40]):
-                stripped = line.strip()
-                if title_idx == -1 and stripped.startswith('# ') and not stripped.startswith('## '):
-                    title_idx = i
-                if abstract_idx == -1 and re.match(r'^(?:摘要|内容提要|Abstract)[：:.]', stripped):
-                    abstract_idx = i
-                    break
-
-            # If no # heading found, use first substantial text line as title anchor
-            if title_idx == -1 and abstract_idx > 0:
-                for i, line in enumerate(lines[:abstract_idx]):
-                    stripped = line.strip()
-                    if (stripped and not stripped.startswith('#') and not stripped.startswith('*')
-                            and not stripped.startswith('-') and len(stripped) > 15
-                            and not re.match(r'^\d{4}\s*年', stripped)):
-                        title_idx = i
-                        break
-
-            # Look for author-like lines between title and abstract
-            if title_idx >= 0 and abstract_idx > title_idx:
-                for i in range(title_idx + 1, abstract_idx):
-                    line = lines[i].strip()
-                    # Skip empty lines, subtitles (starting with ——), headers, page markers
-                    if (not line or line.startswith('#') or line.startswith('*')
-                            or line.startswith('——') or line.startswith('—')
-                            or re.match(r'^[-\d\s]+$', line)):
-                        continue
-                    # Author line: short (< 80 chars), no period/colon, no digits
-                    if len(line) < 80 and not re.search(r'[。：:；\d]', line):
-                        # Pre-process: merge single Chinese chars separated by spaces into names
-                        # E.g. "刘　行　张昊天　田　轩" → "刘行 张昊天 田轩"
-                        merged_line = _merge_spaced_chinese_names(line)
-                        # Split by spaces
-                        names = re.split(r'[\s\u3000]+', merged_line)
-                        # Filter: each segment should be 2-4 Chinese chars (typical name length)
-                        valid_names = [n for n in names if n and 2 <= len(n) <= 4 and re.match(r'^[\u4e00-\u9fff]+$', n)]
-                        if len(valid_names) >= 2:
-                            metadata["authors"] = valid_names
-                            break
-
-        # Pattern 3: Extract from filename like "标题_作者.pdf"
-        if not metadata.get("authors"):
-            source_pdf = metadata.get("source_pdf", "")
-            if source_pdf:
-                stem = os.path.splitext(source_pdf)[0]
-                # Match "_作者名" at end of filename (2-4 Chinese chars)
-                fn_match = re.search(r'_([\u4e00-\u9fff]{2,4})$', stem)
-                if fn_match:
-                    metadata["authors"] = [fn_match.group(1)]
-
-    # Journal (try to extract from page header patterns in first few lines)
-    if not metadata.get("journal"):
-        # Chinese journal patterns in header area:
-        # "《经济研究》" or "经济研究 2024年第1期"
-        # Often in the first 5 lines of body content
-        first_lines = '\n'.join(body.split('\n')[:15])
-        # Pattern: 《journal_name》
-        j_match = re.search(r'[《](.+?)[》]', first_lines)
-        if j_match:
-            metadata["journal"] = j_match.group(1)
-        else:
-            # Pattern: "Journal Name, Vol.XX" or "JOURNAL 2024"
-            j_match = re.search(r'^([A-Z][A-Za-z\s&]+(?:Journal|Review|Economics|Quarterly|Science))', first_lines, re.MULTILINE)
-            if j_match:
-                metadata["journal"] = j_match.group(1).strip()
-
-    # Year (try to extract from patterns in first few lines)
-    if not metadata.get("year"):
-        first_lines = '\n'.join(body.split('\n')[:15])
-        # Pattern: "2024年" or "2024, Vol" or "(2024)"
-        y_match = re.search(r'(20[12]\d)\s*[年,，]', first_lines)
-        if y_match:
-            metadata["year"] = y_match.group(1)
-        else:
-            y_match = re.search(r'\(?(20[12]\d)\)?', first_lines)
-            if y_match:
-                metadata["year"] = y_match.group(1)
-
+    metadata = read_markdown_metadata(path)
+    if isinstance(metadata.get("abstract"), str):
+        metadata["abstract"] = metadata["abstract"][:500]
     return metadata
 
 
@@ -309,10 +105,41 @@ def summarize_with_deepseek(client, title: str, text: str) -> str:
         print(f"Summary failed for {title}: {e}")
         return text[:30]
 
+def summarize_subsections(client, content: str) -> dict:
+    """
+    总结步骤文件中所有足够长的 ### 子标题：一次批量 JSON 请求，
+    回复中缺失的子标题再逐个调用 summarize_with_deepseek。
+
+    Returns:
+        {清洗后的子标题: 摘要}
+    """
+    items = [
+        (title, text) for title, text in extract_subsections(content).items()
+        if len(text) >= 50  # 只总结足够长的部分
+    ]
+    summaries = summarize_sections_batch(
+        client, items,
+        target_length=lambda text: 30,
+        fallback=lambda title, text: summarize_with_deepseek(client, title, text),
+        truncate=False,
+        max_workers=1,
+    )
+    subsections_meta = {}
+    for (title, _), summary in zip(items, summaries):
+        # 清洗 key：去掉 ** 标记和编号前缀（如 "**1. 研究主题**" → "研究主题"）
+        clean_key = title.replace("**", "").strip()
+        clean_key = re.sub(r'^\d+\.\s*', '', clean_key).strip()
+        subsections_meta[clean_key] = summary
+    return subsections_meta
+
+
 def extract_metadata_from_pdf_images(pdf_path: str) -> dict:
     """
-    将 PDF 前两页转换为图片，用 Qwen-vl-plus 提取元数据
-    
+    将 PDF 前三页上半部分转换为图片，用 Qwen-vl-plus 提取元数据
+
+    文本层优先、灰度 JPEG 渲染与按 PDF 内容哈希缓存见
+    qual_metadata_extractor.pdf_extractor.extract_pdf_metadata。
+
     Returns:
         {
             "title": str,
@@ -321,111 +148,8 @@ def extract_metadata_from_pdf_images(pdf_path: str) -> dict:
             "year": str
         }
     """
-    _unknown = {
-        "title": "Unknown",
-        "authors": ["Unknown"],
-        "journal": "Unknown",
-        "year": "Unknown"
-    }
-    if not pymupdf:
-        print("Warning: pymupdf not available, skipping PDF image extraction")
-        return _unknown
-
-    if not os.path.exists(pdf_path):
-        print(f"PDF not found: {pdf_path}")
-        return _unknown
-    
-    doc = pymupdf.open(pdf_path)
-    images = []
-    
-    for page_num in range(min(3, len(doc))):
-        page = doc.load_page(page_num)
-        rect = page.rect
-        # 只截取上半部分（上 1/2），期刊名称和年份通常在页眉位置
-        clip_rect = pymupdf.Rect(rect.x0, rect.y0, rect.x1, rect.y0 + rect.height / 2)
-        pix = page.get_pixmap(clip=clip_rect, dpi=200)
-        
-        img_bytes = pix.tobytes("png")
-        img_base64 = base64.b64encode(img_bytes).decode('utf-8')
-        images.append(img_base64)
-    
-    doc.close()
-    
-    qwen_api_key = os.getenv("QWEN_API_KEY")
-    if not qwen_api_key:
-        print("Warning: QWEN_API_KEY not found in .env")
-        return _unknown
-    print(f"QWEN_API_KEY found: {qwen_api_key[:10]}...")
-    
-    client = OpenAI(
-        api_key=qwen_api_key,
-        base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
-    )
-    
-    prompt = """请从以下论文图片中提取以下元数据（图片为PDF前三页的上半部分，包含页眉区域）：
-1. 论文标题（完整）
-2. 作者列表（所有作者，用逗号分隔）
-3. 发表期刊（期刊全名）
-4. 发表年份（仅数字）
-
-请以 JSON 格式返回：
-{
-    "title": "...",
-    "authors": ["...", "..."],
-    "journal": "...",
-    "year": "..."
-}
-
-注意：
-- 这些图片是页面上半部分的截图，专门用于捕获页眉信息
-- 期刊名称和年份通常在页眉位置（页面最顶部的一行）
-- 请仔细识别页眉中的期刊名、卷号、期号和年份
-- 如果某项信息无法识别，返回 "Unknown"
-"""
-    
-    try:
-        content_messages = [
-            {"type": "text", "text": prompt}
-        ]
-
-        for img_base64 in images:
-            content_messages.append({
-                "type": "image_url",
-                "image_url": {"url": f"data:image/png;base64,{img_base64}"}
-            })
-
-        print(f"Sending request to Qwen VL with {len(images)} images...")
-
-        resp = client.chat.completions.create(
-            model="qwen-vl-plus",
-            messages=[
-                {"role": "system", "content": "你是专业的学术论文元数据提取专家。"},
-                {"role": "user", "content": content_messages}
-            ],
-            temperature=0.0
-        )
-
-        response_content = resp.choices[0].message.content
-        print(f"Qwen VL response: {response_content[:200]}...")
-
-        # Extract JSON from markdown code block if present
-        if "```json" in response_content:
-            start_idx = response_content.find("```json") + 7
-            end_idx = response_content.find("```", start_idx)
-            json_str = response_content[start_idx:end_idx].strip()
-        elif "```" in response_content:
-            start_idx = response_content.find("```") + 3
-            end_idx = response_content.find("```", start_idx)
-            json_str = response_content[start_idx:end_idx].strip()
-        else:
-            json_str = response_content.strip()
+    return extract_pdf_metadata(pdf_path, max_pages=3)
 
-        result = json.loads(json_str)
-        return result
-        
-    except Exception as e:
-        print(f"Qwen VL extraction failed: {e}")
-        return _unknown
 
 def get_deepseek_client():
     """获取 DeepSeek 客户端"""
@@ -438,66 +162,22 @@ def has_frontmatter(content):
     return content.startswith("---\n")
 
 def inject_frontmatter(content, metadata):
-    # 1. Parse existing frontmatter if present
-    existing_meta = {}
-    body_content = content
-    
-    if has_frontmatter(content):
-        end_idx = content.find("\n---\n", 4)
-        if end_idx != -1:
-            try:
-                fm_str = content[4:end_idx]
-                existing_meta = yaml.safe_load(fm_str) or {}
-                body_content = content[end_idx+5:]
-            except Exception as e:
-                print(f"Warning: Failed to parse existing frontmatter: {e}")
-    
-    # 2. Merge metadata (Priority: New Metadata > Existing Metadata for core fields, but keep other existing fields)
-    # Actually, for core fields (Title, Authors), we probably trust the dedicated extraction more than random previous runs?
-    # BUT, wait. Dataview Summarizer injected rich fields (e.g. research_theme). We MUST preserve them.
-    # The 'metadata' argument contains only basic info (Title, Author...).
-    
-    merged_meta = existing_meta.copy()
-    merged_meta.update(metadata)
-    
-    # Special handling for tags: merge them
-    tags = set()
-    
-    # Add existing tags
-    if "tags" in existing_meta:
-        if isinstance(existing_meta["tags"], list):
-            tags.update(existing_meta["tags"])
-        elif isinstance(existing_meta["tags"], str):
-            tags.add(existing_meta["tags"])
-            
-    # Add new tags
-    if "tags" in metadata:
-        if isinstance(metadata["tags"], list):
-            tags.update(metadata["tags"])
-        elif isinstance(metadata["tags"], str):
-            tags.add(metadata["tags"])
-            
-    # Always ensure deep-reading tag
-    tags.add("paper")
-    tags.add("deep-reading")
-    
-    merged_meta["tags"] = list(tags)
+    # Merge metadata over the existing frontmatter (keeps Dataview summary fields
+    # such as research_theme), union tags and always ensure paper/deep-reading
+    note = Note("", "", content)
+    note.update_metadata(metadata, default_tags=DEFAULT_TAGS)
+    return note.render()
 
-    # 3. Dump to YAML
-    yaml_str = yaml.safe_dump(merged_meta, allow_unicode=True, sort_keys=False).strip()
-    
-    frontmatter_block = f"---\n{yaml_str}\n---\n\n"
-    
-    return frontmatter_block + body_content
+NAVIGATION_HEADING = "## 导航 (Navigation)"
 
-def add_bidirectional_links(content, filename, all_files):
+def bidirectional_links_section(filename, all_files):
     # Strategy:
     # If this is Final Report, add links to all Steps.
     # If this is a Step, add link to Final Report.
     
     is_final = "Final" in filename
     
-    links_section = "\n\n## 导航 (Navigation)\n\n"
+    links_section = f"\n\n{NAVIGATION_HEADING}\n\n"
     
     if is_final:
         # Link to steps
@@ -516,12 +196,15 @@ def add_bidirectional_links(content, filename, all_files):
         if final_files:
             link_name = os.path.splitext(final_files[0])[0]
             links_section += f"**返回总报告：** [[{link_name}]]\n"
-            
+
+    return links_section
+
+def add_bidirectional_links(content, filename, all_files):
     # Check if links section already exists to avoid duplication
-    if "## 导航 (Navigation)" in content:
+    if NAVIGATION_HEADING in content:
         return content # Already added
         
-    return content + links_section
+    return content + bidirectional_links_section(filename, all_files)
 
 def main():
     parser = argparse.ArgumentParser(description="Inject Obsidian metadata and links")
@@ -530,6 +213,9 @@ def main():
     parser.add_argument("--use_pdf_vision", action="store_true", help="Enable PDF vision extraction with Qwen (disabled by default)")
     parser.add_argument("--pdf_path", help="Direct path to the PDF file (overrides --pdf_dir lookup)")
     parser.add_argument("--pdf_dir", help="PDF directory path for lookup (default: E:\\pdf\\001)", default="E:\\pdf\\001")
+    parser.add_argument("--workers", type=int, default=4, help="Step files summarized concurrently (default: 4)")
+    parser.add_argument("--dataview", action="store_true",
+                        help="Also inject Dataview summaries (inject_dataview_summaries) in the same read/write pass")
     args = parser.parse_args()
 
     # Step 1: Extract metadata from processed MD file
@@ -592,45 +278,43 @@ def main():
         print(f"Target dir not found: {args.target_dir}")
         return
 
-    all_files = [f for f in os.listdir(args.target_dir) if f.endswith(".md")]
-
-    deepseek_client = get_deepseek_client()
-    
-    for filename in all_files:
-        path = os.path.join(args.target_dir, filename)
-
-        # 跳过路由文件
+    def is_target(filename):
+        # 跳过路由文件；处理 Final_Deep_Reading_Report.md 与步骤文件
         if filename in ["section_routing.md", "semantic_index.json"]:
-            continue
+            return False
+        return filename == "Final_Deep_Reading_Report.md" or re.match(r'^\d+_', filename) is not None
 
-        # 处理 Final_Deep_Reading_Report.md
-        is_final = filename == "Final_Deep_Reading_Report.md"
+    # 整个目录只读一次，所有修改在内存中完成，最后每个文件原子写入一次
+    notes = PaperNotes(args.target_dir, include=is_target)
+    all_files = notes.all_files
 
-        # 处理步骤文件
-        is_step = re.match(r'^\d+_', filename) is not None
+    deepseek_client = get_deepseek_client()
 
-        if not is_final and not is_step:
-            continue
+    if args.dataview:
+        apply_dataview_summaries(notes)
+
+    # 步骤文件：提取并总结 ### 子标题（每个文件一次批量请求，文件之间并发）
+    step_summaries = {}
+    step_files = [note.name for note in notes if note.name != "Final_Deep_Reading_Report.md"]
+    if deepseek_client and step_files:
+        print(f"Summarizing subsections of {len(step_files)} step files...")
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            futures = {
+                filename: executor.submit(summarize_subsections, deepseek_client, notes[filename].body)
+                for filename in step_files
+            }
+            for filename, future in futures.items():
+                step_summaries[filename] = future.result()
+
+    for note in notes:
+        filename = note.name
+        is_final = filename == "Final_Deep_Reading_Report.md"
 
         print(f"Processing file: {filename}")
 
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        # 步骤文件：提取并总结 ### 子标题
-        subsections_meta = {}
-        if is_step and deepseek_client:
-            print(f"  Extracting subsections from: {filename}")
-            subsections = extract_subsections(content)
-
-            for title, section_text in subsections.items():
-                if len(section_text) >= 50:  # 只总结足够长的部分
-                    summary = summarize_with_deepseek(deepseek_client, title, section_text)
-                    # 清洗 key：去掉 ** 标记和编号前缀（如 "**1. 研究主题**" → "研究主题"）
-                    clean_key = title.replace("**", "").strip()
-                    clean_key = re.sub(r'^\d+\.\s*', '', clean_key).strip()
-                    subsections_meta[clean_key] = summary
-                    print(f"    {clean_key}: {summary[:20]}...")
+        subsections_meta = step_summaries.get(filename, {})
+        for clean_key, summary in subsections_meta.items():
+            print(f"    {clean_key}: {summary[:20]}...")
 
         # 注入元数据
         if is_final:
@@ -650,41 +334,22 @@ def main():
                     # Preserve "Unknown" placeholder for future manual filling
                     final_metadata[key] = pdf_val or md_val or "Unknown"
 
-            # 添加 tags
-            if "tags" not in final_metadata:
-                final_metadata["tags"] = []
-            if "paper" not in final_metadata["tags"]:
-                final_metadata["tags"].append("paper")
-            if "deep-reading" not in final_metadata["tags"]:
-                final_metadata["tags"].append("deep-reading")
-
-            new_content = inject_frontmatter(content, final_metadata)
+            note.update_metadata(final_metadata, default_tags=DEFAULT_TAGS)
         else:
             # 步骤文件：注入完整元数据（MD + PDF + subsections）
-            # Add paper tag if not present
-            if "tags" not in merged_metadata:
-                merged_metadata["tags"] = []
-            if "paper" not in merged_metadata["tags"]:
-                merged_metadata["tags"].append("paper")
-            if "deep-reading" not in merged_metadata["tags"]:
-                merged_metadata["tags"].append("deep-reading")
-
-            # Merge subsections summary into metadata
             full_metadata = merged_metadata.copy()
             if subsections_meta:
                 full_metadata.update(subsections_meta)
 
-            new_content = inject_frontmatter(content, full_metadata)
+            note.update_metadata(full_metadata, default_tags=DEFAULT_TAGS)
 
             # Add Links
-            new_content = add_bidirectional_links(new_content, filename, all_files)
+            note.append_section(bidirectional_links_section(filename, all_files),
+                                markers=(NAVIGATION_HEADING,))
 
-        if new_content != content:
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            print(f"Updated: {filename}")
-        else:
-            print(f"Skipped (no change): {filename}")
+    written = notes.save()
+    for note in notes:
+        print(f"Updated: {note.name}" if note.name in written else f"Skipped (no change): {note.name}")
 
 if __name__ == "__main__":
     main()
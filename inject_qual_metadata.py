@@ -18,26 +18,19 @@ QUAL 论文 Obsidian 元数据注入脚本
 
 import argparse
 import os
-import re
-import yaml
-import json
-import base64
 import logging
-from openai import OpenAI
 from dotenv import load_dotenv
 
+from frontmatter_store import DEFAULT_TAGS, Note, PaperNotes
+from paddleocr_extractor.md_metadata import read_markdown_metadata
+from qual_metadata_extractor.pdf_extractor import extract_pdf_metadata
+
 load_dotenv()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-try:
-    import pymupdf
-except ImportError:
-    pymupdf = None
-    logger.warning("pymupdf not installed. PDF image extraction will be disabled.")
-
 
 def _env(name, default=None):
     return os.getenv(name, default)
@@ -64,76 +57,12 @@ def parse_paddleocr_frontmatter(path: str) -> dict:
     """
     Parse metadata from PaddleOCR markdown file.
 
-    Reads YAML frontmatter and extracts additional metadata from content.
+    Reads YAML frontmatter and extracts additional metadata from the head of
+    the content, see paddleocr_extractor.md_metadata.
     """
-    if not os.path.exists(path):
-        return {}
-
-    with open(path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    metadata = {}
-
-    # Parse YAML frontmatter
-    if content.startswith("---\n"):
-        end_idx = content.find("\n---\n", 4)
-        if end_idx != -1:
-            try:
-                fm_str = content[4:end_idx]
-                metadata = yaml.safe_load(fm_str) or {}
-            except Exception:
-                pass
-
-    # Extract body content
-    body = content
-    if content.startswith("---\n"):
-        end_idx = content.find("\n---\n", 4)
-        if end_idx != -1:
-            body = content[end_idx + 5:]
-
-    # Extract additional metadata from body if not in frontmatter
-
-    # Title: first substantial line (skip headers and metadata)
-    if not metadata.get("title") or metadata.get("title", "").endswith(".pdf"):
-        for line in body.split('\n')[:30]:
-            line = line.strip()
-            # Skip markdown headers, tool info, and short lines
-            if (line and
-                not line.startswith('#') and
-                not line.startswith('*') and
-                not line.startswith('-') and
-                len(line) > 15):
-                metadata["title"] = line
-                break
-
-    # Abstract (Chinese and English patterns)
-    if not metadata.get("abstract"):
-        # Chinese
-        match = re.search(r'摘要[：:]\s*(.+?)(?=\n\n|关键词|中图分类号|Keywords)', body, re.DOTALL)
-        if match:
-            metadata["abstract"] = match.group(1).strip()[:500]
-        else:
-            # English
-            match = re.search(r'Abstract[：:.]?\s*(.+?)(?=\n\n|Keywords|Introduction)', body, re.DOTALL | re.IGNORECASE)
-            if match:
-                metadata["abstract"] = match.group(1).strip()[:500]
-
-    # Keywords (Chinese)
-    if not metadata.get("keywords"):
-        match = re.search(r'关键词[：:]\s*(.+?)(?=\n|中图分类号)', body)
-        if match:
-            keywords = match.group(1)
-            metadata["keywords"] = [k.strip() for k in re.split(r'[；;,，]', keywords) if k.strip()]
-
-    # Authors (try to extract from common patterns)
-    if not metadata.get("authors"):
-        # Look for author line patterns (often near title)
-        # Common patterns: name separated by comma, or Chinese names with spaces
-        author_match = re.search(r'(?:作者|Author)[：:s]*\s*(.+?)(?=\n|摘要|Abstract)', body, re.IGNORECASE)
-        if author_match:
-            authors_text = author_match.group(1).strip()
-            metadata["authors"] = [a.strip() for a in re.split(r'[,，、]', authors_text) if a.strip()]
-
+    metadata = read_markdown_metadata(path)
+    if isinstance(metadata.get("abstract"), str):
+        metadata["abstract"] = metadata["abstract"][:500]
     return metadata
 
 
@@ -141,6 +70,9 @@ def extract_metadata_from_pdf_images(pdf_path: str) -> dict:
     """
     将 PDF 前两页转换为图片，用 Qwen-vl-plus 提取元数据
 
+    文本层优先、灰度 JPEG 渲染与按 PDF 内容哈希缓存见
+    qual_metadata_extractor.pdf_extractor.extract_pdf_metadata。
+
     Returns:
         {
             "title": str,
@@ -149,120 +81,7 @@ def extract_metadata_from_pdf_images(pdf_path: str) -> dict:
             "year": str
         }
     """
-    if not pymupdf:
-        logger.warning("pymupdf not available, skipping PDF image extraction")
-        return {
-            "title": "Unknown",
-            "authors": ["Unknown"],
-            "journal": "Unknown",
-            "year": "Unknown"
-        }
-
-    if not os.path.exists(pdf_path):
-        logger.warning(f"PDF not found: {pdf_path}")
-        return {
-            "title": "Unknown",
-            "authors": ["Unknown"],
-            "journal": "Unknown",
-            "year": "Unknown"
-        }
-
-    doc = pymupdf.open(pdf_path)
-    images = []
-
-    for page_num in range(min(2, len(doc))):
-        page = doc.load_page(page_num)
-        mat = pymupdf.Matrix(pymupdf.Identity)
-        pix = page.get_pixmap(matrix=mat, dpi=200)
-
-        img_bytes = pix.tobytes("png")
-        img_base64 = base64.b64encode(img_bytes).decode('utf-8')
-        images.append(img_base64)
-
-    doc.close()
-
-    qwen_api_key = os.getenv("QWEN_API_KEY")
-    if not qwen_api_key:
-        logger.warning("QWEN_API_KEY not found in .env")
-        return {
-            "title": "Unknown",
-            "authors": ["Unknown"],
-            "journal": "Unknown",
-            "year": "Unknown"
-        }
-
-    client = OpenAI(
-        api_key=qwen_api_key,
-        base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
-    )
-
-    prompt = """请从以下论文图片中提取以下元数据：
-1. 论文标题（完整）
-2. 作者列表（所有作者，用逗号分隔）
-3. 发表期刊（期刊全名）
-4. 发表年份（仅数字）
-
-请以 JSON 格式返回：
-{
-    "title": "...",
-    "authors": ["...", "..."],
-    "journal": "...",
-    "year": "..."
-}
-
-注意：
-- 期刊名称和年份通常在页面顶部的页眉
-- 仔细识别页眉位置的期刊名和年份
-"""
-
-    try:
-        content_messages = [
-            {"type": "text", "text": prompt}
-        ]
-
-        for img_base64 in images:
-            content_messages.append({
-                "type": "image_url",
-                "image_url": {"url": f"data:image/png;base64,{img_base64}"}
-            })
-
-        logger.info(f"Sending request to Qwen VL with {len(images)} images...")
-
-        resp = client.chat.completions.create(
-            model="qwen-vl-plus",
-            messages=[
-                {"role": "system", "content": "你是专业的学术论文元数据提取专家。"},
-                {"role": "user", "content": content_messages}
-            ],
-            temperature=0.0
-        )
-
-        response_content = resp.choices[0].message.content
-        logger.info(f"Qwen VL response: {response_content[:200]}...")
-
-        # Extract JSON from markdown code block if present
-        if "```json" in response_content:
-            start_idx = response_content.find("```json") + 7
-            end_idx = response_content.find("```", start_idx)
-            json_str = response_content[start_idx:end_idx].strip()
-        elif "```" in response_content:
-            start_idx = response_content.find("```") + 3
-            end_idx = response_content.find("```", start_idx)
-            json_str = response_content[start_idx:end_idx].strip()
-        else:
-            json_str = response_content.strip()
-
-        result = json.loads(json_str)
-        return result
-
-    except Exception as e:
-        logger.error(f"Qwen VL extraction failed: {e}")
-        return {
-            "title": "Unknown",
-            "authors": ["Unknown"],
-            "journal": "Unknown",
-            "year": "Unknown"
-        }
+    return extract_pdf_metadata(pdf_path, max_pages=2, top_half=False)
 
 
 def has_frontmatter(content):
@@ -273,89 +92,30 @@ def inject_frontmatter(content, metadata, layer_type=None):
     """
     Inject frontmatter into markdown content.
 
-    For QUAL papers, also injects layer-specific fields (genre, key_policies, etc.)
+    Existing fields (including layer-specific ones such as genre, key_policies,
+    theories) are kept; metadata takes priority and tags are merged.
     """
-    # 1. Parse existing frontmatter if present
-    existing_meta = {}
-    body_content = content
-
-    if has_frontmatter(content):
-        end_idx = content.find("\n---\n", 4)
-        if end_idx != -1:
-            try:
-                fm_str = content[4:end_idx]
-                existing_meta = yaml.safe_load(fm_str) or {}
-                body_content = content[end_idx+5:]
-            except Exception as e:
-                logger.warning(f"Warning: Failed to parse existing frontmatter: {e}")
-
-    # 2. Merge metadata (PDF metadata takes priority)
-    merged_meta = existing_meta.copy()
-    merged_meta.update(metadata)
-
-    # 3. Handle tags (merge)
-    tags = set()
-
-    # Add existing tags
-    if "tags" in existing_meta:
-        if isinstance(existing_meta["tags"], list):
-            tags.update(existing_meta["tags"])
-        elif isinstance(existing_meta["tags"], str):
-            tags.add(existing_meta["tags"])
-
-    # Add new tags
-    if "tags" in metadata:
-        if isinstance(metadata["tags"], list):
-            tags.update(metadata["tags"])
-        elif isinstance(metadata["tags"], str):
-            tags.add(metadata["tags"])
-
-    # Always ensure standard tags
-    tags.add("paper")
-    tags.add("deep-reading")
-
-    merged_meta["tags"] = list(tags)
-
-    # 4. Layer-specific enhancements for QUAL papers
-    if layer_type:
-        if layer_type == "L1":
-            # Keep existing genre, key_policies, status_summary if present
-            pass
-        elif layer_type == "L2":
-            # Keep existing theories, key_constructs if present
-            pass
-        elif layer_type == "L3":
-            # Keep existing mechanism_type, core_components if present
-            pass
-        elif layer_type == "L4":
-            # Keep existing gaps, contributions if present
-            pass
-
-    # 5. Dump to YAML
-    yaml_str = yaml.safe_dump(merged_meta, allow_unicode=True, sort_keys=False).strip()
-
-    frontmatter_block = f"---\n{yaml_str}\n---\n\n"
-
-    return frontmatter_block + body_content
+    note = Note("", "", content)
+    note.update_metadata(metadata, default_tags=DEFAULT_TAGS)
+    return note.render()
 
 
-def add_qual_navigation_links(content, filename, all_files):
+NAVIGATION_MARKERS = ("## 导航", "## Navigation")
+
+
+def qual_navigation_section(filename, all_files):
     """
-    Add bidirectional navigation links for QUAL papers.
+    Navigation section for a QUAL file ("" if the file gets none).
 
     L1-L4 files: Link to each other and to Full Report
     Full Report: Link to all L1-L4 files
     """
-    # Check if links already exist
-    if "## 导航" in content or "## Navigation" in content:
-        return content
-
     is_full_report = "Full_Report" in filename
     is_layer_file = filename.endswith("_Context.md") or filename.endswith("_Theory.md") or \
                      filename.endswith("_Logic.md") or filename.endswith("_Value.md")
 
     if not is_layer_file and not is_full_report:
-        return content
+        return ""
 
     # Build navigation section
     links_section = "\n\n## 导航 (Navigation)\n\n"
@@ -391,7 +151,7 @@ def add_qual_navigation_links(content, filename, all_files):
         elif filename.endswith("_Value.md"):
             current_layer = "L4_Value"
         else:
-            return content
+            return ""
 
         links_section += "**其他层级：**\n"
 
@@ -407,7 +167,14 @@ def add_qual_navigation_links(content, filename, all_files):
             link_name = os.path.splitext(full_report_files[0])[0]
             links_section += f"\n**返回总报告：** [[{link_name}|Full Report]]\n"
 
-    return content + links_section
+    return links_section
+
+
+def add_qual_navigation_links(content, filename, all_files):
+    """Append the navigation section unless the content already has one."""
+    if any(marker in content for marker in NAVIGATION_MARKERS):
+        return content
+    return content + qual_navigation_section(filename, all_files)
 
 
 def main():
@@ -471,48 +238,31 @@ def main():
         logger.error(f"Target dir not found: {args.target_dir}")
         return
 
-    all_files = [f for f in os.listdir(args.target_dir) if f.endswith(".md")]
-
-    for filename in all_files:
-        path = os.path.join(args.target_dir, filename)
-
+    def is_qual_file(filename):
         # Skip non-QUAL files
         is_layer_file = filename.endswith("_Context.md") or filename.endswith("_Theory.md") or \
                          filename.endswith("_Logic.md") or filename.endswith("_Value.md")
-        is_full_report = "Full_Report" in filename
+        return is_layer_file or "Full_Report" in filename
 
-        if not is_layer_file and not is_full_report:
-            continue
+    # Load the directory once, apply metadata + navigation in memory, write each file once
+    notes = PaperNotes(args.target_dir, include=is_qual_file)
 
-        logger.info(f"Processing file: {filename}")
-
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        # Determine layer type for metadata enhancement
-        layer_type = None
-        if is_layer_file:
-            if filename.endswith("_Context.md"):
-                layer_type = "L1"
-            elif filename.endswith("_Theory.md"):
-                layer_type = "L2"
-            elif filename.endswith("_Logic.md"):
-                layer_type = "L3"
-            elif filename.endswith("_Value.md"):
-                layer_type = "L4"
+    for note in notes:
+        logger.info(f"Processing file: {note.name}")
 
         # Inject frontmatter with merged metadata
-        new_content = inject_frontmatter(content, merged_metadata, layer_type=layer_type)
+        note.update_metadata(merged_metadata, default_tags=DEFAULT_TAGS)
 
         # Add navigation links
-        new_content = add_qual_navigation_links(new_content, filename, all_files)
+        note.append_section(qual_navigation_section(note.name, notes.all_files),
+                            markers=NAVIGATION_MARKERS)
 
-        if new_content != content:
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            logger.info(f"  Updated: {filename}")
+    written = notes.save()
+    for note in notes:
+        if note.name in written:
+            logger.info(f"  Updated: {note.name}")
         else:
-            logger.info(f"  Skipped (no change): {filename}")
+            logger.info(f"  Skipped (no change): {note.name}")
 
     logger.info("QUAL metadata injection complete.")
 
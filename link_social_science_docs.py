@@ -2,6 +2,8 @@ import os
 import argparse
 import logging
 
+from frontmatter_store import PaperNotes
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -63,23 +65,16 @@ def inject_links(folder_path: str):
             
         links_map[current_file] = links
 
-    # Apply changes
+    # Apply changes: one read and one atomic write per file
+    notes = PaperNotes(folder_path, include=lambda name: name in links_map)
     for filename, lines_to_add in links_map.items():
-        file_path = os.path.join(folder_path, filename)
-        
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-            
         # Check if links already exist to avoid duplication
-        if "## Navigation" in content or "## Related Files" in content:
+        if notes[filename].append_section("\n".join(lines_to_add) + "\n",
+                                          markers=("## Navigation", "## Related Files")):
+            logger.info(f"Injected links into {filename}")
+        else:
             logger.info(f"Skipping {filename}, links already present.")
-            continue
-            
-        with open(file_path, "a", encoding="utf-8") as f:
-            f.write("\n".join(lines_to_add))
-            f.write("\n")
-            
-        logger.info(f"Injected links into {filename}")
+    notes.save()
 
 def main():
     parser = argparse.ArgumentParser(description="Inject bidirectional links into Social Science Reports")
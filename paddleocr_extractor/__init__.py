@@ -17,5 +17,6 @@ __version__ = "1.0.0"
 __author__ = "Deep Reading Agent Team"
 
 from .extractor import PaddleOCRPDFExtractor
+from .page_cache import PageCache
 
-__all__ = ["PaddleOCRPDFExtractor"]
+__all__ = ["PaddleOCRPDFExtractor", "PageCache"]
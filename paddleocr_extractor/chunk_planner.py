@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+自适应分片规划
+
+固定每片 max_pages_per_chunk 页时，表格/图片密集的页面容易整片超时，
+纯文本页面又白白多跑了几次往返。这里按"工作量"而不是页数切分：
+
+- 页面权重 page_weight(): 每页基础 1.0，嵌入图片每 MB 加 IMAGE_MB_WEIGHT，
+  没有文本层（扫描页，需整页 OCR）加 NO_TEXT_WEIGHT
+- ChunkPlanner 记录实际耗时，以指数滑动平均估计"每单位权重的秒数"，
+  让每片预计耗时落在 timeout × TARGET_TIMEOUT_FRACTION 左右；
+  还没有观测时预算为 max_pages_per_chunk 个单位（纯文本页即原来的 10 页一片）
+- 分片超时：把该分片的耗时下限记为 timeout，预算随之减半以下，
+  剩余页面按新预算重新切分（相当于把超时的分片对半拆开），而不是原样重试
+
+max_pages_per_chunk 仍是每片页数的硬上限（服务端的页数限制）。
+同一进程内同一 API 地址共用一个 ChunkPlanner，批量处理时观测结果跨文件累积。
+"""
+
+import threading
+from typing import Dict, List, Optional, Sequence
+
+from .page_cache import _resolve, _stream_bytes
+
+IMAGE_MB_WEIGHT = 1.0          # 每 MB 嵌入图片折合的额外页数
+NO_TEXT_WEIGHT = 1.0           # 无文本层页面的额外权重
+TARGET_TIMEOUT_FRACTION = 0.5  # 每片目标耗时占 timeout 的比例
+EWMA_ALPHA = 0.3
+
+
+def _image_bytes(resources, seen: set, depth: int = 0) -> int:
+    """页面（含表单 XObject）引用的图片流字节数之和，同一对象只计一次。"""
+    resources = _resolve(resources)
+    if not resources or not hasattr(resources, "get") or depth > 8:
+        return 0
+    xobjects = _resolve(resources.get("/XObject"))
+    if not xobjects:
+        return 0
+    total = 0
+    for name in xobjects.keys():
+        ref = xobjects[name]
+        ident = getattr(ref, "idnum", None)
+        if ident is not None:
+            if ident in seen:
+                continue
+            seen.add(ident)
+        xobj = _resolve(ref)
+        if not hasattr(xobj, "get"):
+            continue
+        subtype = xobj.get("/Subtype")
+        if subtype == "/Image":
+            length = _resolve(xobj.get("/Length"))
+            total += int(length) if isinstance(length, int) else len(_stream_bytes(xobj))
+        elif subtype == "/Form":
+            total += _image_bytes(xobj.get("/Resources"), seen, depth + 1)
+    return total
+
+
+def _has_text_layer(page) -> bool:
+    """内容流中出现文本绘制操作符即视为有文本层。"""
+    try:
+        contents = page.get_contents()
+        data = contents.get_data() if contents is not None else b""
+    except Exception:
+        return True  # 解析失败时不加权
+    return b"Tj" in data or b"TJ" in data
+
+
+def page_weight(page) -> float:
+    """单页预估工作量（纯文本页 = 1.0）。"""
+    try:
+        image_mb = _image_bytes(page.get("/Resources"), set()) / (1024 * 1024)
+    except Exception:
+        image_mb = 0.0
+    weight = 1.0 + image_mb * IMAGE_MB_WEIGHT
+    if not _has_text_layer(page):
+        weight += NO_TEXT_WEIGHT
+    return weight
+
+
+class ChunkPlanner:
+    """按页面权重和观测耗时切分分片（线程安全）。"""
+
+    def __init__(self):
+        self.sec_per_unit: Optional[float] = None
+        self.samples = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def budget(self, timeout: float, max_pages: int) -> float:
+        """每片的权重预算。"""
+        with self._lock:
+            if not self.sec_per_unit:
+                return float(max_pages)
+            return max(1.0, timeout * TARGET_TIMEOUT_FRACTION / self.sec_per_unit)
+
+    def next_run(self, indices: Sequence[int], weights: Dict[int, float],
+                 timeout: float, max_pages: int) -> int:
+        """
+        从有序页码列表 indices 的开头取一片：页码连续、不超过 max_pages 页、
+        累计权重不超过预算（至少一页）。返回这一片包含的页数。
+        """
+        budget = self.budget(timeout, max_pages)
+        count, total = 1, weights.get(indices[0], 1.0)
+        while count < len(indices) and count < max_pages:
+            i = indices[count]
+            if i != indices[count - 1] + 1 or total + weights.get(i, 1.0) > budget:
+                break
+            total += weights.get(i, 1.0)
+            count += 1
+        return count
+
+    def record(self, weight: float, seconds: float) -> None:
+        """记录一次成功调用的耗时。"""
+        observed = seconds / max(weight, 1e-6)
+        with self._lock:
+            self.samples += 1
+            if self.sec_per_unit is None:
+                self.sec_per_unit = observed
+            else:
+                self.sec_per_unit += EWMA_ALPHA * (observed - self.sec_per_unit)
+
+    def record_timeout(self, weight: float, timeout: float) -> None:
+        """记录一次超时：耗时至少为 timeout，下一片预算至多为本片权重的一半。"""
+        observed = timeout / max(weight, 1e-6)
+        with self._lock:
+            self.timeouts += 1
+            self.sec_per_unit = max(self.sec_per_unit or 0.0, observed)
+
+
+_planners: Dict[str, ChunkPlanner] = {}
+_planners_lock = threading.Lock()
+
+
+def planner_for(remote_url: str) -> ChunkPlanner:
+    """同一 API 地址在进程内共用的规划器。"""
+    with _planners_lock:
+        planner = _planners.get(remote_url)
+        if planner is None:
+            planner = _planners[remote_url] = ChunkPlanner()
+        return planner
+
+
+def page_weights(reader, indices: List[int]) -> Dict[int, float]:
+    """reader 中指定页的权重 {页码: 权重}。"""
+    return {i: page_weight(reader.pages[i]) for i in indices}
@@ -6,13 +6,23 @@ PaddleOCR PDF 提取器 - 独立模块
 
 import os
 import re
+import json
 import base64
+import hashlib
+import tempfile
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Dict, List, Tuple, Callable
+from typing import BinaryIO, Optional, Dict, List, Tuple, Callable
 from urllib.parse import urljoin
 
+from .chunk_planner import page_weights, planner_for
+from .md_metadata import parse_markdown_metadata
+from .page_cache import PageCache, page_runs, pdf_page_fingerprints, write_page_subset
+
 # 可选：加载 .env 文件
 try:
     from dotenv import load_dotenv
@@ -28,6 +38,50 @@ except ImportError:
     pass
 
 
+# 分片 PDF 超过此大小时由内存转存到磁盘临时文件
+CHUNK_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+class _Base64JSONBody:
+    """
+    流式 JSON 请求体：{"file": "<base64(fileobj)>", 其余字段...}
+
+    按块读取文件、逐块 Base64 编码后交给 requests 发送，不在内存中拼出
+    完整的 Base64 字符串和 JSON 文本。实现 __len__，requests 据此设置
+    Content-Length（无需服务端支持 chunked 传输）；每次迭代都从文件头
+    重新读取，重试时可直接复用。
+    """
+
+    BLOCK_SIZE = 3 * 64 * 1024  # 3 的倍数，逐块编码结果可直接拼接
+
+    def __init__(self, fileobj: BinaryIO, fields: Dict):
+        self.fileobj = fileobj
+        fileobj.seek(0, os.SEEK_END)
+        self.size = fileobj.tell()
+        rest = json.dumps(fields, ensure_ascii=True)
+        self._head = b'{"file": "'
+        self._tail = b'", ' + rest[1:].encode("ascii") if fields else b'"}'
+
+    def __len__(self) -> int:
+        return len(self._head) + 4 * ((self.size + 2) // 3) + len(self._tail)
+
+    def __iter__(self):
+        self.fileobj.seek(0)
+        yield self._head
+        carry = b""
+        while True:
+            block = self.fileobj.read(self.BLOCK_SIZE)
+            if not block:
+                break
+            block = carry + block
+            cut = len(block) - len(block) % 3
+            carry = block[cut:]
+            yield base64.b64encode(block[:cut])
+        if carry:
+            yield base64.b64encode(carry)
+        yield self._tail
+
+
 class PaddleOCRPDFExtractor:
     """
     PaddleOCR PDF 提取器
@@ -59,6 +113,9 @@ class PaddleOCRPDFExtractor:
         max_pages_per_chunk: int = 10,
         max_retries: int = 5,
         retry_interval: int = 10,
+        use_page_cache: bool = True,
+        page_cache_dir: Optional[str] = None,
+        image_download_workers: int = 8,
     ):
         """
         初始化提取器
@@ -76,9 +133,14 @@ class PaddleOCRPDFExtractor:
             use_doc_unwarping: 启用文档扭曲矫正，默认 False
             use_textline_orientation: 启用文本行方向矫正，默认 False
             use_region_detection: 启用版面区域检测，默认 True
-            max_pages_per_chunk: 每次 API 调用最大页数，默认 10
+            max_pages_per_chunk: 每次 API 调用最大页数（硬上限），默认 10；
+                实际分片按页面权重和观测耗时自适应切分（见 chunk_planner）
             max_retries: API 调用最大重试次数，默认 5
             retry_interval: 重试间隔秒数，默认 10
+            use_page_cache: 启用页级缓存，只把新增/改动的页面送去 API，默认 True
+            page_cache_dir: 页缓存目录，默认环境变量 PADDLEOCR_PAGE_CACHE，
+                否则为输出目录下的 .page_cache
+            image_download_workers: 并发下载图片的线程数（共用连接池），默认 8
         """
         self.remote_url = remote_url or os.getenv("PADDLEOCR_REMOTE_URL")
         self.remote_token = remote_token or os.getenv("PADDLEOCR_REMOTE_TOKEN")
@@ -95,6 +157,9 @@ class PaddleOCRPDFExtractor:
         self.max_pages_per_chunk = max_pages_per_chunk
         self.max_retries = max_retries
         self.retry_interval = retry_interval
+        self.use_page_cache = use_page_cache
+        self.page_cache_dir = page_cache_dir
+        self.image_download_workers = image_download_workers
         
         if not self.remote_url or not self.remote_token:
             raise ValueError(
@@ -135,7 +200,11 @@ class PaddleOCRPDFExtractor:
         
         # 调用 API 提取
         print(f"正在提取: {pdf_path.name}")
-        markdown_content, images = self._call_api(str(pdf_path))
+        markdown_content, images = self._call_api(
+            str(pdf_path),
+            page_cache=self._page_cache(out_dir),
+            need_image_data=download_images,
+        )
         
         # 下载图片
         downloaded_images = {}
@@ -195,84 +264,165 @@ class PaddleOCRPDFExtractor:
         if not pdf_path.exists():
             raise FileNotFoundError(f"PDF 文件不存在: {pdf_path}")
         
-        markdown_content, _ = self._call_api(str(pdf_path))
+        cache_dir = self.page_cache_dir or os.getenv("PADDLEOCR_PAGE_CACHE")
+        markdown_content, _ = self._call_api(
+            str(pdf_path), page_cache=self._page_cache(cache_dir) if cache_dir else None
+        )
         
-        # 解析基本信息
-        title = self._extract_title(markdown_content)
-        abstract = self._extract_abstract(markdown_content)
-        keywords = self._extract_keywords(markdown_content)
-        sections = self._extract_sections(markdown_content)
+        # 解析基本信息（单次扫描，见 md_metadata）
+        meta = parse_markdown_metadata(markdown_content, include_sections=True)
         
         return {
-            "title": title,
+            "title": meta.get("title") or "Unknown",
             "content": markdown_content,
-            "abstract": abstract,
-            "keywords": keywords,
-            "sections": sections
+            "abstract": meta.get("abstract", ""),
+            "keywords": meta.get("keywords", []),
+            "sections": meta.get("sections", [])
         }
     
-    def _split_pdf_to_chunks(self, pdf_path: str) -> List[bytes]:
+    def _page_cache(self, out_dir) -> Optional[PageCache]:
+        """按影响 API 输出的参数划分命名空间的页缓存；未启用时返回 None。"""
+        if not self.use_page_cache:
+            return None
+        options = {
+            "url": self.remote_url,
+            "table": self.use_table_recognition,
+            "formula": self.use_formula_recognition,
+            "chart": self.use_chart_recognition,
+            "seal": self.use_seal_recognition,
+            "orientation": self.use_doc_orientation_classify,
+            "unwarping": self.use_doc_unwarping,
+            "textline": self.use_textline_orientation,
+            "region": self.use_region_detection,
+        }
+        return PageCache.for_output(str(out_dir), "remote", options, cache_dir=self.page_cache_dir)
+
+    @contextmanager
+    def _open_chunk(self, pdf_path: str, reader, start: int, end: int):
         """
-        将 PDF 按 max_pages_per_chunk 切分为多个 PDF 字节块（内存操作）。
-        若总页数不超过限制则返回原始文件字节。
+        打开第 start..end-1 页组成的 PDF（二进制文件对象）。
+        覆盖整份文件时直接打开原文件；否则写入 SpooledTemporaryFile，
+        超过 CHUNK_SPOOL_MAX_BYTES 自动落盘。
         """
-        from pypdf import PdfReader, PdfWriter
-        from io import BytesIO
-
-        reader = PdfReader(pdf_path)
-        total = len(reader.pages)
-
-        if total <= self.max_pages_per_chunk:
+        if start == 0 and end == len(reader.pages):
             with open(pdf_path, "rb") as f:
-                return [f.read()]
+                yield f
+            return
+        with tempfile.SpooledTemporaryFile(max_size=CHUNK_SPOOL_MAX_BYTES) as f:
+            write_page_subset(reader, list(range(start, end)), f)
+            yield f
 
-        chunks = []
-        for start in range(0, total, self.max_pages_per_chunk):
-            end = min(start + self.max_pages_per_chunk, total)
-            writer = PdfWriter()
-            for i in range(start, end):
-                writer.add_page(reader.pages[i])
-            buf = BytesIO()
-            writer.write(buf)
-            chunks.append(buf.getvalue())
-            print(f"  分片 {len(chunks)}: 第 {start+1}-{end} 页 (共 {total} 页)")
+    def _call_api(
+        self,
+        pdf_path: str,
+        page_cache: Optional[PageCache] = None,
+        need_image_data: bool = False,
+    ) -> Tuple[str, Dict[str, str]]:
+        """
+        调用远程 API 提取 PDF，自动对长文档分片处理。
 
-        return chunks
+        未命中的页面按连续区间送去 API，每片由 ChunkPlanner 按页面权重和
+        观测耗时决定大小（不超过 max_pages_per_chunk 页）；多页分片读超时时
+        不再原样重试，而是按缩小后的预算重新切分这些页面。
 
-    def _call_api(self, pdf_path: str) -> Tuple[str, Dict[str, str]]:
-        """调用远程 API 提取 PDF，自动对长文档分片处理"""
-        chunks = self._split_pdf_to_chunks(pdf_path)
+        page_cache: 给定时逐页查缓存，只把未命中的页面送去 API，结果逐页写回缓存。
+        need_image_data: 需要下载图片时，图片仍为 URL 的缓存页视为未命中
+            （远程 URL 可能已过期）。
+        """
+        from pypdf import PdfReader
+
+        reader = PdfReader(pdf_path)
+        total = len(reader.pages)
+        multi_chunk = total > self.max_pages_per_chunk
+
+        pages: List[Optional[Tuple[str, Dict[str, str]]]] = [None] * total
+        fingerprints: List[str] = []
+        if page_cache is not None:
+            fingerprints = pdf_page_fingerprints(pdf_path, reader=reader)
+            for i, entry in enumerate(page_cache.get_many(fingerprints)):
+                if entry is None:
+                    continue
+                imgs = entry.get("images") or {}
+                if need_image_data and any(
+                    v.startswith(("http://", "https://")) for v in imgs.values()
+                ):
+                    continue
+                pages[i] = (entry.get("markdown", ""), imgs)
+            print(f"  {page_cache.summary(total)}")
+
+        missing = [i for i, p in enumerate(pages) if p is None]
+        weights = page_weights(reader, missing)
+        planner = planner_for(self.remote_url)
+        chunked = multi_chunk or len(page_runs(missing, self.max_pages_per_chunk)) > 1
+        n_chunk = 0
+        while missing:
+            count = planner.next_run(missing, weights, self.timeout, self.max_pages_per_chunk)
+            start, end = missing[0], missing[0] + count
+            weight = sum(weights[i] for i in range(start, end))
+            n_chunk += 1
+            if chunked:
+                print(f"  分片 {n_chunk}: 第 {start+1}-{end} 页 (共 {total} 页, 权重 {weight:.1f}, 剩余 {len(missing)} 页)")
+                print(f"  正在调用 API: 分片 {n_chunk}")
+
+            started = time.monotonic()
+            try:
+                with self._open_chunk(pdf_path, reader, start, end) as chunk_file:
+                    page_results = self._call_api_pages(
+                        chunk_file, 0, page_offset=start, split_on_timeout=count > 1
+                    )
+            except requests.exceptions.ReadTimeout:
+                planner.record_timeout(weight, self.timeout)
+                chunked = True
+                print(f"  分片超时（第 {start+1}-{end} 页），缩小分片后重新提交")
+                continue
+            planner.record(weight, time.monotonic() - started)
+            del missing[:count]
+
+            if len(page_results) != end - start:
+                # 返回结果与页数对不上时无法逐页归属：整段挂在首页上，不写缓存
+                md = "\n\n".join(m for m, _ in page_results)
+                imgs: Dict[str, str] = {}
+                for _, page_imgs in page_results:
+                    imgs.update(page_imgs)
+                pages[start] = (md, imgs)
+                for i in range(start + 1, end):
+                    pages[i] = ("", {})
+                continue
+
+            for offset, result in enumerate(page_results):
+                i = start + offset
+                pages[i] = result
+                if page_cache is not None:
+                    page_cache.put(fingerprints[i], {"markdown": result[0], "images": result[1]})
 
         all_markdown = []
         all_images = {}
-
-        for idx, chunk_bytes in enumerate(chunks):
-            if len(chunks) > 1:
-                print(f"  正在调用 API: 分片 {idx+1}/{len(chunks)}")
-
-            file_data = base64.b64encode(chunk_bytes).decode("ascii")
-            md, imgs = self._call_api_single(file_data, 0)
-
-            # 多分片时给图片 key 加前缀避免冲突
-            if len(chunks) > 1:
-                imgs = {f"chunk{idx}_{k}": v for k, v in imgs.items()}
-
-            all_markdown.append(md)
+        for i, (md, imgs) in enumerate(pages):
+            # 多分片时给图片 key 加分片前缀避免冲突（分片号与按 max_pages_per_chunk 切分一致）
+            if multi_chunk:
+                imgs = {f"chunk{i // self.max_pages_per_chunk}_{k}": v for k, v in imgs.items()}
+            if md:
+                all_markdown.append(md)
             all_images.update(imgs)
 
         return "\n\n".join(all_markdown), all_images
 
-    def _call_api_single(self, file_data_b64: str, file_type: int) -> Tuple[str, Dict[str, str]]:
-        """单次 API 调用，失败时自动重试，返回 (markdown_text, images_dict)"""
-        import time
-
+    def _call_api_pages(
+        self, fileobj: BinaryIO, file_type: int, page_offset: int = 0,
+        split_on_timeout: bool = False,
+    ) -> List[Tuple[str, Dict[str, str]]]:
+        """
+        单次 API 调用，失败时自动重试，返回逐页 [(markdown_text, images_dict)]。
+        fileobj: 待上传文件（可 seek 的二进制文件对象），以流式 Base64 请求体发送。
+        page_offset: 分片首页在原文件中的页码，使自动生成的图片名按原文件页码编号。
+        split_on_timeout: 读超时不重试，直接抛出 ReadTimeout 交由调用方拆分分片。
+        """
         headers = {
             "Authorization": f"token {self.remote_token}",
             "Content-Type": "application/json"
         }
 
-        payload = {
-            "file": file_data_b64,
+        fields = {
             "fileType": file_type,
             "useDocOrientationClassify": self.use_doc_orientation_classify,
             "useDocUnwarping": self.use_doc_unwarping,
@@ -283,19 +433,22 @@ class PaddleOCRPDFExtractor:
             "useSealRecognition": self.use_seal_recognition,
             "useRegionDetection": self.use_region_detection,
         }
+        body = _Base64JSONBody(fileobj, fields)
 
         last_error = None
         for attempt in range(1, self.max_retries + 1):
             try:
                 response = requests.post(
                     self.remote_url,
-                    json=payload,
+                    data=body,
                     headers=headers,
                     timeout=self.timeout
                 )
                 response.raise_for_status()
                 break
             except Exception as e:
+                if split_on_timeout and isinstance(e, requests.exceptions.ReadTimeout):
+                    raise
                 last_error = e
                 if attempt < self.max_retries:
                     print(f"  API 调用失败 (第 {attempt}/{self.max_retries} 次): {e}")
@@ -308,12 +461,12 @@ class PaddleOCRPDFExtractor:
         result = response.json()
         layout_results = result["result"]["layoutParsingResults"]
 
-        markdown_parts = []
-        images = {}
+        pages = []
 
-        for i, res in enumerate(layout_results):
+        for i, res in enumerate(layout_results, page_offset):
+            images = {}
             if "markdown" in res and "text" in res["markdown"]:
-                markdown_parts.append(res["markdown"]["text"])
+                markdown_text = res["markdown"]["text"]
 
                 # 收集图片 (处理 dict 或 list 格式)
                 if "images" in res["markdown"]:
@@ -337,54 +490,101 @@ class PaddleOCRPDFExtractor:
                                 images[f"output_{i}_{j}.jpg"] = item["url"]
                             elif isinstance(item, str):
                                 images[f"output_{i}_{j}.jpg"] = item
+            else:
+                markdown_text = ""
+            pages.append((markdown_text, images))
 
-        return "\n\n".join(markdown_parts), images
+        return pages
     
+    @staticmethod
+    def _fetch_image(session: requests.Session, img_value: str) -> bytes:
+        """取图片字节：URL 经共享 session 下载，否则按 Base64 解码"""
+        if img_value.startswith(("http://", "https://")):
+            resp = session.get(img_value, timeout=30)
+            resp.raise_for_status()
+            return resp.content
+        return base64.b64decode(img_value)
+
     def _download_images(self, images: Dict[str, str], out_dir: Path) -> Dict[str, str]:
-        """保存图片到本地，支持 Base64 和 URL 两种来源"""
+        """
+        保存图片到本地，支持 Base64 和 URL 两种来源。
+
+        相同来源只取一次；URL 由线程池经同一连接池并发下载；内容相同的图片
+        （如各分片重复出现的期刊 logo）按 sha256 去重，只落盘一份，其余引用
+        指向同一文件。
+        """
         imgs_dir = out_dir / "imgs"
         imgs_dir.mkdir(parents=True, exist_ok=True)
 
         downloaded = {}
         print(f"正在保存 {len(images)} 张图片...")
 
+        # 来源 → 引用它的图片名（按出现顺序）
+        names_by_source: Dict[str, List[str]] = {}
         for img_name, img_value in images.items():
-            try:
-                # 清理文件名
-                safe_name = img_name.replace("/", "_").replace("\\", "_")
-                safe_name = "".join(c for c in safe_name if c.isalnum() or c in "._-")
-                if not safe_name:
-                    safe_name = f"img_{len(downloaded)}.jpg"
-
-                local_path = imgs_dir / safe_name
-
-                if img_value.startswith(("http://", "https://")):
-                    # URL 模式：HTTP 下载
-                    resp = requests.get(img_value, timeout=30)
-                    resp.raise_for_status()
-                    img_data = resp.content
-                else:
-                    # Base64 模式：直接解码
-                    img_data = base64.b64decode(img_value)
-
-                with open(local_path, "wb") as f:
-                    f.write(img_data)
-
-                # 按 img_name (key) 映射，因为 markdown 中引用的是 key
-                downloaded[img_name] = f"imgs/{safe_name}"
-
-            except Exception as e:
-                print(f"  [FAIL] {img_name}: {e}")
-
-        print(f"成功保存 {len(downloaded)} 张图片")
+            names_by_source.setdefault(img_value, []).append(img_name)
+
+        workers = max(1, min(self.image_download_workers, len(names_by_source)))
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        saved_by_hash: Dict[str, str] = {}
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    (names, pool.submit(self._fetch_image, session, value))
+                    for value, names in names_by_source.items()
+                ]
+                # 按提交顺序落盘，保证去重后保留的文件名稳定
+                for names, future in futures:
+                    try:
+                        img_data = future.result()
+                    except Exception as e:
+                        for img_name in names:
+                            print(f"  [FAIL] {img_name}: {e}")
+                        continue
+
+                    digest = hashlib.sha256(img_data).hexdigest()
+                    rel_path = saved_by_hash.get(digest)
+                    if rel_path is None:
+                        # 清理文件名
+                        safe_name = names[0].replace("/", "_").replace("\\", "_")
+                        safe_name = "".join(c for c in safe_name if c.isalnum() or c in "._-")
+                        if not safe_name:
+                            safe_name = f"img_{len(saved_by_hash)}.jpg"
+                        try:
+                            with open(imgs_dir / safe_name, "wb") as f:
+                                f.write(img_data)
+                        except OSError as e:
+                            print(f"  [FAIL] {names[0]}: {e}")
+                            continue
+                        rel_path = f"imgs/{safe_name}"
+                        saved_by_hash[digest] = rel_path
+
+                    # 按 img_name (key) 映射，因为 markdown 中引用的是 key
+                    for img_name in names:
+                        downloaded[img_name] = rel_path
+        finally:
+            session.close()
+
+        dedup_note = f"（去重后 {len(saved_by_hash)} 个文件）" if len(saved_by_hash) < len(downloaded) else ""
+        print(f"成功保存 {len(downloaded)} 张图片{dedup_note}")
         return downloaded
-    
+
     def _update_image_paths(self, markdown: str, image_map: Dict[str, str]) -> str:
-        """更新 markdown 中的图片路径（按 key 即原始引用名替换为本地路径）"""
-        for original_ref, local_path in image_map.items():
-            markdown = markdown.replace(original_ref, local_path)
-        return markdown
-    
+        """
+        更新 markdown 中的图片路径（按 key 即原始引用名替换为本地路径）。
+        所有引用名编成一个正则（长名优先），单次扫描完成替换。
+        """
+        if not image_map:
+            return markdown
+        pattern = re.compile("|".join(
+            re.escape(ref) for ref in sorted(image_map, key=len, reverse=True)
+        ))
+        return pattern.sub(lambda m: image_map[m.group(0)], markdown)
+
     def _save_markdown(self, output_path: Path, pdf_name: str, content: str):
         """保存 Markdown 文件"""
         header = f"""---
@@ -405,41 +605,6 @@ extract_date: {datetime.now().isoformat()}
         
         output_path.write_text(header + content, encoding="utf-8")
         print(f"已保存: {output_path}")
-    
-    def _extract_title(self, content: str) -> str:
-        """从内容中提取标题"""
-        lines = content.split('\n')
-        for line in lines[:10]:
-            line = line.strip()
-            if line and not line.startswith('#') and len(line) > 10:
-                return line
-        return "Unknown"
-    
-    def _extract_abstract(self, content: str) -> str:
-        """提取摘要"""
-        match = re.search(r'摘要[：:]\s*(.+?)(?=\n\n|关键词|中图分类号)', content, re.DOTALL)
-        if match:
-            return match.group(1).strip()
-        return ""
-    
-    def _extract_keywords(self, content: str) -> List[str]:
-        """提取关键词"""
-        match = re.search(r'关键词[：:]\s*(.+?)(?=\n|中图分类号)', content)
-        if match:
-            keywords = match.group(1)
-            return [k.strip() for k in re.split(r'[；;]', keywords) if k.strip()]
-        return []
-    
-    def _extract_sections(self, content: str) -> List[Dict]:
-        """提取章节结构"""
-        sections = []
-        pattern = r'##\s*([一二三四五六七八九十]+[、\.])\s*(.+?)(?=\n)'
-        for match in re.finditer(pattern, content):
-            sections.append({
-                "number": match.group(1),
-                "title": match.group(2).strip()
-            })
-        return sections
 
 
 # 便捷函数
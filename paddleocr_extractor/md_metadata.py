@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Markdown 元数据解析
+
+从提取结果 Markdown（PaddleOCR / pdfplumber 输出，或 API 返回的原始文本）中
+解析 title / authors / abstract / keywords / journal / year（可选 sections），
+供 paddleocr_pipeline、inject_obsidian_meta、inject_qual_metadata 与
+PaddleOCRPDFExtractor.extract_text_only 共用。
+
+- 只读取文件开头 HEAD_BYTES（需要章节列表时才读全文）
+- 正则在模块加载时编译一次；正文按行只扫描一遍，摘要/关键词/作者/章节
+  由各自的状态机在同一次扫描中完成，标题/作者/期刊/年份取自前 40 行缓冲
+- 同一内容（sha256）的解析结果在进程内缓存
+"""
+
+import copy
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+HEAD_BYTES = 64 * 1024
+CACHE_SIZE = 256
+
+TITLE_SCAN_LINES = 30
+AUTHOR_SCAN_LINES = 40
+HEADER_SCAN_LINES = 15
+
+_RE_ABSTRACT_CN = re.compile(r'(?:摘要|内容提要)[：:]\s*')
+_RE_ABSTRACT_CN_STOP = re.compile(r'关键词|中图分类号|Keywords')
+_RE_ABSTRACT_EN = re.compile(r'Abstract[：:.]?\s*', re.IGNORECASE)
+_RE_ABSTRACT_EN_STOP = re.compile(r'Keywords|Introduction', re.IGNORECASE)
+_RE_ABSTRACT_LINE = re.compile(r'^(?:摘要|内容提要|Abstract)[：:.]')
+_RE_KEYWORDS = re.compile(r'关键词[：:]\s*')
+_RE_KEYWORDS_STOP = re.compile(r'中图分类号')
+_RE_KEYWORD_SEP = re.compile(r'[；;,，]')
+_RE_AUTHOR_LABEL = re.compile(r'(?:^|[^\[])(?:作者|Author)[：:]\s*(.+?)(?=摘要|Abstract|$)', re.IGNORECASE)
+_RE_AUTHOR_SEP = re.compile(r'[,，、]')
+_RE_AUTHOR_LINE_SKIP = re.compile(r'^[-\d\s]+$')
+_RE_AUTHOR_LINE_BAD = re.compile(r'[。：:；\d]')
+_RE_NAME_SPLIT = re.compile(r'[\s　]+')
+_RE_CJK_CHAR = re.compile(r'^[\u4e00-\u9fff]$')
+_RE_CJK_WORD = re.compile(r'^[\u4e00-\u9fff]+$')
+_RE_YEAR_LINE = re.compile(r'^\d{4}\s*年')
+_RE_FILENAME_AUTHOR = re.compile(r'_([\u4e00-\u9fff]{2,4})$')
+_RE_JOURNAL_CN = re.compile(r'《(.+?)》')
+_RE_JOURNAL_EN = re.compile(r'^([A-Z][A-Za-z\s&]+(?:Journal|Review|Economics|Quarterly|Science))')
+_RE_YEAR_STRONG = re.compile(r'(20[12]\d)\s*[年,，]')
+_RE_YEAR_WEAK = re.compile(r'\(?(20[12]\d)\)?')
+_RE_SECTION = re.compile(r'^#+\s*([一二三四五六七八九十]+[、.])\s*(.+?)\s*$')
+
+_cache: "OrderedDict[Tuple[str, bool], Dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def split_frontmatter(content: str) -> Tuple[Dict, str]:
+    """拆分 YAML frontmatter 与正文；无 frontmatter 或解析失败时返回 ({}, 原文/正文)。"""
+    if not content.startswith("---\n"):
+        return {}, content
+    end_idx = content.find("\n---\n", 4)
+    if end_idx == -1:
+        return {}, content
+    body = content[end_idx + 5:]
+    try:
+        import yaml
+        metadata = yaml.safe_load(content[4:end_idx]) or {}
+    except Exception:
+        return {}, body
+    return (metadata if isinstance(metadata, dict) else {}), body
+
+
+def merge_spaced_chinese_names(text: str) -> str:
+    """
+    合并被空格隔开的单个汉字为姓名。
+
+    中文论文常把作者名逐字隔开，如 "刘　行　张昊天　田　轩" → "刘行 张昊天 田轩"：
+    从左到右贪心地把相邻单字合并为 2-3 字一组（常见姓名长度）。
+    """
+    tokens = _RE_NAME_SPLIT.split(text.strip())
+    if not tokens:
+        return text
+
+    result = []
+    buf = ""
+    for tok in tokens:
+        if len(tok) == 1 and _RE_CJK_CHAR.match(tok):
+            buf += tok
+            # 满 3 字（姓 + 双字名）即输出
+            if len(buf) >= 3:
+                result.append(buf)
+                buf = ""
+        else:
+            if buf:
+                result.append(buf)
+                buf = ""
+            result.append(tok)
+    if buf:
+        # 剩余 1-2 字：能并入上一个短名就并入，否则单独保留
+        if len(buf) == 1 and result and 1 <= len(result[-1]) <= 2 and _RE_CJK_WORD.match(result[-1]):
+            result[-1] += buf
+        else:
+            result.append(buf)
+    return ' '.join(result)
+
+
+class _Span:
+    """正文中"标记：内容……终止符/空行"形式的字段（摘要、关键词）的逐行状态机。"""
+
+    def __init__(self, start: re.Pattern, stop: re.Pattern, single_line: bool = False):
+        self.start, self.stop, self.single_line = start, stop, single_line
+        self.parts: List[str] = []
+        self.state = "idle"
+        self.value: Optional[str] = None
+
+    def feed(self, line: str) -> None:
+        if self.state == "done":
+            return
+        if self.state == "idle":
+            m = self.start.search(line)
+            if not m:
+                return
+            self.state = "collect"
+            line = line[m.end():]
+            if not line.strip():
+                return  # 标记独占一行：内容从下一行开始
+        elif not self.parts and not line.strip():
+            return  # 标记后的空行
+        elif not line.strip():
+            self._finish()
+            return
+        s = self.stop.search(line)
+        if s:
+            self.parts.append(line[:s.start()])
+            self._finish()
+        else:
+            self.parts.append(line)
+            if self.single_line:
+                self._finish()
+
+    def _finish(self) -> None:
+        self.state = "done"
+        value = "\n".join(self.parts).strip()
+        self.value = value or None
+
+
+def _split_keywords(text: str) -> List[str]:
+    parts = _RE_KEYWORD_SEP.split(text)
+    if len(parts) == 1 and ' ' in text.strip():
+        # 部分中文论文用空格分隔关键词：每个至少 2 字才按空格切分
+        space_parts = text.strip().split()
+        if all(len(p) >= 2 for p in space_parts):
+            parts = space_parts
+    return [k.strip() for k in parts if k.strip()]
+
+
+def _title_from_lines(lines: List[str]) -> Optional[str]:
+    """首个非文件名的一级标题；否则首个足够长的非标题/列表行。"""
+    for stripped in lines[:TITLE_SCAN_LINES]:
+        if (stripped.startswith('# ') and not stripped.startswith('## ')
+                and not stripped.endswith('.pdf') and len(stripped) > 4):
+            return stripped[2:].strip()
+    for stripped in lines[:TITLE_SCAN_LINES]:
+        if stripped and stripped[0] not in '#*-' and len(stripped) > 15:
+            return stripped
+    return None
+
+
+def _authors_from_lines(lines: List[str]) -> Optional[List[str]]:
+    """中文论文：标题行与摘要行之间的作者行（2-4 字姓名，至少 2 个）。"""
+    title_idx = abstract_idx = -1
+    for i, stripped in enumerate(lines[:AUTHOR_SCAN_LINES]):
+        if title_idx == -1 and stripped.startswith('# ') and not stripped.startswith('## '):
+            title_idx = i
+        if _RE_ABSTRACT_LINE.match(stripped):
+            abstract_idx = i
+            break
+
+    # 没有一级标题时以摘要前首个足够长的正文行为标题
+    if title_idx == -1 and abstract_idx > 0:
+        for i, stripped in enumerate(lines[:abstract_idx]):
+            if (stripped and stripped[0] not in '#*-' and len(stripped) > 15
+                    and not _RE_YEAR_LINE.match(stripped)):
+                title_idx = i
+                break
+
+    if title_idx < 0 or abstract_idx <= title_idx:
+        return None
+    for line in lines[title_idx + 1:abstract_idx]:
+        if (not line or line[0] in '#*' or line.startswith('—')
+                or _RE_AUTHOR_LINE_SKIP.match(line)):
+            continue
+        if len(line) < 80 and not _RE_AUTHOR_LINE_BAD.search(line):
+            names = _RE_NAME_SPLIT.split(merge_spaced_chinese_names(line))
+            valid = [n for n in names if n and 2 <= len(n) <= 4 and _RE_CJK_WORD.match(n)]
+            if len(valid) >= 2:
+                return valid
+    return None
+
+
+def _journal_year_from_lines(lines: List[str]) -> Tuple[Optional[str], Optional[str]]:
+    """页眉区域（正文前 15 行）的期刊名与年份。"""
+    journal_cn = journal_en = year_strong = year_weak = None
+    for line in lines[:HEADER_SCAN_LINES]:
+        if journal_cn is None:
+            m = _RE_JOURNAL_CN.search(line)
+            if m:
+                journal_cn = m.group(1)
+        if journal_en is None:
+            m = _RE_JOURNAL_EN.match(line)
+            if m:
+                journal_en = m.group(1).strip()
+        if year_strong is None:
+            m = _RE_YEAR_STRONG.search(line)
+            if m:
+                year_strong = m.group(1)
+        if year_weak is None:
+            m = _RE_YEAR_WEAK.search(line)
+            if m:
+                year_weak = m.group(1)
+    return journal_cn or journal_en, year_strong or year_weak
+
+
+def parse_markdown_metadata(content: str, include_sections: bool = False) -> Dict:
+    """
+    解析 Markdown 元数据（frontmatter 字段优先，缺失的再从正文提取）。
+
+    Args:
+        content: Markdown 全文或文件开头
+        include_sections: 是否提取 "## 一、标题" 形式的章节列表
+
+    Returns:
+        frontmatter 字段 + title / authors / abstract / keywords / journal / year
+        （正文中找不到的字段不出现）；include_sections 时另含 sections
+    """
+    metadata, body = split_frontmatter(content)
+    metadata = dict(metadata)
+
+    abstract_cn = _Span(_RE_ABSTRACT_CN, _RE_ABSTRACT_CN_STOP)
+    abstract_en = _Span(_RE_ABSTRACT_EN, _RE_ABSTRACT_EN_STOP)
+    keywords = _Span(_RE_KEYWORDS, _RE_KEYWORDS_STOP, single_line=True)
+    author_label: Optional[str] = None
+    head: List[str] = []
+    sections: List[Dict] = []
+
+    for line in body.split('\n'):
+        if len(head) < AUTHOR_SCAN_LINES:
+            head.append(line.strip())
+        abstract_cn.feed(line)
+        if abstract_cn.value is None:
+            abstract_en.feed(line)
+        keywords.feed(line)
+        if author_label is None:
+            m = _RE_AUTHOR_LABEL.search(line)
+            if m:
+                author_label = m.group(1).strip()
+        if include_sections:
+            m = _RE_SECTION.match(line)
+            if m:
+                sections.append({"number": m.group(1), "title": m.group(2)})
+
+    title = metadata.get("title")
+    if not title or (isinstance(title, str) and title.endswith(".pdf")):
+        found = _title_from_lines(head)
+        if found:
+            metadata["title"] = found
+
+    if not metadata.get("abstract"):
+        abstract = abstract_cn.value or abstract_en.value
+        if abstract:
+            metadata["abstract"] = abstract
+
+    if not metadata.get("keywords") and keywords.value:
+        metadata["keywords"] = _split_keywords(keywords.value)
+
+    if not metadata.get("authors"):
+        authors = None
+        if author_label:
+            authors = [a.strip() for a in _RE_AUTHOR_SEP.split(author_label) if a.strip()]
+        if not authors:
+            authors = _authors_from_lines(head)
+        if not authors:
+            # 文件名形如 "标题_作者.pdf"
+            stem = os.path.splitext(str(metadata.get("source_pdf") or ""))[0]
+            m = _RE_FILENAME_AUTHOR.search(stem)
+            if m:
+                authors = [m.group(1)]
+        if authors:
+            metadata["authors"] = authors
+
+    if not metadata.get("journal") or not metadata.get("year"):
+        journal, year = _journal_year_from_lines(head)
+        if journal and not metadata.get("journal"):
+            metadata["journal"] = journal
+        if year and not metadata.get("year"):
+            metadata["year"] = year
+
+    if include_sections and not metadata.get("sections") and sections:
+        metadata["sections"] = sections
+
+    return metadata
+
+
+def read_markdown_metadata(path: str, include_sections: bool = False) -> Dict:
+    """
+    读取 Markdown 文件并解析元数据（结果按内容 sha256 在进程内缓存）。
+
+    只读取开头 HEAD_BYTES；include_sections 时读取全文。文件不存在时返回 {}。
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read() if include_sections else f.read(HEAD_BYTES)
+    except OSError:
+        return {}
+    if not include_sections and len(data) == HEAD_BYTES:
+        cut = data.rfind(b'\n')
+        if cut > 0:
+            data = data[:cut + 1]
+
+    key = (hashlib.sha256(data).hexdigest(), include_sections)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return copy.deepcopy(cached)
+
+    metadata = parse_markdown_metadata(data.decode('utf-8', errors='replace'), include_sections)
+    with _cache_lock:
+        _cache[key] = copy.deepcopy(metadata)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return metadata
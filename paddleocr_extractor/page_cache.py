@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+页级提取缓存
+
+按 PDF 单页内容指纹缓存提取结果（Markdown 片段 + 图片），供远程 API、本地
+PPStructureV3 与 pdfplumber 三种提取器共用。重新下载的期刊 PDF 即使只换了
+封面页，其余未变的页面也直接命中缓存，只有新增或改动的页面才送去 OCR。
+
+指纹只取决于页面本身：页面尺寸/旋转、内容流、所引用的 XObject（图片、表单）
+数据及字体名，与文件名、文件内对象编号、元数据无关。
+
+缓存布局：<cache_dir>/<namespace>/<key[:2]>/<key>.json
+    namespace 由提取器名称 + 影响输出的参数决定（如是否识别表格/公式），
+    参数变化时自然落入新的命名空间，互不覆盖。
+写入经临时文件 + os.replace，并发进程不会读到半写的条目。
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIRNAME = ".page_cache"
+
+# 页面字典中参与指纹计算的键
+_GEOMETRY_KEYS = ("/MediaBox", "/CropBox", "/Rotate")
+
+
+def _resolve(obj):
+    return obj.get_object() if hasattr(obj, "get_object") else obj
+
+
+def _stream_bytes(obj) -> bytes:
+    """流对象的原始（未解码）字节；取不到时退回解码后的数据。"""
+    data = getattr(obj, "_data", None)
+    if isinstance(data, bytes):
+        return data
+    try:
+        return obj.get_data()
+    except Exception:
+        return b""
+
+
+def _hash_resources(h, resources, seen: set, depth: int = 0):
+    """把 XObject 数据与字体名写入摘要，表单 XObject 递归展开。"""
+    resources = _resolve(resources)
+    if not resources or depth > 8:
+        return
+    fonts = _resolve(resources.get("/Font")) if hasattr(resources, "get") else None
+    if fonts:
+        for name in sorted(fonts.keys()):
+            font = _resolve(fonts[name])
+            h.update(f"F{name}={font.get('/BaseFont', '') if hasattr(font, 'get') else ''};".encode())
+    xobjects = _resolve(resources.get("/XObject")) if hasattr(resources, "get") else None
+    if not xobjects:
+        return
+    for name in sorted(xobjects.keys()):
+        ref = xobjects[name]
+        ident = getattr(ref, "idnum", None)
+        xobj = _resolve(ref)
+        h.update(f"X{name};".encode())
+        if ident is not None and ident in seen:
+            continue
+        if ident is not None:
+            seen.add(ident)
+        h.update(hashlib.sha256(_stream_bytes(xobj)).digest())
+        if hasattr(xobj, "get") and xobj.get("/Subtype") == "/Form":
+            _hash_resources(h, xobj.get("/Resources"), seen, depth + 1)
+
+
+def page_fingerprint(page) -> str:
+    """单页内容指纹（pypdf PageObject → sha256 十六进制串）。"""
+    h = hashlib.sha256()
+    for key in _GEOMETRY_KEYS:
+        value = page.get(key)
+        if value is not None:
+            h.update(f"{key}={_resolve(value)!r};".encode())
+    contents = page.get_contents()
+    if contents is not None:
+        h.update(_stream_bytes(contents))
+    _hash_resources(h, page.get("/Resources"), set())
+    return h.hexdigest()
+
+
+def pdf_page_fingerprints(pdf_path: str, reader=None) -> List[str]:
+    """逐页指纹列表；可传入已打开的 PdfReader 避免重复解析。"""
+    if reader is None:
+        from pypdf import PdfReader
+        reader = PdfReader(str(pdf_path))
+    return [page_fingerprint(page) for page in reader.pages]
+
+
+def page_runs(indices: Iterable[int], max_run: int) -> List[Tuple[int, int]]:
+    """把页码集合合并为连续区间 [(start, end_exclusive)]，每段不超过 max_run 页。"""
+    runs: List[Tuple[int, int]] = []
+    max_run = max(1, int(max_run))
+    for i in sorted(set(indices)):
+        if runs and runs[-1][1] == i and i - runs[-1][0] < max_run:
+            runs[-1] = (runs[-1][0], i + 1)
+        else:
+            runs.append((i, i + 1))
+    return runs
+
+
+class PageCache:
+    """
+    页级提取缓存。
+
+    条目值为 dict，约定字段：
+        markdown: 该页的 Markdown / 纯文本片段
+        images:   {图片引用名: Base64 或 URL}（可选）
+        其余字段由各提取器自行定义（如本地引擎的跨页续接标记）
+    """
+
+    def __init__(self, cache_dir: str, namespace: str, options: Optional[Dict] = None):
+        self.cache_dir = str(cache_dir)
+        opts = json.dumps(options or {}, sort_keys=True, ensure_ascii=False)
+        self.namespace = f"{namespace}-{hashlib.sha256(opts.encode()).hexdigest()[:12]}"
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def for_output(cls, out_dir: str, namespace: str, options: Optional[Dict] = None,
+                   cache_dir: Optional[str] = None) -> "PageCache":
+        """默认缓存目录：环境变量 PADDLEOCR_PAGE_CACHE，否则 <out_dir>/.page_cache。"""
+        root = cache_dir or os.getenv("PADDLEOCR_PAGE_CACHE") or os.path.join(str(out_dir), DEFAULT_CACHE_DIRNAME)
+        return cls(root, namespace, options)
+
+    def _path(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, self.namespace, fingerprint[:2], f"{fingerprint}.json")
+
+    def get(self, fingerprint: str) -> Optional[Dict]:
+        try:
+            with open(self._path(fingerprint), "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def get_many(self, fingerprints: List[str]) -> List[Optional[Dict]]:
+        return [self.get(fp) for fp in fingerprints]
+
+    def put(self, fingerprint: str, value: Dict) -> None:
+        path = self._path(fingerprint)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"页缓存写入失败 ({fingerprint[:12]}): {e}")
+
+    def summary(self, total: int) -> str:
+        return f"页缓存命中 {self.hits}/{total} 页"
+
+
+def write_page_subset(reader, indices: List[int], dest) -> None:
+    """把 reader 中指定页写成新的 PDF（dest 为路径或可写二进制文件对象）。"""
+    from pypdf import PdfWriter
+    writer = PdfWriter()
+    for i in indices:
+        writer.add_page(reader.pages[i])
+    if isinstance(dest, (str, Path)):
+        with open(dest, "wb") as f:
+            writer.write(f)
+    else:
+        writer.write(dest)
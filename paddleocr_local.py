@@ -17,15 +17,19 @@ Usage:
 
     # Custom output directory
     python paddleocr_local.py "paper.pdf" --out_dir "my_output"
+
+    # CPU-only node: 4 engine processes × 4 pinned cores, shared page-range queue
+    python paddleocr_local.py "E:\\pdf\\003" --cpu_workers 4 --threads_per_worker 4
 """
 
 import argparse
 import os
 import sys
 import logging
+import tempfile
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -75,39 +79,83 @@ def is_available() -> bool:
 # Core extraction
 # ---------------------------------------------------------------------------
 
-def extract_pdf_local(
-    pdf_path: str,
-    out_dir: str = "paddleocr_md",
-    use_table_recognition: bool = True,
-    use_formula_recognition: bool = True,
-    use_chart_recognition: bool = False,
-    use_doc_orientation_classify: bool = False,
-) -> Tuple[str, Dict]:
-    """Extract a single PDF to Markdown using the local PPStructureV3 engine.
+def _page_markdown(page_result) -> Tuple[str, bool]:
+    """Return (markdown_text, continued_from_prev) for one page result.
 
-    The output file uses the same naming convention and YAML frontmatter as
-    the remote PaddleOCR API path so that downstream modules (paddleocr_segment,
-    deep_read_pipeline, etc.) work without modification.
+    Each result is a LayoutParsingResultV2 (dict-like).
+    result.markdown -> dict with keys:
+      markdown_texts (str), page_index (int),
+      page_continuation_flags (tuple[bool, bool])
+    """
+    md_info = getattr(page_result, "markdown", None)
+    if isinstance(md_info, dict):
+        md_text = md_info.get("markdown_texts", "")
+        flags = md_info.get("page_continuation_flags", (False, False))
+    elif isinstance(md_info, str):
+        md_text, flags = md_info, (False, False)
+    else:
+        md_text, flags = "", (False, False)
+    continued_from_prev = bool(flags[0]) if len(flags) > 0 else False
+    return md_text or "", continued_from_prev
+
+
+def _iter_results(engine, path: str):
+    """Page results as the engine produces them.
+
+    ``PPStructureV3.predict()`` is ``list(predict_iter())``, which keeps every
+    page's LayoutParsingResult (page images, layout boxes) alive until the
+    whole document is done; ``predict_iter()`` hands them out one at a time.
+    """
+    predict_iter = getattr(engine, "predict_iter", None)
+    return predict_iter(path) if predict_iter is not None else iter(engine.predict(path))
 
-    Args:
-        pdf_path: Path to the source PDF file.
-        out_dir: Directory for the generated ``.md`` file.
-        use_table_recognition: Enable table structure recognition.
-        use_formula_recognition: Enable LaTeX formula recognition.
-        use_chart_recognition: Enable chart/figure parsing.
-        use_doc_orientation_classify: Enable automatic page orientation correction.
 
-    Returns:
-        Tuple of ``(md_file_path, metadata_dict)``.
+class PageCountMismatch(RuntimeError):
+    """The engine returned a different number of pages than were sent to it."""
+
+
+def _predict_pages(engine, pdf_path: Path, indices: Optional[List[int]], reader=None) -> List[Tuple[str, bool]]:
+    """Run the engine on the whole PDF (indices=None) or only on the given pages.
+
+    Each page result is converted to ``(markdown, continued_from_prev)`` as
+    soon as it is yielded, so only one raw result is held at a time.
+
+    A page subset goes through a temporary PDF, where the first page of every
+    run would otherwise have no predecessor and never be marked as continuing
+    the previous page's paragraph.  The page before each run is therefore
+    predicted along with it as context and its own output is dropped, so the
+    flags match a whole-document run.
     """
-    pdf_path = Path(pdf_path).resolve()
-    if not pdf_path.exists():
-        raise FileNotFoundError(f"PDF not found: {pdf_path}")
+    if indices is None:
+        return [_page_markdown(r) for r in _iter_results(engine, str(pdf_path))]
 
-    out_dir = Path(out_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
+    from paddleocr_extractor.page_cache import write_page_subset
+
+    wanted = set(indices)
+    order = sorted(wanted | {i - 1 for i in wanted if i > 0})
+    fd, tmp_path = tempfile.mkstemp(suffix=".pdf", prefix=pdf_path.stem[:40] + "_")
+    os.close(fd)
+    try:
+        write_page_subset(reader, order, tmp_path)
+        predicted = [_page_markdown(r) for r in _iter_results(engine, tmp_path)]
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    if len(predicted) != len(order):
+        raise PageCountMismatch(f"page count mismatch ({len(predicted)} vs {len(order)})")
+    by_index = dict(zip(order, predicted))
+    return [by_index[i] for i in indices]
 
-    # --- initialise engine ---
+
+def _build_engine_kwargs(
+    use_table_recognition: bool = True,
+    use_formula_recognition: bool = True,
+    use_chart_recognition: bool = False,
+    use_doc_orientation_classify: bool = False,
+) -> Dict:
+    """PPStructureV3 kwargs for the given flags (only non-default values)."""
     engine_kwargs = {}
     if not use_table_recognition:
         engine_kwargs["use_table_recognition"] = False
@@ -117,43 +165,42 @@ def extract_pdf_local(
         engine_kwargs["use_chart_recognition"] = True
     if use_doc_orientation_classify:
         engine_kwargs["use_doc_orientation_classify"] = True
+    return engine_kwargs
 
-    engine = _get_engine(**engine_kwargs)
-
-    # --- run prediction ---
-    logger.info(f"Running PPStructureV3 on: {pdf_path.name}")
-    results = list(engine.predict(str(pdf_path)))
-
-    # --- collect per-page markdown ---
-    # Each result is a LayoutParsingResultV2 (dict-like).
-    # result.markdown -> dict with keys:
-    #   markdown_texts (str), page_index (int),
-    #   page_continuation_flags (tuple[bool, bool])
-    page_markdowns = []
-    for page_result in results:
-        md_info = getattr(page_result, "markdown", None)
-        if isinstance(md_info, dict):
-            md_text = md_info.get("markdown_texts", "")
-        elif isinstance(md_info, str):
-            md_text = md_info
-        else:
-            md_text = ""
-        page_markdowns.append(md_text or "")
 
+def _lookup_page_cache(pdf_path: Path, out_dir: Path, engine_kwargs: Dict, page_cache_dir: Optional[str]):
+    """Fingerprint pages and read cached results.
+
+    Returns ``(cache, reader, fingerprints, pages)`` where ``pages[i]`` is the
+    cached ``(markdown, continued_from_prev)`` or None for a miss.
+    """
+    from pypdf import PdfReader
+    from paddleocr_extractor.page_cache import PageCache, pdf_page_fingerprints
+
+    reader = PdfReader(str(pdf_path))
+    fingerprints = pdf_page_fingerprints(str(pdf_path), reader=reader)
+    cache = PageCache.for_output(str(out_dir), "local", engine_kwargs, cache_dir=page_cache_dir)
+    pages: List[Optional[Tuple[str, bool]]] = [None] * len(fingerprints)
+    for i, entry in enumerate(cache.get_many(fingerprints)):
+        if entry is not None:
+            pages[i] = (entry.get("markdown", ""), bool(entry.get("continued_from_prev")))
+    logger.info(f"Page cache: {cache.hits}/{len(pages)} pages reused for {pdf_path.name}")
+    return cache, reader, fingerprints, pages
+
+
+def _write_local_md(pdf_path: Path, out_dir: Path, pages: List[Tuple[str, bool]],
+                    extract_mode: str = "local_gpu") -> Tuple[str, Dict]:
+    """Merge page results and write ``<stem>_paddleocr.md``; returns (path, metadata)."""
     # Merge pages respecting continuation flags
     merged_parts = []
-    for i, page_result in enumerate(results):
-        md_info = getattr(page_result, "markdown", {})
-        flags = md_info.get("page_continuation_flags", (False, False)) if isinstance(md_info, dict) else (False, False)
-        continued_from_prev = flags[0] if len(flags) > 0 else False
-
+    for md_text, continued_from_prev in pages:
         if continued_from_prev and merged_parts:
             # This page continues from the previous one — join without double newline
-            merged_parts[-1] = merged_parts[-1].rstrip() + "\n" + page_markdowns[i].lstrip()
+            merged_parts[-1] = merged_parts[-1].rstrip() + "\n" + md_text.lstrip()
         else:
-            merged_parts.append(page_markdowns[i])
+            merged_parts.append(md_text)
 
-    total_pages = len(page_markdowns)
+    total_pages = len(pages)
     body = "\n\n".join(merged_parts).strip()
 
     # --- build output markdown with YAML frontmatter ---
@@ -164,7 +211,7 @@ def extract_pdf_local(
         f"title: {pdf_path.name}",
         f"source_pdf: {pdf_path.name}",
         "extractor: paddleocr",
-        "extract_mode: local_gpu",
+        f"extract_mode: {extract_mode}",
         f"extract_date: {now}",
         f"total_pages: {total_pages}",
         "---",
@@ -186,7 +233,7 @@ def extract_pdf_local(
         "keywords": [],
         "sections": [],
         "extractor": "paddleocr",
-        "extract_mode": "local_gpu",
+        "extract_mode": extract_mode,
         "stats": {
             "total_pages": total_pages,
             "total_chars": len(body),
@@ -196,6 +243,257 @@ def extract_pdf_local(
     return str(out_path), metadata
 
 
+def extract_pdf_local(
+    pdf_path: str,
+    out_dir: str = "paddleocr_md",
+    use_table_recognition: bool = True,
+    use_formula_recognition: bool = True,
+    use_chart_recognition: bool = False,
+    use_doc_orientation_classify: bool = False,
+    use_page_cache: bool = True,
+    page_cache_dir: Optional[str] = None,
+) -> Tuple[str, Dict]:
+    """Extract a single PDF to Markdown using the local PPStructureV3 engine.
+
+    The output file uses the same naming convention and YAML frontmatter as
+    the remote PaddleOCR API path so that downstream modules (paddleocr_segment,
+    deep_read_pipeline, etc.) work without modification.
+
+    Args:
+        pdf_path: Path to the source PDF file.
+        out_dir: Directory for the generated ``.md`` file.
+        use_table_recognition: Enable table structure recognition.
+        use_formula_recognition: Enable LaTeX formula recognition.
+        use_chart_recognition: Enable chart/figure parsing.
+        use_doc_orientation_classify: Enable automatic page orientation correction.
+        use_page_cache: Reuse per-page results cached by content fingerprint
+            (see ``paddleocr_extractor.page_cache``); only new or changed
+            pages are sent through the engine.
+        page_cache_dir: Cache root (default: ``$PADDLEOCR_PAGE_CACHE`` or
+            ``<out_dir>/.page_cache``).
+
+    Returns:
+        Tuple of ``(md_file_path, metadata_dict)``.
+    """
+    pdf_path = Path(pdf_path).resolve()
+    if not pdf_path.exists():
+        raise FileNotFoundError(f"PDF not found: {pdf_path}")
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    engine_kwargs = _build_engine_kwargs(
+        use_table_recognition, use_formula_recognition,
+        use_chart_recognition, use_doc_orientation_classify,
+    )
+
+    # --- page cache: fingerprint pages, only predict the misses ---
+    cache, reader, fingerprints, pages = None, None, [], []
+    if use_page_cache:
+        try:
+            cache, reader, fingerprints, pages = _lookup_page_cache(
+                pdf_path, out_dir, engine_kwargs, page_cache_dir,
+            )
+        except Exception as e:
+            logger.warning(f"Page cache disabled for {pdf_path.name}: {e}")
+            cache, reader, fingerprints, pages = None, None, [], []
+    missing = [i for i, p in enumerate(pages) if p is None]
+
+    if cache is None or missing:
+        engine = _get_engine(**engine_kwargs)
+        logger.info(f"Running PPStructureV3 on: {pdf_path.name}"
+                    + (f" ({len(missing)}/{len(pages)} pages)" if cache is not None else ""))
+
+    if cache is None:
+        pages = _predict_pages(engine, pdf_path, None)
+    elif missing:
+        subset = None if len(missing) == len(pages) else missing
+        try:
+            predicted = _predict_pages(engine, pdf_path, subset, reader=reader)
+            if len(predicted) != len(missing):
+                raise PageCountMismatch(f"page count mismatch ({len(predicted)} vs {len(missing)})")
+        except PageCountMismatch as e:
+            # Engine output doesn't line up with the page list: don't cache,
+            # fall back to a plain full-document run.
+            logger.warning(f"{e}, re-running full PDF")
+            pages = _predict_pages(engine, pdf_path, None)
+        else:
+            for i, result in zip(missing, predicted):
+                pages[i] = result
+                cache.put(fingerprints[i], {"markdown": result[0], "continued_from_prev": result[1]})
+
+    return _write_local_md(pdf_path, out_dir, pages)
+
+
+# ---------------------------------------------------------------------------
+# Batch mode — CPU worker pool
+# ---------------------------------------------------------------------------
+
+def _init_cpu_worker(counter, threads_per_worker: int, engine_kwargs: Dict):
+    """Process-pool initializer: pin this worker to its own cores, build one engine.
+
+    *counter* is a shared ``multiprocessing.Value`` handing out worker slots,
+    so worker k gets cores ``[k*threads, (k+1)*threads)`` (Linux only).
+    """
+    with counter.get_lock():
+        slot = counter.value
+        counter.value += 1
+
+    n_cpu = os.cpu_count() or 1
+    cores = {(slot * threads_per_worker + j) % n_cpu for j in range(threads_per_worker)}
+    if hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError:
+            pass
+    # Must be set before paddle is imported by _get_engine
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "CPU_NUM"):
+        os.environ[var] = str(threads_per_worker)
+
+    _get_engine(device="cpu", cpu_threads=threads_per_worker, **engine_kwargs)
+
+
+def _predict_job(pdf_path: str, indices: List[int], engine_kwargs: Dict,
+                 threads_per_worker: int) -> List[Tuple[str, bool]]:
+    """Worker: run this process's engine on the given pages of one PDF.
+
+    Page results are converted as the engine yields them (see
+    :func:`_iter_results`), so the heavy LayoutParsingResult objects are
+    released page by page instead of being held for the whole range.
+    """
+    from pypdf import PdfReader
+
+    engine = _get_engine(device="cpu", cpu_threads=threads_per_worker, **engine_kwargs)
+    reader = PdfReader(pdf_path)
+    subset = None if len(indices) == len(reader.pages) else indices
+    return _predict_pages(engine, Path(pdf_path), subset, reader=reader)
+
+
+def extract_pdfs_local_batch(
+    pdf_paths: List[str],
+    out_dir: str = "paddleocr_md",
+    workers: Optional[int] = None,
+    threads_per_worker: int = 4,
+    pages_per_job: int = 4,
+    use_table_recognition: bool = True,
+    use_formula_recognition: bool = True,
+    use_chart_recognition: bool = False,
+    use_doc_orientation_classify: bool = False,
+    use_page_cache: bool = True,
+    page_cache_dir: Optional[str] = None,
+) -> Iterator[Tuple[str, Optional[str], Dict, Optional[Exception]]]:
+    """Extract many PDFs on a pool of CPU worker processes.
+
+    Every PDF is split into (pdf, page-range) jobs of at most *pages_per_job*
+    pages; all jobs of the batch go into one shared queue served by *workers*
+    processes, each holding its own PPStructureV3 instance (``device="cpu"``)
+    pinned to *threads_per_worker* cores.  Pages found in the page cache are
+    not queued.  A job that does not start at page 0 also predicts the page
+    before its range, only so that its first page's paragraph-continuation
+    flag matches a whole-document run (see :func:`_predict_pages`).  A PDF's
+    Markdown is written as soon as its last job finishes.
+
+    Args:
+        pdf_paths: Source PDF files.
+        out_dir: Directory for the generated ``.md`` files.
+        workers: Engine processes (default: ``cpu_count // threads_per_worker``).
+        threads_per_worker: CPU threads (and pinned cores) per engine.
+        pages_per_job: Maximum pages per queued job.
+        use_page_cache / page_cache_dir: See :func:`extract_pdf_local`.
+        Other flags: see :func:`extract_pdf_local`.
+
+    Yields:
+        ``(pdf_path, md_file_path, metadata_dict, error)`` in completion order;
+        ``md_file_path`` is None and ``error`` is set when a file failed.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from paddleocr_extractor.page_cache import page_runs
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    threads_per_worker = max(1, int(threads_per_worker))
+    workers = max(1, int(workers or (os.cpu_count() or 1) // threads_per_worker))
+    engine_kwargs = _build_engine_kwargs(
+        use_table_recognition, use_formula_recognition,
+        use_chart_recognition, use_doc_orientation_classify,
+    )
+
+    # --- plan: page cache lookup + page-range jobs per PDF ---
+    docs = {}   # pdf_path -> {"path", "cache", "fingerprints", "pages", "pending", "error"}
+    jobs = []   # (pdf_path, [page indices])
+    for raw_path in pdf_paths:
+        pdf_path = Path(raw_path).resolve()
+        try:
+            if not pdf_path.exists():
+                raise FileNotFoundError(f"PDF not found: {pdf_path}")
+            if use_page_cache:
+                cache, reader, fingerprints, pages = _lookup_page_cache(
+                    pdf_path, out_dir, engine_kwargs, page_cache_dir,
+                )
+            else:
+                from pypdf import PdfReader
+                cache, fingerprints = None, []
+                pages = [None] * len(PdfReader(str(pdf_path)).pages)
+        except Exception as e:
+            yield raw_path, None, {}, e
+            continue
+        missing = [i for i, p in enumerate(pages) if p is None]
+        runs = page_runs(missing, pages_per_job)
+        docs[str(pdf_path)] = {
+            "raw": raw_path, "path": pdf_path, "cache": cache, "fingerprints": fingerprints,
+            "pages": pages, "pending": len(runs), "error": None,
+        }
+        jobs.extend((str(pdf_path), list(range(start, end))) for start, end in runs)
+
+    def finish(key: str):
+        doc = docs[key]
+        if doc["error"] is not None:
+            return doc["raw"], None, {}, doc["error"]
+        try:
+            md_path, metadata = _write_local_md(doc["path"], out_dir, doc["pages"], extract_mode="local_cpu")
+        except Exception as e:
+            return doc["raw"], None, {}, e
+        return doc["raw"], md_path, metadata, None
+
+    for key, doc in docs.items():
+        if doc["pending"] == 0:
+            yield finish(key)
+    if not jobs:
+        return
+
+    logger.info(f"Batch: {len(jobs)} jobs from {len(docs)} PDFs on {workers} CPU workers "
+                f"× {threads_per_worker} threads")
+    counter = multiprocessing.Value("i", 0)
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(jobs)),
+        initializer=_init_cpu_worker,
+        initargs=(counter, threads_per_worker, engine_kwargs),
+    ) as pool:
+        futures = {
+            pool.submit(_predict_job, key, indices, engine_kwargs, threads_per_worker): (key, indices)
+            for key, indices in jobs
+        }
+        for future in as_completed(futures):
+            key, indices = futures[future]
+            doc = docs[key]
+            try:
+                predicted = future.result()
+                if len(predicted) != len(indices):
+                    raise PageCountMismatch(f"page count mismatch ({len(predicted)} vs {len(indices)})")
+            except Exception as e:
+                doc["error"] = doc["error"] or e
+            else:
+                for i, result in zip(indices, predicted):
+                    doc["pages"][i] = result
+                    if doc["cache"] is not None:
+                        doc["cache"].put(doc["fingerprints"][i],
+                                         {"markdown": result[0], "continued_from_prev": result[1]})
+            doc["pending"] -= 1
+            if doc["pending"] == 0:
+                yield finish(key)
+
+
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
@@ -223,6 +521,14 @@ def main():
     parser.add_argument("--no_formula", action="store_true", help="Disable formula recognition")
     parser.add_argument("--chart", action="store_true", help="Enable chart parsing")
     parser.add_argument("--orientation", action="store_true", help="Enable document orientation correction")
+    parser.add_argument("--no_page_cache", action="store_true",
+                        help="Re-extract every page instead of reusing the page-level cache")
+    parser.add_argument("--cpu_workers", type=int, default=0,
+                        help="Batch mode: number of CPU engine processes (0 = single GPU/CPU engine, default)")
+    parser.add_argument("--threads_per_worker", type=int, default=4,
+                        help="Batch mode: CPU threads / pinned cores per engine (default: 4)")
+    parser.add_argument("--pages_per_job", type=int, default=4,
+                        help="Batch mode: max pages per queued job (default: 4)")
     args = parser.parse_args()
 
     pdfs = _iter_pdfs(args.input_path)
@@ -233,6 +539,29 @@ def main():
     os.makedirs(args.out_dir, exist_ok=True)
 
     success = 0
+    if args.cpu_workers > 0:
+        for pdf_path, md_path, metadata, error in extract_pdfs_local_batch(
+            pdfs,
+            out_dir=args.out_dir,
+            workers=args.cpu_workers,
+            threads_per_worker=args.threads_per_worker,
+            pages_per_job=args.pages_per_job,
+            use_table_recognition=not args.no_table,
+            use_formula_recognition=not args.no_formula,
+            use_chart_recognition=args.chart,
+            use_doc_orientation_classify=args.orientation,
+            use_page_cache=not args.no_page_cache,
+        ):
+            if error is not None:
+                logger.error(f"Failed to process {pdf_path}: {error}")
+                continue
+            logger.info(f"Output: {md_path}  (pages: {metadata['stats']['total_pages']}, "
+                        f"chars: {metadata['stats']['total_chars']})")
+            success += 1
+        logger.info(f"\n{'='*60}")
+        logger.info(f"Done. {success}/{len(pdfs)} files processed successfully.")
+        return 0 if success == len(pdfs) else 1
+
     for pdf_path in pdfs:
         logger.info(f"\n{'='*60}")
         logger.info(f"Processing: {os.path.basename(pdf_path)}")
@@ -244,6 +573,7 @@ def main():
                 use_formula_recognition=not args.no_formula,
                 use_chart_recognition=args.chart,
                 use_doc_orientation_classify=args.orientation,
+                use_page_cache=not args.no_page_cache,
             )
             logger.info(f"Output: {md_path}")
             logger.info(f"Pages: {metadata['stats']['total_pages']}, "
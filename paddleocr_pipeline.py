@@ -12,7 +12,7 @@ import sys
 import logging
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -28,6 +28,8 @@ def extract_pdf_with_paddleocr(
     use_chart_recognition: bool = False,
     use_doc_orientation_classify: bool = False,
     max_pages_per_chunk: int = 10,
+    use_page_cache: bool = True,
+    max_retries: Optional[int] = None,
 ) -> Tuple[str, Dict]:
     """
     Extract PDF using PaddleOCR remote API.
@@ -41,6 +43,8 @@ def extract_pdf_with_paddleocr(
         use_chart_recognition: Enable chart parsing (default: False)
         use_doc_orientation_classify: Enable doc orientation correction (default: False)
         max_pages_per_chunk: Max pages per API call for chunking (default: 10)
+        use_page_cache: Only send pages missing from the page-level cache (default: True)
+        max_retries: Override the extractor's API retry count (e.g. 1 for a health probe)
 
     Returns:
         Tuple of (markdown_path, metadata_dict)
@@ -50,12 +54,15 @@ def extract_pdf_with_paddleocr(
     """
     from paddleocr_extractor import PaddleOCRPDFExtractor
 
+    retry_kwargs = {"max_retries": max_retries} if max_retries is not None else {}
     extractor = PaddleOCRPDFExtractor(
+        **retry_kwargs,
         use_table_recognition=use_table_recognition,
         use_formula_recognition=use_formula_recognition,
         use_chart_recognition=use_chart_recognition,
         use_doc_orientation_classify=use_doc_orientation_classify,
         max_pages_per_chunk=max_pages_per_chunk,
+        use_page_cache=use_page_cache,
     )
 
     # Use extract_pdf for full extraction
@@ -89,6 +96,7 @@ def extract_pdf_local_paddleocr(
     use_formula_recognition: bool = True,
     use_chart_recognition: bool = False,
     use_doc_orientation_classify: bool = False,
+    use_page_cache: bool = True,
 ) -> Tuple[str, Dict]:
     """
     Extract PDF using local PaddleOCR (GPU via PPStructureV3).
@@ -100,6 +108,7 @@ def extract_pdf_local_paddleocr(
         use_formula_recognition: Enable formula recognition (default: True)
         use_chart_recognition: Enable chart parsing (default: False)
         use_doc_orientation_classify: Enable doc orientation correction (default: False)
+        use_page_cache: Only run the engine on pages missing from the page-level cache (default: True)
 
     Returns:
         Tuple of (markdown_path, metadata_dict)
@@ -114,10 +123,55 @@ def extract_pdf_local_paddleocr(
         use_formula_recognition=use_formula_recognition,
         use_chart_recognition=use_chart_recognition,
         use_doc_orientation_classify=use_doc_orientation_classify,
+        use_page_cache=use_page_cache,
     )
 
 
-def extract_pdf_legacy(pdf_path: str, out_dir: str = "paddleocr_md") -> Tuple[str, Dict]:
+# Pages per process-pool task for legacy extraction; smaller PDFs stay in-process
+# unless a shared executor is given (batch mode).
+LEGACY_SHARD_PAGES = 8
+
+
+def _legacy_extract_pages(pdf_path: str, indices: List[int], method: str) -> List[str]:
+    """Worker: extract text of the given pages with pypdf or pdfplumber (runs in a child process)."""
+    if method == "pypdf":
+        from pypdf import PdfReader
+        reader = PdfReader(pdf_path)
+        return [reader.pages[i].extract_text() or "" for i in indices]
+
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        return [pdf.pages[i].extract_text() or "" for i in indices]
+
+
+def _legacy_page_texts(pdf_path: str, indices: List[int], method: str, executor=None, reader=None) -> List[str]:
+    """
+    Extract text of *indices* in order.  With an executor the pages are split
+    into shards of LEGACY_SHARD_PAGES and extracted in parallel; without one
+    they are read in-process (reusing *reader* for pypdf when given).
+    """
+    if not indices:
+        return []
+    if executor is None:
+        if method == "pypdf" and reader is not None:
+            return [reader.pages[i].extract_text() or "" for i in indices]
+        return _legacy_extract_pages(pdf_path, indices, method)
+
+    shards = [indices[k:k + LEGACY_SHARD_PAGES] for k in range(0, len(indices), LEGACY_SHARD_PAGES)]
+    futures = [executor.submit(_legacy_extract_pages, pdf_path, shard, method) for shard in shards]
+    texts: List[str] = []
+    for future in futures:
+        texts.extend(future.result())
+    return texts
+
+
+def extract_pdf_legacy(
+    pdf_path: str,
+    out_dir: str = "paddleocr_md",
+    use_page_cache: bool = True,
+    max_workers: int = 1,
+    executor=None,
+) -> Tuple[str, Dict]:
     """
     Fallback extraction using legacy pdfplumber/pypdf method.
 
@@ -127,44 +181,29 @@ def extract_pdf_legacy(pdf_path: str, out_dir: str = "paddleocr_md") -> Tuple[st
     Args:
         pdf_path: Path to the PDF file
         out_dir: Output directory for markdown files
+        use_page_cache: Reuse per-page text cached by page content fingerprint (default: True)
+        max_workers: Process count for page-range sharding when no executor is
+            given; only used for PDFs longer than LEGACY_SHARD_PAGES (default: 1)
+        executor: Shared ProcessPoolExecutor (see extract_pdfs_legacy); every
+            page range of this PDF becomes a task on it
 
     Returns:
         Tuple of (markdown_path, metadata_dict)
     """
     from pypdf import PdfReader
-    import pdfplumber
 
     pdf_path = Path(pdf_path)
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    # Extract text per page (hybrid method)
-    texts = []
-    try:
-        reader = PdfReader(str(pdf_path))
-        for page in reader.pages:
-            t = page.extract_text() or ""
-            texts.append(t)
-
-        # If pypdf extracted nothing, try pdfplumber
-        if not any(t.strip() for t in texts):
-            texts = []
-            with pdfplumber.open(str(pdf_path)) as pdf:
-                for page in pdf.pages:
-                    t = page.extract_text() or ""
-                    texts.append(t)
-    except Exception as e:
-        logger.warning(f"pypdf failed, trying pdfplumber: {e}")
-        texts = []
-        with pdfplumber.open(str(pdf_path)) as pdf:
-            for page in pdf.pages:
-                t = page.extract_text() or ""
-                texts.append(t)
-
-    # Extract PDF metadata
-    metadata = {"pages": len(texts)}
+    # One reader serves page count, fingerprints, in-process text and metadata
+    reader = None
+    metadata = {}
+    cache, fingerprints = None, []
+    texts: List[Optional[str]] = []
     try:
         reader = PdfReader(str(pdf_path))
+        texts = [None] * len(reader.pages)
         meta = reader.metadata
         if meta:
             metadata.update({
@@ -172,8 +211,55 @@ def extract_pdf_legacy(pdf_path: str, out_dir: str = "paddleocr_md") -> Tuple[st
                 "author": str(getattr(meta, "author", "") or ""),
                 "subject": str(getattr(meta, "subject", "") or ""),
             })
-    except Exception:
-        pass
+        # Page-level cache: only pages whose content changed are re-extracted
+        if use_page_cache:
+            from paddleocr_extractor.page_cache import PageCache, pdf_page_fingerprints
+            fingerprints = pdf_page_fingerprints(str(pdf_path), reader=reader)
+            cache = PageCache.for_output(str(out_dir), "legacy")
+            for i, entry in enumerate(cache.get_many(fingerprints)):
+                if entry is not None:
+                    texts[i] = entry.get("markdown", "")
+            logger.info(f"[Fallback] Page cache: {cache.hits}/{len(texts)} pages reused")
+    except Exception as e:
+        if reader is not None:
+            logger.warning(f"Page cache disabled: {e}")
+            cache, fingerprints = None, []
+    missing = [i for i, t in enumerate(texts) if t is None]
+
+    own_executor = None
+    if executor is None and max_workers > 1 and len(missing) > LEGACY_SHARD_PAGES:
+        from concurrent.futures import ProcessPoolExecutor
+        shards = -(-len(missing) // LEGACY_SHARD_PAGES)
+        executor = own_executor = ProcessPoolExecutor(max_workers=min(max_workers, shards))
+
+    try:
+        # Extract text per page (hybrid method)
+        try:
+            if reader is None:
+                raise RuntimeError("PdfReader could not open the file")
+            for i, t in zip(missing, _legacy_page_texts(str(pdf_path), missing, "pypdf", executor, reader)):
+                texts[i] = t
+
+            # If pypdf extracted nothing, try pdfplumber
+            if not any(t.strip() for t in texts):
+                for i, t in zip(missing, _legacy_page_texts(str(pdf_path), missing, "pdfplumber", executor)):
+                    texts[i] = t
+        except Exception as e:
+            logger.warning(f"pypdf failed, trying pdfplumber: {e}")
+            import pdfplumber
+            cache = None
+            with pdfplumber.open(str(pdf_path)) as pdf:
+                n_pages = len(pdf.pages)
+            texts = _legacy_page_texts(str(pdf_path), list(range(n_pages)), "pdfplumber", executor)
+    finally:
+        if own_executor is not None:
+            own_executor.shutdown()
+
+    if cache is not None:
+        for i in missing:
+            cache.put(fingerprints[i], {"markdown": texts[i]})
+
+    metadata["pages"] = len(texts)
 
     # Render markdown (similar format to PaddleOCR output for compatibility)
     now = datetime.now().isoformat(timespec="seconds")
@@ -218,6 +304,71 @@ def extract_pdf_legacy(pdf_path: str, out_dir: str = "paddleocr_md") -> Tuple[st
     }
 
 
+def extract_pdfs_legacy(
+    pdf_paths: List[str],
+    out_dir: str = "paddleocr_md",
+    use_page_cache: bool = True,
+    max_workers: Optional[int] = None,
+) -> Iterator[Tuple[str, Optional[str], Dict, Optional[Exception]]]:
+    """
+    Batch legacy extraction: all PDFs share one process pool, so worker
+    start-up is paid once per batch and small files run side by side while
+    large ones are split into page-range shards.
+
+    Args:
+        pdf_paths: PDF files, e.g. from iter_pdfs()
+        out_dir: Output directory for markdown files
+        use_page_cache: Reuse per-page text cached by page content fingerprint (default: True)
+        max_workers: Process count (default: os.cpu_count())
+
+    Yields:
+        (pdf_path, markdown_path, metadata_dict, error) in completion order;
+        markdown_path is None and error is set when a file failed.
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+    workers = max(1, int(max_workers or os.cpu_count() or 1))
+    # Feeder threads do the per-file work in this process (open, fingerprint,
+    # cache, write) and keep the process pool supplied with page shards.
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            ThreadPoolExecutor(max_workers=workers) as feeders:
+        futures = {
+            feeders.submit(extract_pdf_legacy, p, out_dir, use_page_cache, executor=pool): p
+            for p in pdf_paths
+        }
+        for future in as_completed(futures):
+            pdf_path = futures[future]
+            try:
+                md_path, metadata = future.result()
+            except Exception as e:
+                yield pdf_path, None, {}, e
+            else:
+                yield pdf_path, md_path, metadata, None
+
+
+def _is_backend_failure(exc: BaseException) -> bool:
+    """
+    Does *exc* say something about the endpoint (network, timeout, server
+    error) rather than about this particular PDF?  Only those trip the breaker.
+    """
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is not None:
+        return status >= 500 or status in (401, 403, 408, 429)
+    return (type(exc).__module__ or "").startswith(("requests", "urllib3", "http.client", "socket"))
+
+
+def _open_backend_health(out_dir: str):
+    """Shared breaker state for this batch (see backend_health.py); None if unavailable."""
+    try:
+        from backend_health import BackendHealth, default_db_path
+        return BackendHealth(default_db_path(out_dir))
+    except Exception as e:
+        logger.warning(f"Backend health tracking disabled: {e}")
+        return None
+
+
 def extract_with_fallback(
     pdf_path: str,
     out_dir: str = "paddleocr_md",
@@ -229,6 +380,9 @@ def extract_with_fallback(
     max_pages_per_chunk: int = 10,
     no_fallback: bool = False,
     force_local: bool = False,
+    use_page_cache: bool = True,
+    use_circuit_breaker: bool = True,
+    health=None,
 ) -> Tuple[str, Dict]:
     """
     Extract PDF with automatic fallback.
@@ -236,6 +390,13 @@ def extract_with_fallback(
     Fallback chain: Remote PaddleOCR API → Local PaddleOCR (GPU) → pdfplumber.
     Use *force_local* to skip the remote API and go straight to local GPU.
 
+    In the normal chain every backend sits behind a circuit breaker whose
+    state is shared by all processes of the batch (<out_dir>/.backend_health.db):
+    after 3 consecutive endpoint failures the backend is skipped for a
+    cooldown, then a single probe with one API attempt decides whether it is
+    back.  A dead remote endpoint therefore costs a few failed files per
+    batch instead of max_retries × retry_interval on every file.
+
     Args:
         pdf_path: Path to the PDF file
         out_dir: Output directory for markdown files
@@ -247,6 +408,9 @@ def extract_with_fallback(
         max_pages_per_chunk: Max pages per API call for chunking (default: 10)
         no_fallback: If True, disable automatic fallback and raise errors directly
         force_local: If True, skip remote API and use local PaddleOCR GPU directly
+        use_page_cache: Reuse per-page results across runs for every backend (default: True)
+        use_circuit_breaker: Skip backends whose breaker is open (default: True)
+        health: BackendHealth instance to use instead of the default state file
 
     Returns:
         Tuple of (markdown_path, metadata_dict)
@@ -256,6 +420,7 @@ def extract_with_fallback(
         use_formula_recognition=use_formula_recognition,
         use_chart_recognition=use_chart_recognition,
         use_doc_orientation_classify=use_doc_orientation_classify,
+        use_page_cache=use_page_cache,
     )
 
     # --- force_local: skip remote, go straight to local GPU ---
@@ -267,7 +432,7 @@ def extract_with_fallback(
             return extract_pdf_local_paddleocr(pdf_path, out_dir, **ocr_kwargs)
         except Exception as e:
             logger.warning(f"Local PaddleOCR failed ({type(e).__name__}: {e}), falling back to pdfplumber")
-            return extract_pdf_legacy(pdf_path, out_dir)
+            return extract_pdf_legacy(pdf_path, out_dir, use_page_cache=use_page_cache)
 
     # --- no_fallback: only try remote API ---
     if no_fallback:
@@ -279,39 +444,80 @@ def extract_with_fallback(
         )
 
     # --- normal mode: remote API → local GPU → pdfplumber ---
-    try:
-        logger.info(f"Attempting PaddleOCR remote API extraction for: {pdf_path}")
-        return extract_pdf_with_paddleocr(
-            pdf_path, out_dir, download_images,
-            max_pages_per_chunk=max_pages_per_chunk,
-            **ocr_kwargs,
-        )
-    except ValueError as e:
-        logger.warning(f"PaddleOCR not configured (missing credentials): {e}")
-    except (ConnectionError, TimeoutError) as e:
-        logger.warning(f"PaddleOCR API unavailable: {e}")
-    except Exception as e:
-        logger.warning(f"PaddleOCR remote extraction failed ({type(e).__name__}: {e})")
+    if health is None and use_circuit_breaker:
+        health = _open_backend_health(out_dir)
+
+    def admitted(name: str, label: str) -> Tuple[bool, bool]:
+        if health is None:
+            return True, False
+        allowed, probe = health.allow(name)
+        if not allowed:
+            logger.info(f"{label} skipped: circuit open after repeated failures")
+        elif probe:
+            logger.info(f"{label}: probing whether the backend has recovered")
+        return allowed, probe
+
+    def failed(name: str, exc: BaseException, probe: bool, trip: bool = False):
+        if health is None:
+            return
+        if trip or _is_backend_failure(exc) or name == "local":
+            health.record_failure(name, f"{type(exc).__name__}: {exc}", trip=trip)
+        elif probe:
+            health.release(name)
+
+    allowed, probe = admitted("remote", "PaddleOCR remote API")
+    if allowed:
+        try:
+            logger.info(f"Attempting PaddleOCR remote API extraction for: {pdf_path}")
+            result = extract_pdf_with_paddleocr(
+                pdf_path, out_dir, download_images,
+                max_pages_per_chunk=max_pages_per_chunk,
+                max_retries=1 if probe else None,
+                **ocr_kwargs,
+            )
+        except ValueError as e:
+            logger.warning(f"PaddleOCR not configured (missing credentials): {e}")
+            if health is not None and probe:
+                health.release("remote")
+        except (ConnectionError, TimeoutError) as e:
+            logger.warning(f"PaddleOCR API unavailable: {e}")
+            failed("remote", e, probe)
+        except Exception as e:
+            logger.warning(f"PaddleOCR remote extraction failed ({type(e).__name__}: {e})")
+            failed("remote", e, probe)
+        else:
+            if health is not None:
+                health.record_success("remote")
+            return result
 
     # Fallback to local GPU
-    try:
-        logger.info(f"Attempting local PaddleOCR (GPU) extraction for: {pdf_path}")
-        return extract_pdf_local_paddleocr(pdf_path, out_dir, **ocr_kwargs)
-    except ImportError:
-        logger.warning("Local PaddleOCR not installed (paddleocr/paddlex missing), falling back to pdfplumber")
-    except Exception as e:
-        logger.warning(f"Local PaddleOCR failed ({type(e).__name__}: {e}), falling back to pdfplumber")
+    allowed, probe = admitted("local", "Local PaddleOCR")
+    if allowed:
+        try:
+            logger.info(f"Attempting local PaddleOCR (GPU) extraction for: {pdf_path}")
+            result = extract_pdf_local_paddleocr(pdf_path, out_dir, **ocr_kwargs)
+        except ImportError as e:
+            logger.warning("Local PaddleOCR not installed (paddleocr/paddlex missing), falling back to pdfplumber")
+            failed("local", e, probe, trip=True)
+        except Exception as e:
+            logger.warning(f"Local PaddleOCR failed ({type(e).__name__}: {e}), falling back to pdfplumber")
+            failed("local", e, probe)
+        else:
+            if health is not None:
+                health.record_success("local")
+            return result
 
     # Final fallback: pdfplumber
-    return extract_pdf_legacy(pdf_path, out_dir)
+    return extract_pdf_legacy(pdf_path, out_dir, use_page_cache=use_page_cache)
 
 
 def extract_metadata_from_paddleocr_md(md_path: str) -> Dict:
     """
     Parse metadata from PaddleOCR markdown file.
 
-    Reads YAML frontmatter and applies extract_text_only patterns
-    for additional metadata extraction.
+    Reads YAML frontmatter and fills in title, authors, abstract, keywords,
+    journal, year and sections from the body with the shared single-pass
+    parser (paddleocr_extractor.md_metadata).
 
     Args:
         md_path: Path to the PaddleOCR markdown file
@@ -319,68 +525,9 @@ def extract_metadata_from_paddleocr_md(md_path: str) -> Dict:
     Returns:
         Dict with title, authors, abstract, keywords, sections
     """
-    import re
-    import yaml
+    from paddleocr_extractor.md_metadata import read_markdown_metadata
 
-    md_path = Path(md_path)
-    if not md_path.exists():
-        return {}
-
-    content = md_path.read_text(encoding="utf-8")
-
-    # Parse YAML frontmatter
-    metadata = {}
-    if content.startswith("---\n"):
-        end_idx = content.find("\n---\n", 4)
-        if end_idx != -1:
-            try:
-                fm_str = content[4:end_idx]
-                metadata = yaml.safe_load(fm_str) or {}
-            except Exception:
-                pass
-
-    # Extract body content (after frontmatter)
-    body = content
-    if content.startswith("---\n"):
-        end_idx = content.find("\n---\n", 4)
-        if end_idx != -1:
-            body = content[end_idx + 5:]
-
-    # Extract additional metadata from body
-    # Title: first substantial line
-    if not metadata.get("title"):
-        for line in body.split('\n')[:20]:
-            line = line.strip()
-            if line and not line.startswith('#') and not line.startswith('*') and len(line) > 10:
-                metadata["title"] = line
-                break
-
-    # Abstract (Chinese pattern)
-    if not metadata.get("abstract"):
-        match = re.search(r'摘要[：:]\s*(.+?)(?=\n\n|关键词|中图分类号|Keywords)', body, re.DOTALL)
-        if match:
-            metadata["abstract"] = match.group(1).strip()
-
-    # Keywords (Chinese pattern)
-    if not metadata.get("keywords"):
-        match = re.search(r'关键词[：:]\s*(.+?)(?=\n|中图分类号)', body)
-        if match:
-            keywords = match.group(1)
-            metadata["keywords"] = [k.strip() for k in re.split(r'[；;,，]', keywords) if k.strip()]
-
-    # Sections (Chinese numbered pattern)
-    if not metadata.get("sections"):
-        sections = []
-        pattern = r'(?:^|\n)##?\s*([一二三四五六七八九十]+[、\.])\s*(.+?)(?=\n)'
-        for match in re.finditer(pattern, body):
-            sections.append({
-                "number": match.group(1),
-                "title": match.group(2).strip()
-            })
-        if sections:
-            metadata["sections"] = sections
-
-    return metadata
+    return read_markdown_metadata(str(md_path), include_sections=True)
 
 
 def iter_pdfs(input_path: str) -> list:
@@ -428,6 +575,12 @@ def main():
                         help="Disable automatic fallback to pdfplumber on PaddleOCR failure")
     parser.add_argument("--local", action="store_true",
                         help="Use local PaddleOCR GPU instead of remote API")
+    parser.add_argument("--no_page_cache", action="store_true",
+                        help="Re-extract every page instead of reusing the page-level cache")
+    parser.add_argument("--no_circuit_breaker", action="store_true",
+                        help="Always try every backend, ignoring the shared backend health state")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes for --force_fallback extraction (default: CPU count)")
     args = parser.parse_args()
 
     pdfs = iter_pdfs(args.input_path)
@@ -437,20 +590,36 @@ def main():
 
     os.makedirs(args.out_dir, exist_ok=True)
 
+    if args.force_fallback:
+        # Batch mode: one process pool for every file and page shard
+        failed = 0
+        for pdf_path, md_path, metadata, error in extract_pdfs_legacy(
+            pdfs, args.out_dir,
+            use_page_cache=not args.no_page_cache,
+            max_workers=args.workers,
+        ):
+            if error is not None:
+                failed += 1
+                logger.error(f"Failed to process {pdf_path}: {error}")
+            else:
+                logger.info(f"Output: {md_path} ({metadata['stats']['total_pages']} pages)")
+        logger.info(f"\n{'='*60}")
+        logger.info(f"Done. Processed {len(pdfs) - failed}/{len(pdfs)} files.")
+        return 0
+
     for pdf_path in pdfs:
         logger.info(f"\n{'='*60}")
         logger.info(f"Processing: {os.path.basename(pdf_path)}")
 
         try:
-            if args.force_fallback:
-                md_path, metadata = extract_pdf_legacy(pdf_path, args.out_dir)
-            elif args.local:
+            if args.local:
                 md_path, metadata = extract_pdf_local_paddleocr(
                     pdf_path, args.out_dir,
                     use_table_recognition=not args.no_table,
                     use_formula_recognition=not args.no_formula,
                     use_chart_recognition=args.chart,
                     use_doc_orientation_classify=args.orientation,
+                    use_page_cache=not args.no_page_cache,
                 )
             else:
                 md_path, metadata = extract_with_fallback(
@@ -461,6 +630,8 @@ def main():
                     use_doc_orientation_classify=args.orientation,
                     max_pages_per_chunk=args.max_pages,
                     no_fallback=args.no_fallback,
+                    use_page_cache=not args.no_page_cache,
+                    use_circuit_breaker=not args.no_circuit_breaker,
                 )
 
             logger.info(f"Output: {md_path}")
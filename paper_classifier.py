@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Local scored paper-type classifier (QUANT / QUAL / IGNORE).
+
+SmartScholar.classify_paper used to send the first 4,000 characters of every
+paper to deepseek-chat, although most papers in a batch are obviously
+empirical (regression tables, 回归, 稳健性) or obviously not research at all
+(卷首语, 目录, one-page notices).  classify_heuristic() scores the full
+extracted Markdown locally:
+
+- keyword features: counted hits per keyword (capped, so one repeated word
+  cannot decide alone) for QUANT, QUAL and IGNORE vocabularies; IGNORE
+  keywords and strongly weighted review keywords (综述, 研究进展, 述评,
+  literature review) only count in the head of the document (title /
+  first lines), so a review of empirical work is not outvoted by the
+  methods it discusses
+- structural signals: Markdown/HTML table rows, significance stars and
+  parenthesised standard errors, LaTeX equation density, and page count
+  (< 2 pages strongly suggests IGNORE; only used when the page count is
+  known from the PDF or the extractor's total_pages frontmatter, since
+  callers may pass a preview rather than the whole text)
+
+confidence = (best - runner_up) / (best + runner_up + EVIDENCE_PRIOR), so a
+paper needs both a clear margin and enough evidence, and a paper with review
+keywords in its head is never decided locally as anything but QUAL.  Callers
+decide papers with confidence >= DEFAULT_MIN_CONFIDENCE locally and send the rest to the LLM.
+
+Usage:
+    python paper_classifier.py paddleocr_md/xxx_paddleocr.md [--pdf xxx.pdf]
+"""
+
+import argparse
+import json
+import re
+from typing import Dict, Optional, Tuple
+
+DEFAULT_MIN_CONFIDENCE = 0.6
+EVIDENCE_PRIOR = 4.0
+KEYWORD_CAP = 3           # hits counted per keyword
+HEAD_CHARS = 1500         # IGNORE keywords are only looked for here
+
+# (keyword, weight); latin keywords match as whole words, case-insensitive unless all caps
+QUANT_KEYWORDS = [
+    ("回归", 1.0), ("稳健性", 1.5), ("内生性", 1.5), ("工具变量", 1.5), ("固定效应", 1.5),
+    ("双重差分", 2.0), ("断点回归", 2.0), ("倾向得分", 1.5), ("标准误", 1.5), ("显著性水平", 1.0),
+    ("计量模型", 1.5), ("实证分析", 1.0), ("实证检验", 1.0), ("面板数据", 1.0), ("描述性统计", 1.0),
+    ("控制变量", 1.0), ("被解释变量", 1.5), ("解释变量", 1.0), ("异质性分析", 1.0), ("系数", 0.5),
+    ("regression", 1.0), ("robustness", 1.5), ("endogeneity", 1.5), ("instrumental variable", 1.5),
+    ("fixed effects", 1.5), ("difference-in-differences", 2.0), ("DID", 1.0), ("RDD", 1.5),
+    ("OLS", 1.0), ("2SLS", 1.5), ("standard errors", 1.5), ("panel data", 1.0),
+    ("identification strategy", 1.5), ("coefficient", 0.5), ("Stata", 1.0),
+]
+QUAL_KEYWORDS = [
+    ("案例研究", 2.0), ("扎根理论", 2.0), ("定性比较分析", 2.0), ("QCA", 2.0), ("半结构化访谈", 2.0),
+    ("访谈", 1.0), ("质性研究", 2.0), ("理论框架", 1.0), ("概念框架", 1.0), ("过程模型", 1.0),
+    ("文献综述", 1.0), ("研究进展", 1.5), ("述评", 1.5), ("理论建构", 1.5), ("编码", 0.5),
+    ("组态", 1.5), ("政策文本", 1.0), ("话语", 0.5),
+    ("case study", 2.0), ("grounded theory", 2.0), ("qualitative", 1.5), ("interview", 1.0),
+    ("theoretical framework", 1.0), ("literature review", 1.0), ("meta-analysis", 1.0),
+    ("research progress", 1.5), ("conceptual", 0.5),
+]
+# Reviews are QUAL even when they survey empirical (DID / IV / FE) work, so title-area
+# review signals must outweigh the method vocabulary they discuss; head-only, like IGNORE
+REVIEW_KEYWORDS = [
+    ("综述", 5.0), ("研究综述", 3.0), ("文献综述", 3.0), ("研究进展", 5.0), ("述评", 5.0), ("评述", 4.0),
+    ("literature review", 5.0), ("review of the literature", 5.0), ("a review", 5.0),
+    ("systematic review", 5.0), ("survey of", 4.0),
+]
+IGNORE_KEYWORDS = [
+    ("卷首语", 4.0), ("目录", 3.0), ("编者按", 4.0), ("主持人语", 4.0), ("征稿启事", 4.0), ("征稿", 2.0),
+    ("会议通知", 4.0), ("会议综述", 2.0), ("更正", 2.0), ("勘误", 3.0), ("书评", 3.0), ("简讯", 3.0),
+    ("Editor's Note", 4.0), ("Table of Contents", 4.0), ("Call for Papers", 4.0), ("Erratum", 4.0),
+    ("Book Review", 3.0), ("Preface", 3.0),
+]
+
+TABLE_ROW_WEIGHT = 0.05        # per Markdown table row / HTML <tr>
+SIG_STAR_WEIGHT = 0.2          # per coefficient with significance stars
+STD_ERROR_WEIGHT = 0.1         # per parenthesised standard error
+EQUATION_WEIGHT = 0.3          # per display equation / LaTeX estimation symbol
+STRUCTURAL_CAP = 6.0           # cap per structural signal
+SHORT_PAPER_IGNORE = 8.0       # < 2 pages
+BRIEF_PAPER_IGNORE = 2.0       # < 3 pages
+
+_RE_TABLE_ROW = re.compile(r'^\s*\|.*\|\s*$|<tr[\s>]', re.MULTILINE | re.IGNORECASE)
+_RE_SIG_STAR = re.compile(r'-?\d+\.\d+\s*(?:\\?\*){1,3}(?!\*)|-?\d+\.\d+\^\{\*{1,3}\}')
+_RE_STD_ERROR = re.compile(r'\(\s*-?\d+\.\d{2,}\s*\)')
+_RE_TOTAL_PAGES = re.compile(r'^total_pages:\s*(\d+)\s*$', re.MULTILINE)
+_RE_EQUATION = re.compile(r'\$\$|\\(?:beta|alpha|varepsilon|epsilon|gamma|delta|mu)\b|\\begin\{equation')
+
+
+def _keyword_pattern(keyword: str) -> "re.Pattern":
+    if re.match(r'^[\x00-\x7f]+$', keyword):
+        flags = 0 if keyword.isupper() else re.IGNORECASE
+        return re.compile(r'(?<![A-Za-z])' + re.escape(keyword) + r'(?![A-Za-z])', flags)
+    return re.compile(re.escape(keyword))
+
+
+_QUANT = [(k, w, _keyword_pattern(k)) for k, w in QUANT_KEYWORDS]
+_QUAL = [(k, w, _keyword_pattern(k)) for k, w in QUAL_KEYWORDS]
+_REVIEW = [(k, w, _keyword_pattern(k)) for k, w in REVIEW_KEYWORDS]
+_IGNORE = [(k, w, _keyword_pattern(k)) for k, w in IGNORE_KEYWORDS]
+
+
+def _keyword_score(text: str, keywords) -> Tuple[float, Dict[str, int]]:
+    score, hits = 0.0, {}
+    for keyword, weight, pattern in keywords:
+        n = len(pattern.findall(text))
+        if n:
+            hits[keyword] = n
+            score += weight * min(n, KEYWORD_CAP)
+    return score, hits
+
+
+def pdf_page_count(pdf_path: str) -> Optional[int]:
+    """Page count via pypdf, None if unavailable."""
+    try:
+        from pypdf import PdfReader
+        return len(PdfReader(pdf_path).pages)
+    except Exception:
+        return None
+
+
+def paper_features(text: str, page_count: Optional[int] = None) -> Dict:
+    """Keyword and structural features of an extracted paper."""
+    quant_kw, quant_hits = _keyword_score(text, _QUANT)
+    qual_kw, qual_hits = _keyword_score(text, _QUAL)
+    review_kw, review_hits = _keyword_score(text[:HEAD_CHARS], _REVIEW)
+    ignore_kw, ignore_hits = _keyword_score(text[:HEAD_CHARS], _IGNORE)
+    if not page_count:
+        match = _RE_TOTAL_PAGES.search(text[:HEAD_CHARS])
+        page_count = int(match.group(1)) if match else None
+    return {
+        "pages": page_count,
+        "quant_keywords": quant_hits,
+        "qual_keywords": qual_hits,
+        "review_keywords": review_hits,
+        "ignore_keywords": ignore_hits,
+        "quant_keyword_score": quant_kw,
+        "qual_keyword_score": qual_kw,
+        "review_keyword_score": review_kw,
+        "ignore_keyword_score": ignore_kw,
+        "table_rows": len(_RE_TABLE_ROW.findall(text)),
+        "sig_stars": len(_RE_SIG_STAR.findall(text)),
+        "std_errors": len(_RE_STD_ERROR.findall(text)),
+        "equations": len(_RE_EQUATION.findall(text)),
+    }
+
+
+def classify_heuristic(text: str, page_count: Optional[int] = None) -> Dict:
+    """
+    Score *text* (ideally the full extracted Markdown).
+
+    Returns {"type", "confidence", "scores", "features"}; confidence is in
+    [0, 1) and only meaningful relative to DEFAULT_MIN_CONFIDENCE.
+    """
+    f = paper_features(text, page_count)
+    structural = (
+        min(f["table_rows"] * TABLE_ROW_WEIGHT, STRUCTURAL_CAP)
+        + min(f["sig_stars"] * SIG_STAR_WEIGHT, STRUCTURAL_CAP)
+        + min(f["std_errors"] * STD_ERROR_WEIGHT, STRUCTURAL_CAP)
+        + min(f["equations"] * EQUATION_WEIGHT, STRUCTURAL_CAP)
+    )
+    ignore = f["ignore_keyword_score"]
+    if f["pages"] is not None and f["pages"] < 2:
+        ignore += SHORT_PAPER_IGNORE
+    elif f["pages"] is not None and f["pages"] < 3:
+        ignore += BRIEF_PAPER_IGNORE
+    scores = {
+        "QUANT": round(f["quant_keyword_score"] + structural, 2),
+        "QUAL": round(f["qual_keyword_score"] + f["review_keyword_score"], 2),
+        "IGNORE": round(ignore, 2),
+    }
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    (best_type, best), (_, runner_up) = ranked[0], ranked[1]
+    confidence = (best - runner_up) / (best + runner_up + EVIDENCE_PRIOR)
+    if f["review_keywords"] and best_type != "QUAL":
+        # A title-area review signal that still lost: leave the call to the LLM
+        confidence = 0.0
+    return {
+        "type": best_type,
+        "confidence": round(confidence, 3),
+        "scores": scores,
+        "features": f,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Heuristic QUANT/QUAL/IGNORE paper classifier")
+    parser.add_argument("md_path", help="Extracted Markdown file")
+    parser.add_argument("--pdf", help="Original PDF (for the page count)")
+    args = parser.parse_args()
+
+    with open(args.md_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    result = classify_heuristic(text, pdf_page_count(args.pdf) if args.pdf else None)
+    result["decided_locally"] = result["confidence"] >= DEFAULT_MIN_CONFIDENCE
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
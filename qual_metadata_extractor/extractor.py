@@ -2,7 +2,7 @@
 QUAL 论文元数据提取主模块
 
 完整的元数据提取流程：
-1. 从 MD 报告中提取子章节（DeepSeek 30字总结）
+1. 从 MD 报告中提取子章节（DeepSeek 30字总结，全部层级批量请求）
 2. 从 PDF 文件中提取基础元数据（Qwen-vl-plus）
 3. 合并元数据
 4. 注入 Frontmatter 和导航链接
@@ -12,10 +12,11 @@ import os
 import logging
 from typing import Optional
 
-from .md_extractor import get_deepseek_client, extract_layer_subsections
+from .md_extractor import get_deepseek_client, extract_paper_subsections
 from .pdf_extractor import extract_pdf_metadata
 from .merger import create_base_metadata, create_layer_metadata
-from .injector import save_with_metadata
+from .injector import apply_metadata
+from frontmatter_store import PaperNotes
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -70,13 +71,16 @@ def extract_qual_metadata(paper_dir: str, pdf_dir: str, output_dir: Optional[str
     # 论文名称（用于导航链接）
     paper_name = os.path.basename(paper_dir)
     
-    # 1. 加载所有层级的 Markdown 内容
-    layer_outputs = {}
-    for layer in ["L1_Context", "L2_Theory", "L3_Logic", "L4_Value"]:
-        layer_file = os.path.join(paper_dir, f"{layer}.md")
-        if os.path.exists(layer_file):
-            with open(layer_file, 'r', encoding='utf-8') as f:
-                layer_outputs[layer] = f.read()
+    # 1. 加载所有层级的 Markdown 内容（目录只读一次，修改在内存中完成，最后每个文件原子写入一次）
+    all_layers = ["L1_Context", "L2_Theory", "L3_Logic", "L4_Value"]
+    full_report_name = f"{paper_name}_Full_Report.md"
+    notes = PaperNotes(
+        paper_dir,
+        include=lambda name: name == full_report_name or name[:-3] in all_layers,
+    )
+    layer_outputs = {
+        layer: notes[f"{layer}.md"].body for layer in all_layers if f"{layer}.md" in notes
+    }
     
     if not layer_outputs:
         logger.error(f"No layer files found in {paper_dir}")
@@ -90,13 +94,8 @@ def extract_qual_metadata(paper_dir: str, pdf_dir: str, output_dir: Optional[str
         logger.error("DeepSeek client not available")
         return
     
-    logger.info("Starting Step 1: Extract subsections from MD (DeepSeek summary)...")
-    subsections_meta = {}
-    
-    for layer_name, md_content in layer_outputs.items():
-        subsections = extract_layer_subsections(layer_name, md_content, deepseek_client)
-        if subsections:
-            subsections_meta[layer_name] = subsections
+    logger.info("Starting Step 1: Extract subsections from MD (DeepSeek batch summary)...")
+    subsections_meta = extract_paper_subsections(layer_outputs, deepseek_client)
     
     if not subsections_meta:
         logger.warning("No subsections extracted from MD files")
@@ -127,33 +126,24 @@ def extract_qual_metadata(paper_dir: str, pdf_dir: str, output_dir: Optional[str
     base_metadata = create_base_metadata(pdf_metadata)
     
     # 5. 为每个层级文件注入对应的元数据和导航
-    all_layers = ["L1_Context", "L2_Theory", "L3_Logic", "L4_Value"]
-    
     for layer in all_layers:
         if layer in layer_outputs:
-            layer_file = os.path.join(output_dir, f"{layer}.md")
-            
-            with open(layer_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
             # 创建该层的元数据（基础元数据 + 该层的子章节）
             subsections = subsections_meta.get(layer, {})
             layer_metadata = create_layer_metadata(base_metadata, subsections, layer)
             
-            # 保存（注入元数据和导航）
-            save_with_metadata(layer_file, content, layer_metadata, layer, paper_name, all_layers)
+            apply_metadata(notes[f"{layer}.md"], layer_metadata, layer, paper_name, all_layers)
     
-    # 6. 处理 Full_Report（只注入基础元数据，不包含 subsections）
-    full_report_file = os.path.join(output_dir, f"{paper_name}_Full_Report.md")
-    if os.path.exists(full_report_file):
+    # 6. 处理 Full_Report（只注入基础元数据，不包含 subsections，不添加导航）
+    if full_report_name in notes:
         logger.info("Processing Full_Report...")
-        
-        with open(full_report_file, 'r', encoding='utf-8') as f:
-            full_report_content = f.read()
-        
-        # 只注入基础元数据，不添加导航
-        save_with_metadata(full_report_file, full_report_content, base_metadata, "Full_Report", paper_name, [])
-        logger.info("Full_Report updated with base metadata only")
+        apply_metadata(notes[full_report_name], base_metadata, "Full_Report", paper_name, [])
+    
+    # 7. 统一保存
+    if os.path.abspath(output_dir) != os.path.abspath(paper_dir):
+        notes.redirect(output_dir)
+    written = notes.save()
+    logger.info(f"Saved {len(written)} files with metadata and navigation")
     
     logger.info("QUAL metadata extraction complete!")
 
@@ -3,7 +3,9 @@ Frontmatter 注入模块
 """
 
 import logging
-import yaml
+import os
+
+from frontmatter_store import Note
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -20,20 +22,11 @@ def inject_qual_frontmatter(md_content: str, metadata: dict) -> str:
     Returns:
         注入后的 Markdown 内容
     """
-    # 直接使用提供的元数据，不与现有 frontmatter 合并
-    # 生成 YAML Frontmatter
-    yaml_str = yaml.safe_dump(metadata, allow_unicode=True, sort_keys=False).strip()
-    frontmatter_block = f"---\n{yaml_str}\n---\n\n"
-    
-    # 移除现有 frontmatter（如果有）
-    body_content = md_content
-    if md_content.startswith("---\n"):
-        end_idx = md_content.find("\n---\n", 4)
-        if end_idx != -1:
-            body_content = md_content[end_idx + 5:]
-    
+    # 直接使用提供的元数据，不与现有 frontmatter 合并（替换现有 frontmatter）
+    note = Note("", "", md_content)
+    note.replace_metadata(metadata)
     logger.info("Injected frontmatter")
-    return frontmatter_block + body_content
+    return note.render()
 
 
 def add_qual_navigation_links(md_content: str, layer: str, paper_name: str, all_layers: list) -> str:
@@ -75,13 +68,12 @@ def add_qual_navigation_links(md_content: str, layer: str, paper_name: str, all_
     return md_content + navigation
 
 
-def save_with_metadata(file_path: str, content: str, metadata: dict, layer: str, paper_name: str, all_layers: list):
+def apply_metadata(note: Note, metadata: dict, layer: str, paper_name: str, all_layers: list):
     """
-    保存文件并注入元数据和导航
+    在内存中为单个文件注入元数据和导航（由调用方统一保存）
     
     Args:
-        file_path: 文件路径
-        content: 原始内容
+        note: frontmatter_store.Note
         metadata: 元数据字典（如果为 None，则不注入 frontmatter，只添加导航）
         layer: 当前层级
         paper_name: 论文名称
@@ -89,28 +81,30 @@ def save_with_metadata(file_path: str, content: str, metadata: dict, layer: str,
     """
     # 注入 Frontmatter（如果有元数据）
     if metadata:
-        new_content = inject_qual_frontmatter(content, metadata)
-    else:
-        new_content = content
+        note.replace_metadata(metadata)
     
     # Full_Report 移除现有导航（如果有），不添加新导航
     if layer == "Full_Report":
-        # 移除 ## 导航 部分
-        if "## 导航" in new_content:
-            # 找到导航部分
-            nav_idx = new_content.find("## 导航")
-            # 找到导航部分之前的换行
-            prev_newline = new_content.rfind("\n\n", 0, nav_idx)
-            if prev_newline != -1:
-                new_content = new_content[:prev_newline]
-            else:
-                new_content = new_content[:nav_idx]
+        note.remove_section("## 导航")
     # 其他层级文件添加导航
     elif all_layers:
-        new_content = add_qual_navigation_links(new_content, layer, paper_name, all_layers)
+        note.body = add_qual_navigation_links(note.body, layer, paper_name, all_layers)
+
+
+def save_with_metadata(file_path: str, content: str, metadata: dict, layer: str, paper_name: str, all_layers: list):
+    """
+    保存文件并注入元数据和导航（原子写入）
     
-    # 保存
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(new_content)
+    Args:
+        file_path: 文件路径
+        content: 原始内容
+        metadata: 元数据字典（如果为 None，则不注入 frontmatter，只添加导航）
+        layer: 当前层级
+        paper_name: 论文名称
+        all_layers: 所有层级列表
+    """
+    note = Note(os.path.basename(file_path), file_path, content)
+    apply_metadata(note, metadata, layer, paper_name, all_layers)
+    note.save()
     
     logger.info(f"Saved {file_path} with metadata and navigation")
@@ -1,11 +1,19 @@
 """
 第一次提取：从生成的 MD 报告中提取 `## 数字. 标题` 格式的章节
 用 DeepSeek 进行 30-50 字总结
+
+summarize_sections_batch() 把多个章节放进一次 JSON 请求（按总字数分组），
+回复中缺失的章节才逐个调用 summarize_section_with_deepseek()；
+inject_obsidian_meta.py 的 ### 子标题总结也复用它。
 """
 
 import os
 import re
+import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
 from openai import OpenAI
 from dotenv import load_dotenv
 
@@ -14,6 +22,10 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+BATCH_MAX_CHARS = 24000          # 单次批量请求的章节正文总字数上限
+BATCH_SECTION_MAX_CHARS = 6000   # 批量请求中单个章节正文的截断长度
+BATCH_MAX_WORKERS = 4
+
 
 def get_deepseek_client():
     """获取 DeepSeek 客户端"""
@@ -72,6 +84,126 @@ def extract_sections_from_markdown(md_content: str) -> dict:
     return sections
 
 
+def section_target_length(content: str) -> int:
+    """合适的总结长度（30-50字）"""
+    return min(50, max(30, len(content) // 10))
+
+
+def _batch_groups(items: List[Tuple[str, str]]) -> List[List[int]]:
+    """按正文总字数把章节下标分组，每组一次请求"""
+    groups, current, size = [], [], 0
+    for idx, (_, content) in enumerate(items):
+        n = min(len(content), BATCH_SECTION_MAX_CHARS)
+        if current and size + n > BATCH_MAX_CHARS:
+            groups.append(current)
+            current, size = [], 0
+        current.append(idx)
+        size += n
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _summarize_group(client, items, indices, target_length, model) -> Dict[int, str]:
+    """一次 JSON 请求总结一组章节，返回 {下标: 摘要}；失败时返回空字典"""
+    blocks, spec = [], {}
+    for n, idx in enumerate(indices, 1):
+        title, content = items[idx]
+        limit = target_length(content)
+        spec[f"s{n}"] = idx
+        blocks.append(f"[s{n}] 标题：{title}（{limit}字以内）\n{content[:BATCH_SECTION_MAX_CHARS]}")
+
+    prompt = f"""请把下面每个章节分别总结为一句话（字数上限见各章节标题后的括号）。
+
+要求：
+- 中文输出
+- 抓住核心要点，保持学术准确性
+- 只返回 JSON 对象，键为章节编号（{", ".join(spec)}），值为对应的一句话摘要
+
+""" + "\n\n".join(blocks)
+
+    try:
+        resp = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "你是一个精确的学术内容总结专家。Output JSON only."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=100 * len(indices) + 100,
+            response_format={"type": "json_object"}
+        )
+        data = json.loads(resp.choices[0].message.content)
+    except Exception as e:
+        logger.error(f"Batch summary failed for {len(indices)} sections: {e}")
+        return {}
+
+    if not isinstance(data, dict):
+        return {}
+    result = {}
+    for key, idx in spec.items():
+        value = data.get(key)
+        if isinstance(value, str) and value.strip():
+            result[idx] = value.strip()
+    return result
+
+
+def summarize_sections_batch(
+    client,
+    items: List[Tuple[str, str]],
+    target_length: Callable[[str], int] = section_target_length,
+    fallback: Optional[Callable[[str, str], str]] = None,
+    truncate: bool = True,
+    model: str = "deepseek-chat",
+    max_workers: int = BATCH_MAX_WORKERS,
+) -> List[str]:
+    """
+    批量总结多个章节，返回与 items 同序的摘要列表
+
+    Args:
+        client: DeepSeek 客户端
+        items: [(标题, 内容), ...]
+        target_length: 内容 → 字数上限
+        fallback: (标题, 内容) → 摘要，用于批量回复中缺失的章节；
+            默认 summarize_section_with_deepseek
+        truncate: 摘要超过字数上限时截断
+        max_workers: 多组请求的并发数
+    """
+    if not items:
+        return []
+    if fallback is None:
+        fallback = lambda title, content: summarize_section_with_deepseek(client, title, content)
+
+    groups = _batch_groups(items)
+    summaries: Dict[int, str] = {}
+    workers = max(1, min(max_workers, len(groups)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_summarize_group, client, items, g, target_length, model)
+            for g in groups
+        ]
+        for future in futures:
+            summaries.update(future.result())
+
+    missing = [i for i in range(len(items)) if i not in summaries]
+    logger.info(
+        f"Batch summarized {len(items) - len(missing)}/{len(items)} sections "
+        f"in {len(groups)} request(s)"
+        + (f", {len(missing)} fall back to single requests" if missing else "")
+    )
+    for i in missing:
+        summaries[i] = fallback(*items[i])
+
+    result = []
+    for i, (_, content) in enumerate(items):
+        summary = summaries[i]
+        limit = target_length(content)
+        if truncate and len(summary) > limit:
+            summary = summary[:limit].strip()
+        result.append(summary)
+    return result
+
+
 def summarize_section_with_deepseek(client, title: str, content: str) -> str:
     """
     用 DeepSeek 将章节内容总结为 30-50 字中文
@@ -90,8 +222,7 @@ def summarize_section_with_deepseek(client, title: str, content: str) -> str:
         logger.info(f"Section '{title}' too short ({len(content)} chars), truncated to 50 chars")
         return summary
     
-    # 计算合适的总结长度（30-50字）
-    target_length = min(50, max(30, len(content) // 10))
+    target_length = section_target_length(content)
     
     prompt = f"""请将以下内容总结为{target_length}字以内的一句话：
 标题：{title}
@@ -154,14 +285,49 @@ def extract_layer_subsections(layer_name: str, md_content: str, deepseek_client)
         logger.warning(f"No sections found in {layer_name}")
         return {}
     
-    # 总结每个章节
-    subsections_meta = {}
+    # 一次批量请求总结所有足够长的章节
+    items = []
     for title, content in sections.items():
         if len(content) >= 50:  # 仅总结足够长的章节
-            summary = summarize_section_with_deepseek(deepseek_client, title, content)
-            subsections_meta[title] = summary
+            items.append((title, content))
         else:
             logger.info(f"Section '{title}' too short ({len(content)} chars), skipping summary")
     
+    summaries = summarize_sections_batch(deepseek_client, items)
+    subsections_meta = {title: summary for (title, _), summary in zip(items, summaries)}
+    
     logger.info(f"Extracted {len(subsections_meta)} subsections from {layer_name}")
     return subsections_meta
+
+
+def extract_paper_subsections(layer_outputs: Dict[str, str], deepseek_client) -> Dict[str, dict]:
+    """
+    提取一篇论文所有层级的子章节元数据（所有层的章节合并为批量请求）
+    
+    Args:
+        layer_outputs: {层级名称: Markdown 内容}
+        deepseek_client: DeepSeek 客户端
+    
+    Returns:
+        {"L1_Context": {"1. 论文分类": "摘要", ...}, ...}（无章节的层级不出现）
+    """
+    items, owners = [], []
+    for layer_name, md_content in layer_outputs.items():
+        sections = extract_sections_from_markdown(md_content)
+        if not sections:
+            logger.warning(f"No sections found in {layer_name}")
+            continue
+        for title, content in sections.items():
+            if len(content) >= 50:  # 仅总结足够长的章节
+                items.append((title, content))
+                owners.append((layer_name, title))
+            else:
+                logger.info(f"Section '{title}' too short ({len(content)} chars), skipping summary")
+    
+    summaries = summarize_sections_batch(deepseek_client, items)
+    result: Dict[str, dict] = {}
+    for (layer_name, title), summary in zip(owners, summaries):
+        result.setdefault(layer_name, {})[title] = summary
+    for layer_name, subsections in result.items():
+        logger.info(f"Extracted {len(subsections)} subsections from {layer_name}")
+    return result
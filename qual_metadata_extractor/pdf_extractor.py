@@ -1,12 +1,23 @@
 """
 第二次提取：从原始 PDF 文件中提取基础元数据
 使用 pymupdf + Qwen-vl-plus 视觉模型
+
+- 文本层优先：首页文本层能高置信度给出标题/期刊/年份时不调用视觉模型
+- 渲染：按页面宽度取刚好够用的 dpi，灰度 JPEG 编码，显著缩小请求体
+- 缓存：结果按 PDF 内容 sha256 缓存（<仓库>/.cache/pdf_metadata，
+  或环境变量 PDF_METADATA_CACHE），重复注入同一篇论文不再重复调用
+
+inject_obsidian_meta.py 与 inject_qual_metadata.py 也通过 extract_pdf_metadata() 复用此流程。
 """
 
 import os
+import re
 import json
 import base64
+import hashlib
 import logging
+from typing import List, Optional, Tuple
+
 from openai import OpenAI
 from dotenv import load_dotenv
 
@@ -22,56 +33,293 @@ except ImportError:
     logger.warning("pymupdf not available, PDF metadata extraction will be disabled")
 
 
-def convert_pdf_to_images(pdf_path: str, max_pages: int = 3) -> list:
+VISION_MODEL = "qwen-vl-plus"
+CACHE_VERSION = 1
+
+# 渲染参数：页眉小字在约 1200 px 宽时仍清晰可辨
+RENDER_TARGET_WIDTH = 1240
+RENDER_MIN_DPI = 96
+RENDER_MAX_DPI = 200
+JPEG_QUALITY = 75
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "pdf_metadata"
+)
+
+_UNKNOWN = {
+    "title": "Unknown",
+    "authors": ["Unknown"],
+    "journal": "Unknown",
+    "year": "Unknown"
+}
+
+_JOURNAL_PATTERNS = [
+    re.compile(r'《([^》]{2,30})》'),
+    re.compile(r'^([\u4e00-\u9fff]{2,15})\s*(?:19|20)\d{2}\s*年\s*第\s*\d+\s*期', re.MULTILINE),
+    re.compile(
+        r'((?:The\s+)?(?:(?:Quarterly\s+)?Journal\s+of|Review\s+of|American\s+Economic\s+Review|Econometrica)'
+        r'[A-Za-z&:\- ]{0,80}?)\s*(?=[\d,(;.]|Vol|$)', re.MULTILINE
+    ),
+]
+_YEAR_PATTERNS = [
+    re.compile(r'((?:19|20)\d{2})\s*年'),
+    re.compile(r'Vol(?:ume)?\.?\s*\d+.{0,40}?\(?((?:19|20)\d{2})\)?', re.IGNORECASE),
+    re.compile(r'[©Ⓒ]\s*((?:19|20)\d{2})'),
+    re.compile(r'\(((?:19|20)\d{2})\)'),
+]
+_ABSTRACT_LINE = re.compile(r'^(?:摘\s*要|内容提要|Abstract)\b', re.IGNORECASE)
+
+
+def _unknown() -> dict:
+    return {k: (list(v) if isinstance(v, list) else v) for k, v in _UNKNOWN.items()}
+
+
+def _is_unknown(metadata: dict) -> bool:
+    return all(metadata.get(k) in (None, "", "Unknown", ["Unknown"]) for k in _UNKNOWN)
+
+
+# ── 缓存 ─────────────────────────────────────────────
+
+def pdf_sha256(pdf_path: str) -> str:
+    """PDF 文件内容的 sha256（流式读取）"""
+    h = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cache_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, key[:2], f"{key}.json")
+
+
+def _cache_key(pdf_hash: str, max_pages: int, top_half: bool) -> str:
+    variant = f"v{CACHE_VERSION}:{VISION_MODEL}:{max_pages}:{int(top_half)}"
+    return hashlib.sha256(f"{pdf_hash}:{variant}".encode()).hexdigest()
+
+
+def _load_cached(cache_dir: str, key: str) -> Optional[dict]:
+    try:
+        with open(_cache_path(cache_dir, key), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cached(cache_dir: str, key: str, metadata: dict) -> None:
+    path = _cache_path(cache_dir, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"Failed to write PDF metadata cache: {e}")
+
+
+# ── 文本层 ───────────────────────────────────────────
+
+def _page_lines(page) -> List[Tuple[float, float, str]]:
+    """首页文本行 [(y0, 字号, 文本)]，按阅读顺序"""
+    lines = []
+    for block in page.get_text("dict").get("blocks", []):
+        if block.get("type") != 0:
+            continue
+        for line in block.get("lines", []):
+            spans = [s for s in line.get("spans", []) if s.get("text", "").strip()]
+            if not spans:
+                continue
+            text = "".join(s["text"] for s in spans).strip()
+            size = max(s.get("size", 0) for s in spans)
+            lines.append((line["bbox"][1], size, text))
+    return lines
+
+
+def _split_authors(line: str) -> List[str]:
+    """作者行 → 作者列表（中文按空白切分 2-4 字姓名，英文按逗号/and 切分）"""
+    line = re.sub(r'[\d*†‡§∗]+', ' ', line).strip()
+    if re.search(r'[\u4e00-\u9fff]', line):
+        names = [n for n in re.split(r'[\s　,，、]+', line) if n]
+        return [n for n in names if re.fullmatch(r'[\u4e00-\u9fff]{2,4}', n)]
+    names = re.split(r',|;|\band\b|&', line)
+    return [n.strip() for n in names if 1 <= len(n.strip().split()) <= 4 and n.strip()[:1].isupper()]
+
+
+def extract_metadata_from_text_layer(pdf_path: str) -> Tuple[dict, bool]:
+    """
+    从首页文本层提取元数据
+
+    标题取页面上部字号明显大于正文的行；期刊与年份只在页眉区域按强模式匹配
+    （《期刊名》、"经济研究 2024年第1期"、"Journal of ..."、"2024年"、"Vol. 12 (2024)" 等）。
+
+    Returns:
+        (元数据, 是否高置信度)；标题、期刊、年份都找到时才算高置信度
     """
-    将 PDF 前几页转换为图片（base64）
-    
+    metadata = _unknown()
+    if not pymupdf or not os.path.exists(pdf_path):
+        return metadata, False
+
+    try:
+        doc = pymupdf.open(pdf_path)
+        try:
+            if len(doc) == 0:
+                return metadata, False
+            page = doc.load_page(0)
+            height = page.rect.height
+            lines = _page_lines(page)
+        finally:
+            doc.close()
+    except Exception as e:
+        logger.warning(f"Text layer extraction failed: {e}")
+        return metadata, False
+
+    if not lines:
+        return metadata, False
+
+    # 标题：上 60% 区域中字号最大的连续行（最多 3 行）
+    sizes = sorted(size for _, size, _ in lines)
+    body_size = sizes[len(sizes) // 2]
+    upper = [(i, l) for i, l in enumerate(lines) if l[0] < height * 0.6]
+    title_end = -1
+    if upper:
+        top_size = max(size for _, (_, size, _) in upper)
+        if top_size >= body_size * 1.25:
+            start = next(i for i, (_, size, _) in upper if size >= top_size - 0.5)
+            parts, title_end = [], start
+            for i in range(start, min(start + 3, len(lines))):
+                if lines[i][1] < top_size - 0.5:
+                    break
+                parts.append(lines[i][2])
+                title_end = i
+            title = re.sub(r'\s+', ' ', " ".join(parts)).strip()
+            if 4 <= len(title) <= 200 and not _JOURNAL_PATTERNS[0].fullmatch(title):
+                metadata["title"] = title
+
+    # 页眉区域：页面顶部 15% 或前 8 行
+    header = "\n".join(text for i, (y0, _, text) in enumerate(lines) if y0 < height * 0.15 or i < 8)
+    for pattern in _JOURNAL_PATTERNS:
+        match = pattern.search(header)
+        if match:
+            metadata["journal"] = re.sub(r'\s+', ' ', match.group(1)).strip()
+            break
+    for pattern in _YEAR_PATTERNS:
+        match = pattern.search(header)
+        if match:
+            metadata["year"] = match.group(1)
+            break
+
+    # 作者：标题之后、摘要之前的短行
+    if title_end >= 0:
+        for _, _, text in lines[title_end + 1:title_end + 6]:
+            if _ABSTRACT_LINE.match(text):
+                break
+            if len(text) < 80 and not re.search(r'[。：:；]', text):
+                authors = _split_authors(text)
+                if authors:
+                    metadata["authors"] = authors
+                    break
+
+    confident = all(metadata[k] != "Unknown" for k in ("title", "journal", "year"))
+    return metadata, confident
+
+
+# ── 视觉模型 ─────────────────────────────────────────
+
+def _render_dpi(page_width_pt: float) -> int:
+    """刚好使渲染宽度达到 RENDER_TARGET_WIDTH 的 dpi"""
+    if page_width_pt <= 0:
+        return RENDER_MAX_DPI
+    dpi = int(RENDER_TARGET_WIDTH * 72 / page_width_pt)
+    return max(RENDER_MIN_DPI, min(RENDER_MAX_DPI, dpi))
+
+
+def _encode_pixmap(pix) -> bytes:
+    try:
+        return pix.tobytes("jpeg", jpg_quality=JPEG_QUALITY)
+    except TypeError:  # 旧版 pymupdf 不支持 jpg_quality
+        return pix.tobytes("jpeg")
+
+
+def convert_pdf_to_images(pdf_path: str, max_pages: int = 3, top_half: bool = True) -> list:
+    """
+    将 PDF 前几页转换为灰度 JPEG 图片（base64）
+
     Args:
         pdf_path: PDF 文件路径
-        max_pages: 转换的最大页数（默认 2）
-    
+        max_pages: 转换的最大页数（默认 3）
+        top_half: 只截取上半部分（页眉、标题、作者所在区域）
+
     Returns:
         [base64_image1, base64_image2, ...]
     """
     if not pymupdf:
         logger.error("pymupdf not available, cannot convert PDF to images")
         return []
-    
+
     if not os.path.exists(pdf_path):
         logger.error(f"PDF not found: {pdf_path}")
         return []
-    
+
     try:
         doc = pymupdf.open(pdf_path)
         images = []
+        total_bytes = 0
 
         for page_num in range(min(max_pages, len(doc))):
             page = doc.load_page(page_num)
             rect = page.rect
             # 只截取上半部分（上 1/2），期刊名称和年份通常在页眉位置
-            clip_rect = pymupdf.Rect(rect.x0, rect.y0, rect.x1, rect.y0 + rect.height / 2)
-            pix = page.get_pixmap(clip=clip_rect, dpi=200)
+            clip_rect = pymupdf.Rect(rect.x0, rect.y0, rect.x1, rect.y0 + rect.height / 2) if top_half else rect
+            pix = page.get_pixmap(clip=clip_rect, dpi=_render_dpi(rect.width), colorspace=pymupdf.csGRAY)
 
-            img_bytes = pix.tobytes("png")
+            img_bytes = _encode_pixmap(pix)
+            total_bytes += len(img_bytes)
             img_base64 = base64.b64encode(img_bytes).decode('utf-8')
             images.append(img_base64)
 
         doc.close()
-        logger.info(f"Converted {len(images)} PDF pages (top half) to base64 images")
+        logger.info(f"Converted {len(images)} PDF pages to grayscale JPEG ({total_bytes // 1024} KB)")
         return images
-        
+
     except Exception as e:
         logger.error(f"Failed to convert PDF to images: {e}")
         return []
 
 
-def extract_pdf_metadata_with_qwen(images: list) -> dict:
+def _vision_prompt(n_pages: int, top_half: bool) -> str:
+    region = f"图片为PDF前{n_pages}页的上半部分，包含页眉区域" if top_half else f"图片为PDF前{n_pages}页"
+    note = "- 这些图片是页面上半部分的截图，专门用于捕获页眉信息\n" if top_half else ""
+    return f"""请从以下论文图片中提取以下元数据（{region}）：
+1. 论文标题（完整）
+2. 作者列表（所有作者，用逗号分隔）
+3. 发表期刊（期刊全名）
+4. 发表年份（仅4位数字）
+
+请以 JSON 格式返回：
+{{
+    "title": "...",
+    "authors": ["...", "..."],
+    "journal": "...",
+    "year": "..."
+}}
+
+注意：
+{note}- 期刊名称和年份通常在页眉位置（页面最顶部的一行）
+- 请仔细识别页眉中的期刊名、卷号、期号和年份
+- 作者信息通常在标题下方
+- 如果某项信息无法识别，返回 "Unknown"
+"""
+
+
+def extract_pdf_metadata_with_qwen(images: list, top_half: bool = True) -> dict:
     """
     用 Qwen-vl-plus 从 PDF 图片中提取元数据
-    
+
     Args:
-        images: PDF 图片列表（base64）
-    
+        images: PDF 图片列表（base64 JPEG）
+        top_half: 图片是否为页面上半部分（影响提示词）
+
     Returns:
         {
             "title": "论文标题",
@@ -83,62 +331,35 @@ def extract_pdf_metadata_with_qwen(images: list) -> dict:
     qwen_api_key = os.getenv("QWEN_API_KEY")
     if not qwen_api_key:
         logger.warning("QWEN_API_KEY not found in environment")
-        return {
-            "title": "Unknown",
-            "authors": ["Unknown"],
-            "journal": "Unknown",
-            "year": "Unknown"
-        }
-    
+        return _unknown()
+
     client = OpenAI(
         api_key=qwen_api_key,
         base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
     )
-    
-    prompt = """请从以下论文图片中提取以下元数据（图片为PDF前三页的上半部分，包含页眉区域）：
-1. 论文标题（完整）
-2. 作者列表（所有作者，用逗号分隔）
-3. 发表期刊（期刊全名）
-4. 发表年份（仅4位数字）
-
-请以 JSON 格式返回：
-{
-    "title": "...",
-    "authors": ["...", "..."],
-    "journal": "...",
-    "year": "..."
-}
 
-注意：
-- 这些图片是页面上半部分的截图，专门用于捕获页眉信息
-- 期刊名称和年份通常在页眉位置（页面最顶部的一行）
-- 请仔细识别页眉中的期刊名、卷号、期号和年份
-- 作者信息通常在标题下方
-- 如果某项信息无法识别，返回 "Unknown"
-"""
-    
     try:
-        content_messages = [{"type": "text", "text": prompt}]
-        
+        content_messages = [{"type": "text", "text": _vision_prompt(len(images), top_half)}]
+
         for img_base64 in images:
             content_messages.append({
                 "type": "image_url",
-                "image_url": {"url": f"data:image/png;base64,{img_base64}"}
+                "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"}
             })
-        
+
         logger.info(f"Sending request to Qwen VL with {len(images)} images...")
-        
+
         resp = client.chat.completions.create(
-            model="qwen-vl-plus",
+            model=VISION_MODEL,
             messages=[
                 {"role": "system", "content": "你是专业的学术论文元数据提取专家。"},
                 {"role": "user", "content": content_messages}
             ],
             temperature=0.0
         )
-        
+
         response_content = resp.choices[0].message.content
-        
+
         # 提取 JSON（支持 markdown 代码块）
         if "```json" in response_content:
             start_idx = response_content.find("```json") + 7
@@ -150,28 +371,35 @@ def extract_pdf_metadata_with_qwen(images: list) -> dict:
             json_str = response_content[start_idx:end_idx].strip()
         else:
             json_str = response_content.strip()
-        
+
         result = json.loads(json_str)
         logger.info(f"Successfully extracted PDF metadata: {result.get('title', 'Unknown')[:50]}...")
         return result
-        
+
     except Exception as e:
         logger.error(f"Qwen VL extraction failed: {e}")
-        return {
-            "title": "Unknown",
-            "authors": ["Unknown"],
-            "journal": "Unknown",
-            "year": "Unknown"
-        }
+        return _unknown()
 
 
-def extract_pdf_metadata(pdf_path: str) -> dict:
+def extract_pdf_metadata(
+    pdf_path: str,
+    max_pages: int = 2,
+    top_half: bool = True,
+    use_cache: bool = True,
+    text_first: bool = True,
+    cache_dir: Optional[str] = None,
+) -> dict:
     """
     从 PDF 文件中提取元数据（完整流程）
-    
+
     Args:
         pdf_path: PDF 文件路径
-    
+        max_pages: 送给视觉模型的页数
+        top_half: 只渲染页面上半部分
+        use_cache: 按 PDF 内容哈希复用已有结果
+        text_first: 首页文本层高置信度时跳过视觉模型
+        cache_dir: 缓存目录（默认环境变量 PDF_METADATA_CACHE，否则 <仓库>/.cache/pdf_metadata）
+
     Returns:
         {
             "title": "...",
@@ -181,20 +409,45 @@ def extract_pdf_metadata(pdf_path: str) -> dict:
         }
     """
     logger.info(f"Starting PDF metadata extraction from: {pdf_path}")
-    
-    # 步骤 1: 转换 PDF 为图片
-    images = convert_pdf_to_images(pdf_path, max_pages=2)
-    
+    if not os.path.exists(pdf_path):
+        logger.error(f"PDF not found: {pdf_path}")
+        return _unknown()
+
+    cache_dir = cache_dir or os.getenv("PDF_METADATA_CACHE") or DEFAULT_CACHE_DIR
+    key = None
+    if use_cache:
+        try:
+            key = _cache_key(pdf_sha256(pdf_path), max_pages, top_half)
+        except OSError as e:
+            logger.warning(f"Cannot hash PDF for metadata cache: {e}")
+        cached = _load_cached(cache_dir, key) if key else None
+        if cached:
+            logger.info(f"PDF metadata cache hit: {cached.get('title', 'Unknown')[:50]}...")
+            return cached
+
+    # 步骤 1: 文本层
+    text_metadata = _unknown()
+    if text_first:
+        text_metadata, confident = extract_metadata_from_text_layer(pdf_path)
+        if confident:
+            logger.info(f"Text layer metadata is confident, skipping vision call: {text_metadata['title'][:50]}...")
+            if key:
+                _save_cached(cache_dir, key, text_metadata)
+            return text_metadata
+
+    # 步骤 2: 转换 PDF 为图片
+    images = convert_pdf_to_images(pdf_path, max_pages=max_pages, top_half=top_half)
+
     if not images:
         logger.error("No images extracted, skipping PDF metadata extraction")
-        return {
-            "title": "Unknown",
-            "authors": ["Unknown"],
-            "journal": "Unknown",
-            "year": "Unknown"
-        }
-    
-    # 步骤 2: Qwen-vl-plus 视觉提取
-    metadata = extract_pdf_metadata_with_qwen(images)
-    
+        return text_metadata
+
+    # 步骤 3: Qwen-vl-plus 视觉提取，无法识别的字段用文本层结果补齐
+    metadata = extract_pdf_metadata_with_qwen(images, top_half=top_half)
+    for k, v in text_metadata.items():
+        if metadata.get(k) in (None, "", "Unknown", ["Unknown"]) and v not in ("Unknown", ["Unknown"]):
+            metadata[k] = v
+
+    if key and not _is_unknown(metadata):
+        _save_cached(cache_dir, key, metadata)
     return metadata
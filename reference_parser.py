@@ -0,0 +1,304 @@
+"""
+参考文献规则解析器（LLM 之前的快速路径）
+
+语料中的参考文献绝大多数属于少数几种规整格式：
+- GB/T 7714（中文期刊）：张三, 李四. 标题[J]. 经济研究, 2019, 54(3): 12-25.
+- APA / 作者-年份：Smith, J., & Doe, A. (2019). Title. Journal, 12(3), 45-67.
+- Chicago / AER：Acemoglu, Daron, and James A. Robinson. 2001. "Title." American Economic Review 91 (5): 1369-401.
+
+本模块用预编译正则逐条解析上述格式，输出与 LLM 提取相同的字段
+（author / year / title / journal / vol_issue / pages / raw_text）并附带置信度，
+由 extract_references.py 决定哪些条目仍需交给 LLM。
+"""
+
+import re
+from datetime import date
+
+# 条目前缀编号：[1] / ［1］ / 1. / 1) / 1、
+_NUMBER_PREFIX_RE = re.compile(r"^\s*(?:[\[［]\s*\d{1,4}\s*[\]］]|\d{1,4}\s*[\.\)、](?=\s|[^\d]))\s*")
+_BLANK_LINE_RE = re.compile(r"\n\s*\n")
+_WS_RE = re.compile(r"\s+")
+_NOISE_LINE_RE = re.compile(r"^\s*(?:#|<|!\[|\|)")
+# 作者-年份格式的条目起始（Smith, J. / 张三, 李四. / ACEMOGLU D,）
+_ENTRY_START_RE = re.compile(r"^(?:[A-Z][A-Za-z'’\-]+(?:\s[A-Z][A-Za-z'’\-]+)?,|[\u4e00-\u9fff]{2,4}[,，、.．])")
+_TERMINAL_RE = re.compile(r"[.。)）]\s*$")
+
+# 全角标点与弯引号 → 半角，仅用于解析，不改动 raw_text
+_PUNCT_TABLE = str.maketrans({
+    "．": ".", "，": ",", "：": ":", "；": ";", "（": "(", "）": ")",
+    "［": "[", "］": "]", "“": '"', "”": '"', "‘": "'", "’": "'",
+    "–": "-", "—": "-", "－": "-", "～": "~",
+})
+
+_YEAR_RE = re.compile(r"(?<!\d)((?:1[89]|20)\d{2})[a-z]?(?!\d)")
+_DOI_TAIL_RE = re.compile(r"\s*(?:https?://\S+|doi:\s*\S+|DOI:\s*\S+)\s*$")
+
+# GB/T 7714：作者. 题名[文献类型标识]. 其余
+_GB_RE = re.compile(
+    r"^(?P<author>[^\[\]]+?)\.\s*(?P<title>[^\[\]]+?)\s*\[(?P<type>[A-Z]{1,2}(?:/OL)?)\]\s*[.,]?\s*(?P<rest>.*)$"
+)
+# [J] 其余部分：刊名, 年, 卷(期): 页码.
+_GB_JOURNAL_RE = re.compile(
+    r"^(?P<journal>[^,]+?),\s*(?P<year>(?:1[89]|20)\d{2})[a-z]?"
+    r"\s*(?:,\s*(?P<vol>[^,:()]*?))?\s*(?:\((?P<issue>[^)]+)\))?"
+    r"\s*(?::\s*(?P<pages>[\dA-Za-z]+(?:\s*[-~]\s*[\dA-Za-z]+)?))?\s*\.?\s*$"
+)
+# [M]/[D]/[C] 其余部分：出版地: 出版者, 年[: 页码].
+_GB_PUBLISHER_RE = re.compile(
+    r"^(?:(?P<place>[^:,]+?):\s*)?(?P<publisher>[^,]+?),\s*(?P<year>(?:1[89]|20)\d{2})[a-z]?"
+    r"\s*(?::\s*(?P<pages>[\dA-Za-z]+(?:\s*-\s*[\dA-Za-z]+)?))?\s*\.?\s*$"
+)
+
+# 未加引号的题名：到第一个真正的句末标点为止。句点后须为空白或结尾，且不属于缩写
+# （单字母缩写/首字母 J. / U.S. / e.g. / i.e.，以及 vs. cf. al. No.）
+_TITLE = (
+    r"\"[^\"]+\"|.+?(?<![\s.(][A-Za-z])(?<!^[A-Za-z])(?<!\bvs)(?<!\bcf)(?<!\bal)(?<!\bNo)[.?!](?=\s|$)"
+)
+
+# APA：作者 (年). 题名. 其余
+_APA_RE = re.compile(
+    r"^(?P<author>.+?)\s*\((?P<year>(?:1[89]|20)\d{2}[a-z]?)(?:,[^)]*)?\)\s*[.,]?\s*"
+    r"(?P<title>" + _TITLE + r")\s*[.,]?\s*(?P<rest>.*)$"
+)
+# APA 其余部分：刊名, 卷(期), 页码.
+_APA_JOURNAL_RE = re.compile(
+    r"^(?P<journal>[^,\d][^,]*?),\s*(?:Vol\.?\s*)?(?P<vol>\d+)\s*(?:\((?P<issue>[^)]+)\))?"
+    r"\s*(?:,\s*(?:pp?\.\s*)?(?P<pages>[\dA-Za-z]*\d+(?:\s*-\s*[\dA-Za-z]*\d+)?))?\s*\.?\s*$"
+)
+
+# Chicago / AER：作者. 年. "题名." 其余
+_CHICAGO_RE = re.compile(
+    r"^(?P<author>.+?)\.\s+(?P<year>(?:1[89]|20)\d{2}[a-z]?)\.\s+(?P<title>" + _TITLE + r")\s*(?P<rest>.*)$"
+)
+# Chicago 其余部分：刊名 卷 (期): 页码.
+_CHICAGO_JOURNAL_RE = re.compile(
+    r"^(?P<journal>[^\d:]+?),?\s+(?P<vol>\d+)\s*(?:\((?P<issue>[^)]+)\))?"
+    r"\s*(?::\s*(?P<pages>[\dA-Za-z]*\d+(?:\s*-\s*[\dA-Za-z]*\d+)?))?\s*\.?\s*$"
+)
+# 图书：出版地: 出版者.
+_PLACE_PUBLISHER_RE = re.compile(r"^(?:(?P<place>[^:]+?):\s*)?(?P<publisher>[^:]+?)\.?\s*$")
+
+# 刊名中出现 ". " 后接成串的普通单词，说明题名在缩写处被截断、剩余部分并入了刊名
+# （缩写刊名 J. Financ. Econ. 不受影响）
+_SPLIT_JOURNAL_RE = re.compile(r"\.\s+\S+\s+[a-z]{2,}")
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]")
+
+_FIELD_WEIGHTS = {"author": 0.25, "year": 0.2, "title": 0.25, "journal": 0.15}
+_LOCATOR_WEIGHT = 0.15  # vol_issue 或 pages 任一存在即可
+
+DEFAULT_MIN_CONFIDENCE = 0.75
+
+
+def _normalize(text):
+    return _WS_RE.sub(" ", text.translate(_PUNCT_TABLE)).strip()
+
+
+def _clean(value):
+    if value is None:
+        return None
+    value = value.strip().strip(" .,;:\"")
+    return value or None
+
+
+def _clean_author(value):
+    # 作者名保留缩写后的句点（Smith, J. A.）
+    value = (value or "").strip().strip(" ,;:")
+    return value or None
+
+
+def _vol_issue(vol, issue):
+    vol = _clean(vol)
+    issue = _clean(issue)
+    if vol and issue:
+        return f"{vol}({issue})"
+    if issue:
+        return f"({issue})"
+    return vol
+
+
+def split_reference_entries(raw_text):
+    """
+    将参考文献原始文本切分为单条条目。
+
+    - 存在编号前缀（[1] / 1.）时，以编号行作为条目起点，其余行视为续行；
+    - 否则以空行分段，段内行若前一行以句末标点结束且本行形似作者开头，则另起一条。
+    """
+    lines = [ln for ln in raw_text.replace("\x00", "").split("\n") if not _NOISE_LINE_RE.match(ln)]
+    text = "\n".join(lines)
+
+    numbered = [ln for ln in lines if _NUMBER_PREFIX_RE.match(ln) and ln.strip()]
+    entries = []
+    if len(numbered) >= 2:
+        current = []
+        for ln in lines:
+            if not ln.strip():
+                continue
+            if _NUMBER_PREFIX_RE.match(ln) and current:
+                entries.append(" ".join(current))
+                current = []
+            current.append(ln.strip())
+        if current:
+            entries.append(" ".join(current))
+    else:
+        for para in _BLANK_LINE_RE.split(text):
+            current = []
+            for ln in para.split("\n"):
+                stripped = ln.strip()
+                if not stripped:
+                    continue
+                if current and _TERMINAL_RE.search(current[-1]) and _ENTRY_START_RE.match(stripped):
+                    entries.append(" ".join(current))
+                    current = []
+                current.append(stripped)
+            if current:
+                entries.append(" ".join(current))
+
+    return [e for e in (_WS_RE.sub(" ", e).strip() for e in entries) if len(e) >= 10]
+
+
+def _parse_gbt7714(norm):
+    m = _GB_RE.match(norm)
+    if not m:
+        return None
+    ref = {"author": _clean_author(m.group("author")), "title": _clean(m.group("title"))}
+    rest = _DOI_TAIL_RE.sub("", m.group("rest"))
+    ref_type = m.group("type")
+
+    if ref_type == "J":
+        jm = _GB_JOURNAL_RE.match(rest)
+        if jm:
+            ref.update(
+                journal=_clean(jm.group("journal")),
+                year=jm.group("year"),
+                vol_issue=_vol_issue(jm.group("vol"), jm.group("issue")),
+                pages=_clean(jm.group("pages")),
+            )
+            return ref
+    else:
+        pm = _GB_PUBLISHER_RE.match(rest)
+        if pm:
+            ref.update(journal=_clean(pm.group("publisher")), year=pm.group("year"), pages=_clean(pm.group("pages")))
+            return ref
+
+    # 其余部分不规整时至少取出年份和刊名
+    ym = _YEAR_RE.search(rest)
+    if ym:
+        ref["year"] = ym.group(1)
+        ref["journal"] = _clean(rest[:ym.start()])
+    return ref
+
+
+def _parse_rest_as_journal(rest, journal_re):
+    rest = _DOI_TAIL_RE.sub("", rest).strip()
+    jm = journal_re.match(rest)
+    if jm:
+        return {
+            "journal": _clean(jm.group("journal")),
+            "vol_issue": _vol_issue(jm.group("vol"), jm.group("issue")),
+            "pages": _clean(jm.group("pages")),
+        }
+    pm = _PLACE_PUBLISHER_RE.match(rest)
+    if pm and rest:
+        return {"journal": _clean(pm.group("publisher"))}
+    return {}
+
+
+def _parse_apa(norm):
+    m = _APA_RE.match(norm)
+    if not m:
+        return None
+    ref = {
+        "author": _clean_author(m.group("author")),
+        "year": m.group("year")[:4],
+        "title": _clean(m.group("title")),
+    }
+    ref.update(_parse_rest_as_journal(m.group("rest"), _APA_JOURNAL_RE))
+    return ref
+
+
+def _parse_chicago(norm):
+    m = _CHICAGO_RE.match(norm)
+    if not m:
+        return None
+    ref = {
+        "author": _clean_author(m.group("author")),
+        "year": m.group("year")[:4],
+        "title": _clean(m.group("title")),
+    }
+    ref.update(_parse_rest_as_journal(m.group("rest"), _CHICAGO_JOURNAL_RE))
+    return ref
+
+
+_STYLE_PARSERS = (
+    ("gbt7714", _parse_gbt7714),
+    ("apa", _parse_apa),
+    ("chicago", _parse_chicago),
+)
+
+
+def score_reference(ref):
+    """按字段完整度与合理性给出 0~1 的置信度。"""
+    score = sum(w for field, w in _FIELD_WEIGHTS.items() if ref.get(field))
+    if ref.get("vol_issue") or ref.get("pages"):
+        score += _LOCATOR_WEIGHT
+
+    year = ref.get("year")
+    if year and not (1800 <= int(year[:4]) <= date.today().year + 1):
+        score -= 0.3
+    title = ref.get("title") or ""
+    if title and not (3 <= len(title) <= 300):
+        score -= 0.3
+    elif title and not _CJK_RE.search(title) and (len(title) < 8 or len(title.split()) < 2):
+        # 过短的西文题名多为解析截断，交给 LLM
+        score -= 0.3
+    journal = ref.get("journal") or ""
+    if _SPLIT_JOURNAL_RE.search(journal):
+        score -= 0.3
+    author = ref.get("author") or ""
+    if len(author) > 300 or re.search(r"\d{4}", author):
+        score -= 0.3
+    return round(max(0.0, min(1.0, score)), 2)
+
+
+def parse_reference(entry):
+    """
+    解析单条参考文献，返回带 style / confidence 字段的 dict。
+    所有格式都不匹配时返回 confidence=0 的空结果（仅保留 raw_text）。
+    """
+    norm = _normalize(_NUMBER_PREFIX_RE.sub("", entry, count=1))
+    best = None
+    for style, parser in _STYLE_PARSERS:
+        ref = parser(norm)
+        if not ref:
+            continue
+        confidence = score_reference(ref)
+        if best is None or confidence > best["confidence"]:
+            best = dict(ref, style=style, confidence=confidence)
+        if confidence >= 1.0:
+            break
+
+    result = {key: None for key in ("author", "year", "title", "journal", "vol_issue", "pages")}
+    result.update(style=None, confidence=0.0)
+    if best:
+        result.update(best)
+    result["raw_text"] = entry
+    return result
+
+
+def parse_references(raw_text, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """
+    规则解析整段参考文献文本。
+
+    Returns:
+        (parsed, pending): parsed 为置信度达标的条目（保持原顺序，带 "_index"），
+        pending 为需交给 LLM 的 (index, raw_text) 列表。
+    """
+    parsed, pending = [], []
+    for idx, entry in enumerate(split_reference_entries(raw_text)):
+        ref = parse_reference(entry)
+        if ref["confidence"] >= min_confidence:
+            ref["_index"] = idx
+            parsed.append(ref)
+        else:
+            pending.append((idx, entry))
+    return parsed, pending
@@ -0,0 +1,376 @@
+"""
+语料级参考文献与引用关系库（SQLite + FTS5）
+
+extract_references.py / citation_tracer.py 每次只为单篇论文生成 Excel，
+同一被引文献在不同论文中会被重复解析且彼此无关联。本模块把它们汇总到
+references/corpus_refs.db：
+
+- works：归一化后的被引文献，id 由「第一作者姓 + 年份 + 标题」哈希得到，跨论文稳定；
+- citations：施引论文 → 被引文献的边（含原始条目文本）；
+- contexts：citation_tracer 确认的引用上下文；
+- raw_refs：原始条目文本哈希 → work_id，用于跳过已解析过的条目；
+- works_fts：标题/作者/期刊全文检索（SQLite 不支持 FTS5 时退化为 LIKE）。
+
+用法：
+    python reference_store.py ingest references/            # 回填已有 Excel
+    python reference_store.py most-cited --limit 20
+    python reference_store.py citing "colonial origins"
+    python reference_store.py search "数字经济"
+"""
+
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "references", "corpus_refs.db")
+
+REF_FIELDS = ("author", "year", "title", "journal", "vol_issue", "pages")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    paper_id    TEXT PRIMARY KEY,
+    source_path TEXT,
+    refs_hash   TEXT,
+    ingested_at TEXT
+);
+CREATE TABLE IF NOT EXISTS works (
+    work_id   TEXT PRIMARY KEY,
+    author    TEXT,
+    year      TEXT,
+    title     TEXT,
+    journal   TEXT,
+    vol_issue TEXT,
+    pages     TEXT
+);
+CREATE TABLE IF NOT EXISTS citations (
+    paper_id  TEXT NOT NULL,
+    work_id   TEXT NOT NULL,
+    ref_index INTEGER,
+    raw_text  TEXT,
+    PRIMARY KEY (paper_id, work_id)
+);
+CREATE INDEX IF NOT EXISTS idx_citations_work ON citations(work_id);
+CREATE TABLE IF NOT EXISTS contexts (
+    paper_id TEXT NOT NULL,
+    work_id  TEXT NOT NULL,
+    para_id  INTEGER,
+    quote    TEXT,
+    zh       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_contexts_pair ON contexts(paper_id, work_id);
+CREATE TABLE IF NOT EXISTS raw_refs (
+    raw_hash TEXT PRIMARY KEY,
+    work_id  TEXT NOT NULL
+);
+"""
+
+_NON_WORD_RE = re.compile(r"[^0-9a-z\u4e00-\u9fff]+")
+
+
+def _norm(text):
+    return _NON_WORD_RE.sub("", str(text or "").lower())
+
+
+def _is_blank(value):
+    return value is None or str(value).strip().lower() in ("", "nan", "none", "null")
+
+
+def _first_surname(author):
+    author = str(author or "").strip()
+    first = re.split(r"[,，;；&]| and ", author, maxsplit=1)[0].strip()
+    return _norm(first.split(" ")[0])
+
+
+def raw_hash(raw_text):
+    """原始条目文本的归一化哈希（忽略编号、空白与标点差异）。"""
+    text = re.sub(r"^\s*(?:[\[［]\s*\d+\s*[\]］]|\d+\s*[\.\)、])\s*", "", str(raw_text or ""))
+    return hashlib.sha1(_norm(text).encode("utf-8")).hexdigest()
+
+
+def work_id_for(ref):
+    """
+    被引文献的稳定 id：第一作者姓 + 年份 + 标题前 60 个归一化字符。
+    标题缺失时退化为原始条目文本。
+    """
+    title = _norm(ref.get("title"))[:60]
+    if not title:
+        return "r" + raw_hash(ref.get("raw_text"))[:15]
+    year = re.sub(r"\D", "", str(ref.get("year") or ""))[:4]
+    key = f"{_first_surname(ref.get('author'))}|{year}|{title}"
+    return "w" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:15]
+
+
+def paper_id_from_path(path):
+    """由 md / Excel 文件名得到施引论文 id（去掉 _segmented / _references 等后缀）。"""
+    base = os.path.splitext(os.path.basename(path))[0]
+    for suffix in ("_with_citations", "_references", "_segmented"):
+        if base.endswith(suffix):
+            base = base[: -len(suffix)]
+    return base
+
+
+class ReferenceStore:
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = os.path.abspath(db_path)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(_SCHEMA)
+        self.has_fts = self._init_fts()
+        self.conn.commit()
+
+    def _init_fts(self):
+        try:
+            self.conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS works_fts USING fts5("
+                "work_id UNINDEXED, title, author, journal, tokenize='unicode61')"
+            )
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 unavailable, falling back to LIKE search: {e}")
+            return False
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- ingestion ---
+
+    def _upsert_work(self, ref):
+        work_id = work_id_for(ref)
+        fields = {f: (None if _is_blank(ref.get(f)) else str(ref.get(f)).strip()) for f in REF_FIELDS}
+        row = self.conn.execute("SELECT * FROM works WHERE work_id = ?", (work_id,)).fetchone()
+        if row is None:
+            self.conn.execute(
+                "INSERT INTO works (work_id, author, year, title, journal, vol_issue, pages) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (work_id, *(fields[f] for f in REF_FIELDS)),
+            )
+            if self.has_fts:
+                self.conn.execute(
+                    "INSERT INTO works_fts (work_id, title, author, journal) VALUES (?, ?, ?, ?)",
+                    (work_id, fields["title"] or "", fields["author"] or "", fields["journal"] or ""),
+                )
+        else:
+            # 只补全缺失字段，不覆盖已有值
+            missing = {f: v for f, v in fields.items() if v and not row[f]}
+            if missing:
+                sets = ", ".join(f"{f} = ?" for f in missing)
+                self.conn.execute(f"UPDATE works SET {sets} WHERE work_id = ?", (*missing.values(), work_id))
+                if self.has_fts and missing.keys() & {"title", "author", "journal"}:
+                    # 检索索引同步补全（先删后插，旧库中缺失的索引行也一并补上）
+                    merged = {f: missing.get(f) or row[f] or "" for f in ("title", "author", "journal")}
+                    self.conn.execute("DELETE FROM works_fts WHERE work_id = ?", (work_id,))
+                    self.conn.execute(
+                        "INSERT INTO works_fts (work_id, title, author, journal) VALUES (?, ?, ?, ?)",
+                        (work_id, merged["title"], merged["author"], merged["journal"]),
+                    )
+        if not _is_blank(ref.get("raw_text")):
+            self.conn.execute(
+                "INSERT OR IGNORE INTO raw_refs (raw_hash, work_id) VALUES (?, ?)",
+                (raw_hash(ref["raw_text"]), work_id),
+            )
+        return work_id
+
+    def ingest_references(self, paper_id, refs, source_path=None):
+        """
+        写入一篇论文的参考文献列表。内容哈希未变化时跳过（增量导入）；
+        变化时替换该论文的全部引用边。返回 work_id 列表（与 refs 对齐）；跳过时返回 None。
+        """
+        refs = [r for r in refs if isinstance(r, dict)]
+        digest = hashlib.sha1("\n".join(raw_hash(r.get("raw_text")) for r in refs).encode("utf-8")).hexdigest()
+        row = self.conn.execute("SELECT refs_hash FROM papers WHERE paper_id = ?", (paper_id,)).fetchone()
+        if row is not None and row["refs_hash"] == digest:
+            logger.info(f"Reference store: {paper_id} unchanged, skipped")
+            return None
+
+        with self.conn:
+            self.conn.execute("DELETE FROM citations WHERE paper_id = ?", (paper_id,))
+            work_ids = []
+            for idx, ref in enumerate(refs):
+                work_id = self._upsert_work(ref)
+                work_ids.append(work_id)
+                raw = None if _is_blank(ref.get("raw_text")) else str(ref["raw_text"])
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO citations (paper_id, work_id, ref_index, raw_text) VALUES (?, ?, ?, ?)",
+                    (paper_id, work_id, idx, raw),
+                )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO papers (paper_id, source_path, refs_hash, ingested_at) VALUES (?, ?, ?, ?)",
+                (paper_id, source_path, digest, datetime.now().isoformat()),
+            )
+        logger.info(f"Reference store: ingested {len(refs)} references for {paper_id}")
+        return work_ids
+
+    def ingest_contexts(self, paper_id, refs, citations_per_ref):
+        """
+        写入 citation_tracer 的引用上下文。refs 与 citations_per_ref 一一对应，
+        后者每项为 [{"para_id", "quote", "zh"}, ...]。同一 (论文, 文献) 的旧上下文会被替换。
+        """
+        with self.conn:
+            for ref, cites in zip(refs, citations_per_ref):
+                work_id = work_id_for(ref)
+                self.conn.execute("DELETE FROM contexts WHERE paper_id = ? AND work_id = ?", (paper_id, work_id))
+                for c in cites or []:
+                    self.conn.execute(
+                        "INSERT INTO contexts (paper_id, work_id, para_id, quote, zh) VALUES (?, ?, ?, ?, ?)",
+                        (paper_id, work_id, c.get("para_id"), c.get("quote", ""), c.get("zh", "")),
+                    )
+
+    def lookup_raw(self, raw_text):
+        """按原始条目文本查找已入库的文献，命中时返回字段 dict，否则 None。"""
+        row = self.conn.execute(
+            "SELECT w.* FROM raw_refs r JOIN works w ON w.work_id = r.work_id WHERE r.raw_hash = ?",
+            (raw_hash(raw_text),),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def is_ingested(self, paper_id):
+        return self.conn.execute("SELECT 1 FROM papers WHERE paper_id = ?", (paper_id,)).fetchone() is not None
+
+    # --- queries ---
+
+    def most_cited(self, limit=20):
+        rows = self.conn.execute(
+            """
+            SELECT w.*, COUNT(DISTINCT c.paper_id) AS cited_by
+            FROM citations c JOIN works w ON w.work_id = c.work_id
+            GROUP BY c.work_id
+            ORDER BY cited_by DESC, w.year DESC
+            LIMIT ?
+            """,
+            (limit,),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def search(self, query, limit=20):
+        """按标题/作者/期刊检索被引文献。"""
+        if self.has_fts:
+            terms = " ".join('"' + t.replace('"', '""') + '"' for t in query.split() if t)
+            try:
+                rows = self.conn.execute(
+                    """
+                    SELECT w.* FROM works_fts f JOIN works w ON w.work_id = f.work_id
+                    WHERE works_fts MATCH ? ORDER BY rank LIMIT ?
+                    """,
+                    (terms, limit),
+                ).fetchall()
+                if rows:
+                    return [dict(r) for r in rows]
+            except sqlite3.OperationalError as e:
+                logger.warning(f"FTS query failed, falling back to LIKE: {e}")
+        # unicode61 不切分中文，中文子串查询走 LIKE
+        like = f"%{query}%"
+        rows = self.conn.execute(
+            "SELECT * FROM works WHERE title LIKE ? OR author LIKE ? OR journal LIKE ? LIMIT ?",
+            (like, like, like, limit),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def papers_citing(self, work_id):
+        """返回引用某文献的论文及其引用上下文。"""
+        rows = self.conn.execute(
+            "SELECT paper_id, ref_index, raw_text FROM citations WHERE work_id = ? ORDER BY paper_id",
+            (work_id,),
+        ).fetchall()
+        results = []
+        for r in rows:
+            contexts = self.conn.execute(
+                "SELECT para_id, quote, zh FROM contexts WHERE paper_id = ? AND work_id = ?",
+                (r["paper_id"], work_id),
+            ).fetchall()
+            results.append(dict(r, contexts=[dict(c) for c in contexts]))
+        return results
+
+    def references_of(self, paper_id):
+        rows = self.conn.execute(
+            """
+            SELECT w.*, c.ref_index, c.raw_text FROM citations c JOIN works w ON w.work_id = c.work_id
+            WHERE c.paper_id = ? ORDER BY c.ref_index
+            """,
+            (paper_id,),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+
+def ingest_excel_dir(store, ref_dir):
+    """回填 references/ 下已有的 *_references.xlsx 与 *_with_citations.xlsx。"""
+    import pandas as pd
+
+    count = 0
+    for path in sorted(glob.glob(os.path.join(ref_dir, "*_references.xlsx"))):
+        df = pd.read_excel(path).fillna("")
+        refs = df.to_dict("records")
+        paper_id = paper_id_from_path(path)
+        store.ingest_references(paper_id, refs, source_path=path)
+        count += 1
+
+        traced = os.path.join(ref_dir, f"{os.path.splitext(os.path.basename(path))[0]}_with_citations.xlsx")
+        if os.path.exists(traced):
+            tdf = pd.read_excel(traced).fillna("")
+            citations = []
+            for row in tdf.to_dict("records"):
+                quotes = [q for q in str(row.get("Citation_Contexts_All", "")).split(" || ") if q.strip()]
+                citations.append([{"para_id": None, "quote": q, "zh": ""} for q in quotes])
+            store.ingest_contexts(paper_id, tdf.to_dict("records"), citations)
+    return count
+
+
+def _format_work(w):
+    return f"[{w['work_id']}] {w.get('author') or '?'} ({w.get('year') or '?'}). {w.get('title') or ''}"
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="语料级参考文献 / 引用关系库")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="SQLite 数据库路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_ingest = sub.add_parser("ingest", help="导入 references/ 目录下已有的 Excel 结果")
+    p_ingest.add_argument("ref_dir", nargs="?", default=os.path.dirname(DEFAULT_DB_PATH))
+
+    p_top = sub.add_parser("most-cited", help="全库被引次数最多的文献")
+    p_top.add_argument("--limit", type=int, default=20)
+
+    p_search = sub.add_parser("search", help="按标题/作者/期刊检索")
+    p_search.add_argument("query")
+
+    p_citing = sub.add_parser("citing", help="引用某文献的论文（参数为 work_id 或检索词）")
+    p_citing.add_argument("query")
+
+    args = parser.parse_args()
+
+    with ReferenceStore(args.db) as store:
+        if args.command == "ingest":
+            n = ingest_excel_dir(store, args.ref_dir)
+            print(f"Ingested {n} reference files into {store.db_path}")
+        elif args.command == "most-cited":
+            for w in store.most_cited(args.limit):
+                print(f"{w['cited_by']:>4}  {_format_work(w)}")
+        elif args.command == "search":
+            for w in store.search(args.query):
+                print(_format_work(w))
+        elif args.command == "citing":
+            works = [{"work_id": args.query}] if re.fullmatch(r"[wr][0-9a-f]{15}", args.query) else store.search(args.query, limit=5)
+            for w in works:
+                if "title" in w:
+                    print(_format_work(w))
+                for p in store.papers_citing(w["work_id"]):
+                    print(f"  <- {p['paper_id']}")
+                    for c in p["contexts"]:
+                        print(f"       {c['quote'][:160]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import os
 import sys
 import argparse
 import logging
+from paper_classifier import pdf_page_count
 from smart_scholar_lib import SmartScholar
 from state_manager import StateManager
 
@@ -83,12 +84,20 @@ def main():
                 state_mgr.mark_failed(pdf_path, "Extraction failed")
                 continue
 
-            # 2. Classify
-            logger.info("Classifying Paper Type...")
-            with open(extracted_md_path, 'r', encoding='utf-8') as f:
-                content_preview = f.read(5000)
-            paper_type = scholar.classify_paper(content_preview)
-            logger.info(f"Paper Classified as: {paper_type}")
+            # 2. Classify (local heuristic first, LLM only for ambiguous papers;
+            #    a decision recorded by an earlier run is reused)
+            classification = state_mgr.get_classification(pdf_path)
+            if classification:
+                logger.info("Using recorded classification...")
+            else:
+                logger.info("Classifying Paper Type...")
+                with open(extracted_md_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                classification = scholar.classify_paper_detailed(content, pdf_page_count(pdf_path))
+                state_mgr.record_classification(pdf_path, classification)
+            paper_type = classification["type"]
+            logger.info(f"Paper Classified as: {paper_type} "
+                        f"({classification['method']}, confidence {classification['confidence']:.2f})")
 
             # 3. Dispatch
             if paper_type == "IGNORE":
@@ -81,17 +81,13 @@ def main():
     report_path = os.path.join(final_output_dir, "Final_Deep_Reading_Report.md")
     run_command(f'python run_supplemental_reading.py "{report_path}" --regenerate', env=env)
 
-    # 4. Dataview Summaries
-    print("\n[Step 4] Injecting Dataview Summaries...")
-    run_command(f'python inject_dataview_summaries.py "{final_output_dir}"')
-
-    # 5. Obsidian Metadata
-    print("\n[Step 5] Injecting Obsidian Metadata & Links...")
+    # 4+5. Dataview Summaries + Obsidian Metadata & Links (one read/write pass per file)
+    print("\n[Step 4-5] Injecting Dataview Summaries, Obsidian Metadata & Links...")
     # Check if QWEN_API_KEY is available for PDF vision extraction
     if os.getenv("QWEN_API_KEY"):
-        run_command(f'python inject_obsidian_meta.py "{source_md_file}" "{final_output_dir}" --use_pdf_vision --pdf_path "{pdf_path}"')
+        run_command(f'python inject_obsidian_meta.py "{source_md_file}" "{final_output_dir}" --dataview --use_pdf_vision --pdf_path "{pdf_path}"')
     else:
-        run_command(f'python inject_obsidian_meta.py "{source_md_file}" "{final_output_dir}"')
+        run_command(f'python inject_obsidian_meta.py "{source_md_file}" "{final_output_dir}" --dataview')
 
     print(f"\n--- Pipeline Complete! ---")
     print(f"Results are in: {final_output_dir}")
@@ -7,6 +7,8 @@ import json_repair
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from paper_classifier import DEFAULT_MIN_CONFIDENCE, classify_heuristic
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -35,10 +37,48 @@ class SmartScholar:
             raise ValueError("DEEPSEEK_API_KEY not found in environment")
         self.client = OpenAI(api_key=self.api_key, base_url="https://api.deepseek.com")
         
-    def classify_paper(self, text_segment: str) -> str:
+    def classify_paper(self, text_segment: str, page_count: int = None) -> str:
+        """
+        Classify the paper as 'QUANT', 'QUAL' or 'IGNORE' based on text content.
         """
-        Classify the paper as 'QUANT' or 'QUAL' based on text content.
+        return self.classify_paper_detailed(text_segment, page_count)["type"]
+
+    def classify_paper_detailed(self, text: str, page_count: int = None,
+                                min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> dict:
+        """
+        Classify with the local heuristic first (paper_classifier); only papers
+        below *min_confidence* go to the LLM.  *text* may be the whole extracted
+        Markdown (the LLM still only sees the first 4,000 characters).
+
+        Returns {"type", "confidence", "method": "heuristic" | "llm" | "llm_fallback",
+        "scores", "reason"}.
         """
+        local = classify_heuristic(text, page_count)
+        result = {
+            "type": local["type"],
+            "confidence": local["confidence"],
+            "method": "heuristic",
+            "scores": local["scores"],
+            "pages": local["features"]["pages"],
+            "reason": "",
+        }
+        if local["confidence"] >= min_confidence:
+            logger.info(f"Heuristic classification: {local['type']} "
+                        f"(confidence {local['confidence']:.2f}, scores {local['scores']})")
+            return result
+
+        logger.info(f"Heuristic classification ambiguous (best {local['type']}, "
+                    f"confidence {local['confidence']:.2f}), asking LLM...")
+        paper_type, reason, ok = self._classify_with_llm(text)
+        result.update({
+            "type": paper_type,
+            "method": "llm" if ok else "llm_fallback",
+            "reason": reason,
+        })
+        return result
+
+    def _classify_with_llm(self, text_segment: str) -> tuple:
+        """LLM classification: (type, reason, succeeded)."""
         system_prompt = """
         You are an expert Academic Editor. Your task is to classify a research paper into one of three categories based on its content (Abstract, Intro, Methodology).
         
@@ -70,10 +110,11 @@ class SmartScholar:
             )
             content = response.choices[0].message.content
             result = json_repair.repair_json(content, return_objects=True)
-            return result.get("type", "QUAL") # Default to QUAL if unsure (safer for reviews/theory)
+            # Default to QUAL if unsure (safer for reviews/theory)
+            return result.get("type", "QUAL"), result.get("reason", ""), True
         except Exception as e:
             logger.error(f"Classification failed: {e}")
-            return "QUAL" # Fallback to QUAL
+            return "QUAL", str(e), False # Fallback to QUAL
 
     def run_command(self, cmd, cwd=None):
         if cwd is None:
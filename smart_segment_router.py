@@ -14,6 +14,9 @@ from openai import OpenAI
 from dotenv import load_dotenv
 import json_repair
 
+from deep_reading_steps.keyword_router import compile_router
+from deep_reading_steps.title_index import TitleIndex
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -58,6 +61,44 @@ class SmartSegmentRouter:
         "L4": "L4_Value (价值层) - 结论、讨论、研究缺口、理论贡献、实践启示"
     }
     
+    # 论文类型检测关键词（_detect_paper_type）
+    PAPER_TYPE_KEYWORDS = {
+        # 定量论文关键词
+        "quant": ['regression', 'ols', 'did', 'iv', 'rdd', 'panel data',
+                  'robustness', 'endogeneity', '系数', '回归', '稳健性',
+                  '实证分析', '计量模型', '内生性'],
+        # 定性论文关键词
+        "qual": ['case study', 'grounded theory', 'qca', 'qualitative',
+                 'interview', '案例研究', '扎根理论', '访谈', '质性研究'],
+    }
+    
+    # 规则回退分类关键词（_fallback_classification）
+    FALLBACK_KEYWORDS = {
+        "quant": {
+            "1": ["abstract", "introduction", "摘要", "引言"],
+            "2": ["literature", "theory", "文献", "理论"],
+            "3": ["data", "sample", "数据", "样本"],
+            "4": ["variable", "measure", "变量", "测量"],
+            "5": ["model", "method", "empirical", "模型", "方法", "实证"],
+            "6": ["result", "finding", "结果", "发现"],
+            "7": ["conclusion", "limitation", "结论", "局限"]
+        },
+        "qual": {
+            "L1": ["abstract", "introduction", "摘要", "引言", "背景"],
+            "L2": ["literature", "theory", "文献", "理论", "综述"],
+            "L3": ["method", "result", "case", "方法", "结果", "案例", "分析"],
+            "L4": ["conclusion", "discussion", "结论", "讨论", "启示"]
+        },
+    }
+    
+    # 支持多步骤映射的标题（仅 QUANT）
+    MULTI_STEP_TITLES = {
+        "研究设计": ["3", "4", "5"],
+        "实证设计": ["3", "4", "5"],
+        "methodology": ["3", "4", "5"],
+        "empirical strategy": ["3", "4", "5"]
+    }
+    
     def __init__(self, api_key: str = None):
         self.api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
         self.client = None
@@ -120,19 +161,12 @@ class SmartSegmentRouter:
         """
         根据标题内容自动检测论文类型 (quant/qual)
         """
-        heading_text = ' '.join(headings).lower()
+        heading_text = ' '.join(headings)
         
-        # 定量论文关键词
-        quant_keywords = ['regression', 'ols', 'did', 'iv', 'rdd', 'panel data', 
-                         'robustness', 'endogeneity', '系数', '回归', '稳健性',
-                         '实证分析', '计量模型', '内生性']
-        
-        # 定性论文关键词
-        qual_keywords = ['case study', 'grounded theory', 'qca', 'qualitative',
-                        'interview', '案例研究', '扎根理论', '访谈', '质性研究']
-        
-        quant_score = sum(1 for k in quant_keywords if k in heading_text)
-        qual_score = sum(1 for k in qual_keywords if k in heading_text)
+        # 两组关键词同一个自动机，一次扫描得到各自命中的关键词个数
+        scores = compile_router(self.PAPER_TYPE_KEYWORDS).scores(heading_text)
+        quant_score = scores.get("quant", 0)
+        qual_score = scores.get("qual", 0)
         
         return "quant" if quant_score >= qual_score else "qual"
     
@@ -263,56 +297,34 @@ class SmartSegmentRouter:
     def _fallback_classification(self, headings: List[Heading], mode: str) -> Dict[str, List[str]]:
         """
         基于规则的回退分类（当 LLM 失败时使用）
-        """
-        routing = {}
         
+        多步骤标题与各步骤关键词编译进同一个自动机（多步骤标题排在前面，优先命中），
+        每个标题只扫描一次；单步骤标题取声明顺序中第一个命中的步骤。
+        """
         if mode == "quant":
-            keywords = {
-                "1": ["abstract", "introduction", "摘要", "引言"],
-                "2": ["literature", "theory", "文献", "理论"],
-                "3": ["data", "sample", "数据", "样本"],
-                "4": ["variable", "measure", "变量", "测量"],
-                "5": ["model", "method", "empirical", "模型", "方法", "实证"],
-                "6": ["result", "finding", "结果", "发现"],
-                "7": ["conclusion", "limitation", "结论", "局限"]
-            }
+            keywords = self.FALLBACK_KEYWORDS["quant"]
+            multi_step_titles = self.MULTI_STEP_TITLES
         else:
-            keywords = {
-                "L1": ["abstract", "introduction", "摘要", "引言", "背景"],
-                "L2": ["literature", "theory", "文献", "理论", "综述"],
-                "L3": ["method", "result", "case", "方法", "结果", "案例", "分析"],
-                "L4": ["conclusion", "discussion", "结论", "讨论", "启示"]
-            }
-        
-        for step_id, kws in keywords.items():
-            routing[step_id] = []
-        
-        # 支持多步骤映射的标题
-        multi_step_titles = {
-            "研究设计": ["3", "4", "5"],
-            "实证设计": ["3", "4", "5"],
-            "methodology": ["3", "4", "5"],
-            "empirical strategy": ["3", "4", "5"]
-        }
+            keywords = self.FALLBACK_KEYWORDS["qual"]
+            multi_step_titles = {}
+        
+        groups = {("multi", title): [title] for title in multi_step_titles}
+        groups.update(keywords)
+        router = compile_router(groups)
+        
+        routing = {step_id: [] for step_id in keywords}
         
         for h in headings:
-            title_lower = h.title.lower()
-            
-            # 检查是否是多步骤标题
-            is_multi = False
-            for multi_title, step_ids in multi_step_titles.items():
-                if multi_title in title_lower:
-                    for step_id in step_ids:
-                        routing[step_id].append(h.title)
-                    is_multi = True
-                    break
-            
-            if not is_multi:
+            group = router.first(h.title)
+            if group is None:
+                continue
+            if isinstance(group, tuple):
+                # 多步骤标题
+                for step_id in multi_step_titles[group[1]]:
+                    routing[step_id].append(h.title)
+            else:
                 # 单步骤映射
-                for step_id, kws in keywords.items():
-                    if any(kw in title_lower for kw in kws):
-                        routing[step_id].append(h.title)
-                        break
+                routing[group].append(h.title)
         
         return routing
     
@@ -325,6 +337,8 @@ class SmartSegmentRouter:
         """
         # 构建标题到位置和层级的映射
         title_to_heading = {h.title: h for h in headings}
+        # LLM 返回的标题可能有标点/空格/OCR 差异，精确查找失败时模糊解析
+        title_index = TitleIndex(list(title_to_heading))
         
         segments = {}
         
@@ -336,6 +350,9 @@ class SmartSegmentRouter:
                     continue
                     
                 heading = title_to_heading.get(title)
+                if not heading:
+                    real_title = title_index.resolve(title)
+                    heading = title_to_heading.get(real_title) if real_title else None
                 if not heading:
                     logger.warning(f"Title not found: {title}")
                     continue
@@ -7,6 +7,8 @@ import pandas as pd
 from datetime import datetime
 from openai import OpenAI
 from dotenv import load_dotenv
+
+from deep_reading_steps.keyword_router import QUAL_LAYER_KEYWORDS, compile_router, keyword_matcher, route_sections
 import json_repair
 
 # Configure logging
@@ -557,10 +559,7 @@ def _extract_smart_router_qual_sections(sections: dict) -> dict:
 
 def get_combined_text(sections: dict, keys: list) -> str:
     """Combine text from specific sections based on keywords."""
-    text = ""
-    for k, v in sections.items():
-        if any(key.lower() in k.lower() for key in keys):
-            text += v + "\n"
+    text = route_sections(sections, keyword_matcher(keys))["match"]
     return text if text else "".join(sections.values())[:30000] # Fallback
 
 def main():
@@ -610,7 +609,9 @@ def main():
             text_l4 = sections.get("L4_Value", "")
         else:
             # Traditional format: Define context for each layer using keyword matching
-            text_l1 = get_combined_text(sections, ["abstract", "introduction", "background", "摘要", "引言", "背景", "绪论", "问题提出"])
+            layer_texts = route_sections(sections, compile_router(QUAL_LAYER_KEYWORDS))
+            fallback_text = "".join(sections.values())[:30000]
+            text_l1 = layer_texts["L1_Context"] or fallback_text
             
             # Fallback for L1 if empty (common in papers without explicit Introduction header)
             if len(text_l1) < 200:
@@ -620,9 +621,9 @@ def main():
                     if len(keys) > 1:
                         text_l1 += "\n" + sections[keys[1]]
             
-            text_l2 = get_combined_text(sections, ["literature", "theory", "theoretical", "文献", "综述", "理论", "基础", "研究现状"])
-            text_l3 = get_combined_text(sections, ["method", "result", "finding", "case", "analysis", "方法", "设计", "案例", "结果", "分析", "实证", "模型", "路径", "机制"])
-            text_l4 = get_combined_text(sections, ["discussion", "conclusion", "implication", "讨论", "结论", "启示", "展望", "建议", "结语"])
+            text_l2 = layer_texts["L2_Theory"] or fallback_text
+            text_l3 = layer_texts["L3_Logic"] or fallback_text
+            text_l4 = layer_texts["L4_Value"] or fallback_text
         
         # Execute 4 Layers
         l1_res = analyzer.analyze_l1_context(text_l1)
@@ -4,10 +4,14 @@ import argparse
 import json
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from deep_reading_steps.keyword_router import QUAL_LAYER_KEYWORDS, compile_router, keyword_matcher, route_sections
+from deep_reading_steps.md_sections import read_md_sections
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -244,6 +248,54 @@ IMPORTANT: 请严格按照上述"输出格式"部分的Markdown格式输出，
         # 调用 LLM
         return self._call_llm_markdown(system_prompt, user_prompt)
     
+    def analyze_layers(self, texts: dict, executor: ThreadPoolExecutor,
+                       speculative_genre: str = None, label: str = "") -> tuple:
+        """
+        并发执行 4 层分析
+        
+        只有 L3 依赖 L1 的体裁：L1、L2、L4 同时提交；L3 在 L1 返回、体裁确定后立即提交。
+        指定 speculative_genre 时 L3 与其他层同时按该体裁提交，若 L1 的实际体裁不同再重跑 L3。
+        
+        Args:
+            texts: 各层输入文本 {"L1_Context": text, ...}
+            executor: 执行 LLM 调用的线程池
+            speculative_genre: 推测体裁（None 表示等待 L1）
+            label: 日志前缀（论文名称）
+        
+        Returns:
+            (layer_outputs, genre)
+        """
+        logger.info(f"{label}Analyzing L1_Context, L2_Theory, L4_Value concurrently...")
+        futures = {
+            "L1_Context": executor.submit(self.analyze_l1_context, texts["L1_Context"]),
+            "L2_Theory": executor.submit(self.analyze_l2_theory, texts["L2_Theory"]),
+            "L4_Value": executor.submit(self.analyze_l4_value, texts["L4_Value"]),
+        }
+        l3_future = None
+        if speculative_genre:
+            logger.info(f"{label}Analyzing L3_Logic speculatively (Genre: {speculative_genre})...")
+            l3_future = executor.submit(self.analyze_l3_logic, texts["L3_Logic"], speculative_genre)
+        
+        # 从 L1 提取体裁
+        l1_markdown = futures["L1_Context"].result()
+        genre = self._extract_genre_from_l1_markdown(l1_markdown or "")
+        logger.info(f"{label}Detected genre: {genre}")
+        
+        if l3_future is not None and genre != speculative_genre:
+            logger.info(f"{label}Speculative genre {speculative_genre} != {genre}, re-running L3_Logic")
+            l3_future.cancel()
+            l3_future = None
+        if l3_future is None:
+            logger.info(f"{label}Analyzing L3_Logic (Genre: {genre})...")
+            l3_future = executor.submit(self.analyze_l3_logic, texts["L3_Logic"], genre)
+        futures["L3_Logic"] = l3_future
+        
+        layer_outputs = {
+            layer: futures[layer].result()
+            for layer in ["L1_Context", "L2_Theory", "L3_Logic", "L4_Value"]
+        }
+        return layer_outputs, genre
+    
     def save_layer_markdown(self, markdown_content: str, layer: str, 
                            basename: str, output_dir: str) -> str:
         """
@@ -318,45 +370,18 @@ def load_segmented_md(path: str) -> dict:
     Strips YAML frontmatter before parsing.
     Falls back to {"Full Text": content} if no sections found.
     """
-    sections = {}
-    current_section = None
-    buffer = []
-
-    with open(path, "r", encoding="utf-8") as f:
-        content = f.read()
-
-    # Strip YAML frontmatter
-    content = re.sub(r'^---\n.*?\n---\n', '', content, flags=re.DOTALL)
-
-    # Detect Smart Router QUAL format
-    is_smart_router_qual = "- Mode: qual" in content
-
-    for line in content.split('\n'):
-        if line.startswith("## "):
-            if current_section is not None and buffer:
-                sections[current_section] = "\n".join(buffer)
-            current_section = line.lstrip("# ").strip()
-            buffer = []
-        elif line.startswith("# ") and not line.startswith("## "):
-            if current_section is not None and buffer:
-                sections[current_section] = "\n".join(buffer)
-            current_section = line.lstrip("# ").strip()
-            buffer = []
-        else:
-            buffer.append(line)
-
-    if current_section is not None and buffer:
-        sections[current_section] = "\n".join(buffer)
+    # Same single-pass parser as the QUANT loader; bodies are kept verbatim
+    # and headings without any body line are skipped
+    parsed = read_md_sections(path, strip_text=False, keep_empty=False)
+    sections = parsed
 
     # If Smart Router QUAL format, extract L1-L4 content from code blocks
-    if is_smart_router_qual:
+    if parsed.body_contains("- Mode: qual"):
         sections = _extract_smart_router_qual_sections(sections)
 
     # Fallback: if no sections found, use full text
     if not sections:
-        stripped = content.strip()
-        if stripped:
-            sections["Full Text"] = stripped
+        sections = parsed.full_text_sections()
 
     return sections
 
@@ -399,20 +424,86 @@ def get_combined_text(sections: dict, keys: list) -> str:
     Returns:
         组合后的文本
     """
-    text = ""
-    for k, v in sections.items():
-        if k and v and any(key.lower() in k.lower() for key in keys):
-            text += v + "\n"
+    text = route_sections(sections, keyword_matcher(keys))["match"]
     
     # 如果没有匹配，返回前 30000 字符
     return text if text else "".join(sections.values())[:30000]
 
 
+GENRES = ["Theoretical", "Case Study", "QCA", "Quantitative", "Review"]
+
+
+def analyze_paper(analyzer: SocialScienceAnalyzerV2, file_path: str, basename: str, out_dir: str,
+                  executor: ThreadPoolExecutor, speculative_genre: str = None) -> dict:
+    """分析单篇论文（4 层并发）并保存各层结果与总报告。"""
+    label = f"[{basename}] "
+    logger.info(f"Processing {basename}...")
+    
+    sections = load_segmented_md(file_path)
+    
+    # 检查是否为 Smart Router QUAL 格式（已提取 L1-L4）
+    if "L1_Context" in sections:
+        logger.info(f"{label}Using Smart Router QUAL format - L1-L4 already extracted")
+        text_l1 = sections.get("L1_Context", "")
+        text_l2 = sections.get("L2_Theory", "")
+        text_l3 = sections.get("L3_Logic", "")
+        text_l4 = sections.get("L4_Value", "")
+    else:
+        # 传统格式：使用关键词匹配
+        layer_texts = route_sections(sections, compile_router(QUAL_LAYER_KEYWORDS))
+        fallback_text = "".join(sections.values())[:30000]
+        text_l1 = layer_texts["L1_Context"] or fallback_text
+        
+        # L1 空内容处理
+        if len(text_l1) < 200:
+            keys = list(sections.keys())
+            if keys:
+                text_l1 = sections[keys[0]]
+                if len(keys) > 1:
+                    text_l1 += "\n" + sections[keys[1]]
+        
+        text_l2 = layer_texts["L2_Theory"] or fallback_text
+        text_l3 = layer_texts["L3_Logic"] or fallback_text
+        text_l4 = layer_texts["L4_Value"] or fallback_text
+    
+    # 执行 4 层分析（L1/L2/L4 并发，L3 在体裁确定后启动）
+    texts = {
+        "L1_Context": text_l1,
+        "L2_Theory": text_l2,
+        "L3_Logic": text_l3,
+        "L4_Value": text_l4
+    }
+    layer_outputs, genre = analyzer.analyze_layers(texts, executor, speculative_genre, label=label)
+    
+    # 保存各层结果
+    paper_out_dir = os.path.join(out_dir, basename)
+    os.makedirs(paper_out_dir, exist_ok=True)
+    
+    for layer, markdown in layer_outputs.items():
+        analyzer.save_layer_markdown(markdown, layer, basename, paper_out_dir)
+    
+    # 生成总报告
+    analyzer.generate_full_report(layer_outputs, basename, paper_out_dir)
+    
+    logger.info(f"Completed analysis for {basename}\n")
+    return {
+        "basename": basename,
+        "genre": genre,
+        "layer_outputs": layer_outputs
+    }
+
+
 def main():
     parser = argparse.ArgumentParser(description="Social Science 4-Layer Analyzer v2 (Markdown Output)")
     parser.add_argument("segmented_dir", help="Directory containing Segmented MD files")
     parser.add_argument("--out_dir", default="social_science_results_v2", help="Output directory")
     parser.add_argument("--filter", nargs="+", help="Keywords to filter filenames")
+    parser.add_argument("--workers", type=int, default=6,
+                        help="Concurrent LLM layer calls across all papers (default: 6)")
+    parser.add_argument("--paper_workers", type=int, default=2,
+                        help="Papers analyzed in parallel (default: 2)")
+    parser.add_argument("--speculate_genre", choices=GENRES,
+                        help="Start L3_Logic with this genre alongside L1; re-run only if L1 detects another genre")
     args = parser.parse_args()
 
     analyzer = SocialScienceAnalyzerV2()
@@ -434,85 +525,34 @@ def main():
     logger.info(f"Found {len(target_files)} files to analyze.")
 
     all_results = []
-
-    for filename in target_files:
-        basename = os.path.splitext(filename)[0]
-        for suffix in ("_segmented", "_paddleocr", "_raw"):
-            if basename.endswith(suffix):
-                basename = basename[:-len(suffix)]
-                break
-        file_path = os.path.join(args.segmented_dir, filename)
-        logger.info(f"Processing {basename}...")
-        
-        sections = load_segmented_md(file_path)
-        
-        # 检查是否为 Smart Router QUAL 格式（已提取 L1-L4）
-        if "L1_Context" in sections:
-            logger.info("Using Smart Router QUAL format - L1-L4 already extracted")
-            text_l1 = sections.get("L1_Context", "")
-            text_l2 = sections.get("L2_Theory", "")
-            text_l3 = sections.get("L3_Logic", "")
-            text_l4 = sections.get("L4_Value", "")
-        else:
-            # 传统格式：使用关键词匹配
-            text_l1 = get_combined_text(sections, ["abstract", "introduction", "background", "摘要", "引言", "背景", "绪论", "问题提出"])
-            
-            # L1 空内容处理
-            if len(text_l1) < 200:
-                keys = list(sections.keys())
-                if keys:
-                    text_l1 = sections[keys[0]]
-                    if len(keys) > 1:
-                        text_l1 += "\n" + sections[keys[1]]
-            
-            text_l2 = get_combined_text(sections, ["literature", "theory", "theoretical", "文献", "综述", "理论", "基础", "研究现状"])
-            text_l3 = get_combined_text(sections, ["method", "result", "finding", "case", "analysis", "方法", "设计", "案例", "结果", "分析", "实证", "模型", "路径", "机制"])
-            text_l4 = get_combined_text(sections, ["discussion", "conclusion", "implication", "讨论", "结论", "启示", "展望", "建议", "结语"])
-        
-        # 执行 4 层分析
-        logger.info("Analyzing L1_Context...")
-        l1_markdown = analyzer.analyze_l1_context(text_l1)
-        
-        # 从 L1 提取体裁
-        genre = analyzer._extract_genre_from_l1_markdown(l1_markdown)
-        logger.info(f"Detected genre: {genre}")
-        
-        logger.info("Analyzing L2_Theory...")
-        l2_markdown = analyzer.analyze_l2_theory(text_l2)
-        
-        logger.info(f"Analyzing L3_Logic (Genre: {genre})...")
-        l3_markdown = analyzer.analyze_l3_logic(text_l3, genre=genre)
-        
-        logger.info("Analyzing L4_Value...")
-        l4_markdown = analyzer.analyze_l4_value(text_l4)
-        
-        # 保存各层结果
-        paper_out_dir = os.path.join(args.out_dir, basename)
-        os.makedirs(paper_out_dir, exist_ok=True)
-        
-        analyzer.save_layer_markdown(l1_markdown, "L1_Context", basename, paper_out_dir)
-        analyzer.save_layer_markdown(l2_markdown, "L2_Theory", basename, paper_out_dir)
-        analyzer.save_layer_markdown(l3_markdown, "L3_Logic", basename, paper_out_dir)
-        analyzer.save_layer_markdown(l4_markdown, "L4_Value", basename, paper_out_dir)
-        
-        # 生成总报告
-        layer_outputs = {
-            "L1_Context": l1_markdown,
-            "L2_Theory": l2_markdown,
-            "L3_Logic": l3_markdown,
-            "L4_Value": l4_markdown
-        }
-        analyzer.generate_full_report(layer_outputs, basename, paper_out_dir)
-        
-        all_results.append({
-            "basename": basename,
-            "genre": genre,
-            "layer_outputs": layer_outputs
-        })
+    failed = []
+
+    # 论文级线程池只负责调度，LLM 调用统一走层级线程池（两池分离，避免嵌套等待死锁）
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as layer_executor, \
+            ThreadPoolExecutor(max_workers=max(1, args.paper_workers)) as paper_executor:
+        futures = {}
+        for filename in target_files:
+            basename = os.path.splitext(filename)[0]
+            for suffix in ("_segmented", "_paddleocr", "_raw"):
+                if basename.endswith(suffix):
+                    basename = basename[:-len(suffix)]
+                    break
+            file_path = os.path.join(args.segmented_dir, filename)
+            futures[basename] = paper_executor.submit(
+                analyze_paper, analyzer, file_path, basename, args.out_dir,
+                layer_executor, args.speculate_genre
+            )
         
-        logger.info(f"Completed analysis for {basename}\n")
+        for basename, future in futures.items():
+            try:
+                all_results.append(future.result())
+            except Exception as e:
+                logger.error(f"Analysis failed for {basename}: {e}")
+                failed.append(basename)
 
     logger.info(f"Batch analysis complete. Processed {len(all_results)} papers.")
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
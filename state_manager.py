@@ -66,6 +66,7 @@ class StateManager:
         if not file_hash:
             return
         
+        previous = self.data.get(file_hash, {})
         self.data[file_hash] = {
             "status": "in_progress",
             "filename": os.path.basename(file_path),
@@ -73,6 +74,35 @@ class StateManager:
             "started_at": datetime.now().isoformat(),
             "output_dir": None
         }
+        # Keep the paper-type decision of an earlier (failed) run
+        if "classification" in previous:
+            self.data[file_hash]["classification"] = previous["classification"]
+        self._save_db()
+
+    def get_classification(self, file_path):
+        """Recorded classification dict for this file, or None (also for a failed-LLM fallback guess)."""
+        file_hash = self.calculate_hash(file_path)
+        if not file_hash:
+            return None
+        classification = self.data.get(file_hash, {}).get("classification")
+        if not classification or classification.get("method") == "llm_fallback":
+            return None
+        return classification
+
+    def record_classification(self, file_path, classification):
+        """
+        Record the paper-type decision (type, confidence, method, scores)
+        produced by SmartScholar.classify_paper_detailed.
+        """
+        file_hash = self.calculate_hash(file_path)
+        if not file_hash:
+            return
+
+        record = self.data.setdefault(file_hash, {
+            "filename": os.path.basename(file_path),
+            "filepath": file_path,
+        })
+        record["classification"] = dict(classification, classified_at=datetime.now().isoformat())
         self._save_db()
 
     def mark_completed(self, file_path, output_dir, paper_type="QUANT"):
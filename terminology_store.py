@@ -0,0 +1,325 @@
+"""
+语料级术语库（中文重述 Step 2 复用）
+
+generate_glossary() 为每篇论文从标题/摘要/引言重新生成 EN→ZH 术语表，但计量术语
+（DID、IV、RDD、FE、GMM……）在整个文献库中反复出现。本模块：
+
+- 从每篇论文生成的词典表格中累积术语行（translation_results/terminology.db）；
+- 同一译法出现在 ≥ min_papers 篇论文且无冲突译法时自动标记为 approved，
+  也可用命令行手动 approve / remove；
+- TermMatcher 将全部已批准术语编译为按词切分的多模式匹配器，一次扫描文本即可
+  找出其中出现的全部术语（含单复数变体），用于预填词典和按块筛选词典行。
+
+用法：
+    python terminology_store.py list [--all]
+    python terminology_store.py approve "difference-in-differences"
+    python terminology_store.py remove "treatment group"
+    python terminology_store.py import translation_results/xxx/xxx_glossary.md
+"""
+
+import argparse
+import logging
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.getcwd(), "translation_results", "terminology.db")
+DEFAULT_MIN_PAPERS = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS terms (
+    term_key   TEXT PRIMARY KEY,
+    en         TEXT NOT NULL,
+    zh         TEXT NOT NULL,
+    note       TEXT,
+    papers     INTEGER DEFAULT 0,
+    conflicts  INTEGER DEFAULT 0,
+    approved   INTEGER DEFAULT 0,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS term_sources (
+    term_key TEXT NOT NULL,
+    source   TEXT NOT NULL,
+    PRIMARY KEY (term_key, source)
+);
+"""
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9'’]*")
+_ACRONYM_RE = re.compile(r"^[A-Z0-9][A-Z0-9\-]{0,5}$")
+_TABLE_ROW_RE = re.compile(r"^\s*\|(.+)\|\s*$")
+_SEPARATOR_CELL_RE = re.compile(r"^:?-{2,}:?$")
+_HEADER_CELLS = {"英文原词", "英文", "english", "term", "英文术语"}
+# "Difference-in-Differences (DID)" → 同时收录全称与括号内缩写
+_PAREN_ALIAS_RE = re.compile(r"^(?P<main>.+?)\s*[（(](?P<alias>[^()（）]+)[)）]\s*$")
+
+
+def _tokens(text: str) -> List[str]:
+    return [t.lower() for t in _TOKEN_RE.findall(text.replace("-", " "))]
+
+
+def term_key(en: str) -> str:
+    """术语归一化键：小写、按词切分（连字符视为空格）。"""
+    return " ".join(_tokens(en))
+
+
+def _variants(tokens: Tuple[str, ...]) -> List[Tuple[str, ...]]:
+    """末词的单复数变体：effect ↔ effects，process ↔ processes。"""
+    if not tokens:
+        return []
+    head, last = tokens[:-1], tokens[-1]
+    forms = {last}
+    if len(last) > 3 and last.endswith("es"):
+        forms.add(last[:-2])
+    if len(last) > 2 and last.endswith("s") and not last.endswith("ss"):
+        forms.add(last[:-1])
+    if not last.endswith("s") and not last.isdigit():
+        forms.add(last + "s")
+        if last.endswith(("s", "x", "ch", "sh")):
+            forms.add(last + "es")
+    return [head + (f,) for f in forms]
+
+
+def parse_glossary_table(glossary_md: str) -> List[Tuple[str, str, str]]:
+    """
+    从 generate_glossary() 输出的 Markdown 表格中解析 (英文原词, 中文表达, 简要说明)。
+    跳过表头、分隔行与空行。
+    """
+    rows = []
+    for line in glossary_md.splitlines():
+        m = _TABLE_ROW_RE.match(line)
+        if not m:
+            continue
+        cells = [c.strip().strip("*").strip() for c in m.group(1).split("|")]
+        if len(cells) < 2 or not cells[0] or not cells[1]:
+            continue
+        if all(_SEPARATOR_CELL_RE.match(c) for c in cells if c):
+            continue
+        if cells[0].lower() in _HEADER_CELLS:
+            continue
+        if not _TOKEN_RE.search(cells[0]):
+            continue
+        rows.append((cells[0], cells[1], cells[2] if len(cells) > 2 else ""))
+    return rows
+
+
+def format_glossary_rows(rows: Iterable[Tuple[str, str, str]], with_notes: bool = True) -> str:
+    """将术语行渲染为 Markdown 表格。"""
+    rows = list(rows)
+    if not rows:
+        return ""
+    if with_notes:
+        lines = ["| 英文原词 | 中文表达 | 简要说明 |", "| --- | --- | --- |"]
+        lines += [f"| {en} | {zh} | {note or ''} |" for en, zh, note in rows]
+    else:
+        lines = ["| 英文原词 | 中文表达 |", "| --- | --- |"]
+        lines += [f"| {en} | {zh} |" for en, zh, _ in rows]
+    return "\n".join(lines)
+
+
+class TermMatcher:
+    """
+    按词切分的多模式术语匹配器。
+
+    构建时把每个术语（及其括号缩写、单复数变体）编入 {词元组: 术语下标} 字典；
+    match() 对文本只做一次分词扫描，在每个位置按最长术语长度向后查找，
+    整体为 O(文本词数 × 最长术语词数)，与术语数量无关。
+    全大写缩写（DID、IV、FE）要求大小写完全一致，避免误匹配普通单词。
+    """
+
+    def __init__(self, rows: List[Tuple[str, str, str]]):
+        self.rows = list(rows)
+        # 词元组 → [(术语下标, 需逐字一致的原始大小写词元组或 None)]
+        self._index: Dict[Tuple[str, ...], List[Tuple[int, Optional[Tuple[str, ...]]]]] = {}
+        self.max_len = 0
+        for i, (en, _, _) in enumerate(self.rows):
+            m = _PAREN_ALIAS_RE.match(en)
+            names = [m.group("main"), m.group("alias")] if m else [en]
+            for name in names:
+                name = name.strip()
+                toks = tuple(_tokens(name))
+                if not toks:
+                    continue
+                if _ACRONYM_RE.match(name):
+                    forms = [(toks, tuple(_TOKEN_RE.findall(name.replace("-", " "))))]
+                else:
+                    forms = [(form, None) for form in _variants(toks)]
+                for form, exact in forms:
+                    self._index.setdefault(form, []).append((i, exact))
+                    self.max_len = max(self.max_len, len(form))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def match_indices(self, text: str) -> List[int]:
+        """返回文本中出现的术语下标（按术语表顺序、去重）。"""
+        if not self._index or not text:
+            return []
+        raw = _TOKEN_RE.findall(text.replace("-", " "))
+        low = [t.lower() for t in raw]
+        found = set()
+        n = len(low)
+        for start in range(n):
+            for length in range(1, min(self.max_len, n - start) + 1):
+                hits = self._index.get(tuple(low[start:start + length]))
+                if not hits:
+                    continue
+                for idx, exact in hits:
+                    if exact is None or tuple(raw[start:start + length]) == exact:
+                        found.add(idx)
+        return sorted(found)
+
+    def match(self, text: str) -> List[Tuple[str, str, str]]:
+        return [self.rows[i] for i in self.match_indices(text)]
+
+
+class TerminologyStore:
+    """
+    SQLite 术语库。每次操作单独开连接，可在多线程（批量重述）与多进程间共享。
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, min_papers: int = DEFAULT_MIN_PAPERS):
+        self.db_path = os.path.abspath(db_path)
+        self.min_papers = min_papers
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        self._matcher: Optional[TermMatcher] = None
+        self._matcher_stamp = None
+
+    @contextmanager
+    def _connect(self):
+        """短连接：提交（或回滚）后关闭。"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add_glossary(self, glossary_md: str, source: str) -> int:
+        """
+        记录一篇论文生成的词典行。同一 source 重复导入不重复计数；
+        已有术语的中文译法不同则计为冲突，不覆盖。返回解析到的行数。
+        """
+        rows = parse_glossary_table(glossary_md)
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            for en, zh, note in rows:
+                key = term_key(en)
+                if not key:
+                    continue
+                existing = conn.execute("SELECT zh FROM terms WHERE term_key = ?", (key,)).fetchone()
+                new_source = conn.execute(
+                    "INSERT OR IGNORE INTO term_sources (term_key, source) VALUES (?, ?)", (key, source)
+                ).rowcount == 1
+                if existing is None:
+                    conn.execute(
+                        "INSERT INTO terms (term_key, en, zh, note, papers, updated_at) VALUES (?, ?, ?, ?, 1, ?)",
+                        (key, en, zh, note, now),
+                    )
+                elif not new_source:
+                    continue
+                elif existing["zh"] == zh:
+                    conn.execute(
+                        "UPDATE terms SET papers = papers + 1, updated_at = ? WHERE term_key = ?", (now, key)
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE terms SET conflicts = conflicts + 1, updated_at = ? WHERE term_key = ?", (now, key)
+                    )
+            conn.execute(
+                "UPDATE terms SET approved = 1 WHERE approved = 0 AND conflicts = 0 AND papers >= ?",
+                (self.min_papers,),
+            )
+        return len(rows)
+
+    def approve(self, en: str, zh: Optional[str] = None) -> bool:
+        with self._connect() as conn:
+            if zh:
+                cur = conn.execute(
+                    "UPDATE terms SET approved = 1, zh = ?, conflicts = 0, updated_at = ? WHERE term_key = ?",
+                    (zh, datetime.now().isoformat(), term_key(en)),
+                )
+                if cur.rowcount == 0:
+                    conn.execute(
+                        "INSERT INTO terms (term_key, en, zh, approved, updated_at) VALUES (?, ?, ?, 1, ?)",
+                        (term_key(en), en, zh, datetime.now().isoformat()),
+                    )
+                return True
+            cur = conn.execute("UPDATE terms SET approved = 1 WHERE term_key = ?", (term_key(en),))
+            return cur.rowcount > 0
+
+    def remove(self, en: str) -> bool:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM term_sources WHERE term_key = ?", (term_key(en),))
+            return conn.execute("DELETE FROM terms WHERE term_key = ?", (term_key(en),)).rowcount > 0
+
+    def terms(self, approved_only: bool = True) -> List[sqlite3.Row]:
+        sql = "SELECT * FROM terms"
+        if approved_only:
+            sql += " WHERE approved = 1"
+        with self._connect() as conn:
+            return conn.execute(sql + " ORDER BY papers DESC, en").fetchall()
+
+    def matcher(self) -> TermMatcher:
+        """已批准术语的匹配器；术语库有变动时才重建。"""
+        with self._connect() as conn:
+            stamp = tuple(conn.execute(
+                "SELECT COUNT(*), MAX(updated_at) FROM terms WHERE approved = 1"
+            ).fetchone())
+        if self._matcher is None or stamp != self._matcher_stamp:
+            rows = [(r["en"], r["zh"], r["note"] or "") for r in self.terms(approved_only=True)]
+            self._matcher = TermMatcher(rows)
+            self._matcher_stamp = stamp
+        return self._matcher
+
+    def seed_rows(self, text: str) -> List[Tuple[str, str, str]]:
+        """文本中出现的已批准术语行。"""
+        return self.matcher().match(text)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="语料级术语库")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="SQLite 数据库路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_list = sub.add_parser("list", help="列出术语")
+    p_list.add_argument("--all", action="store_true", help="包含未批准术语")
+
+    p_approve = sub.add_parser("approve", help="批准术语（可同时指定中文译法）")
+    p_approve.add_argument("en")
+    p_approve.add_argument("zh", nargs="?")
+
+    p_remove = sub.add_parser("remove", help="删除术语")
+    p_remove.add_argument("en")
+
+    p_import = sub.add_parser("import", help="导入 *_glossary.md")
+    p_import.add_argument("paths", nargs="+")
+
+    args = parser.parse_args()
+    store = TerminologyStore(args.db)
+
+    if args.command == "list":
+        for r in store.terms(approved_only=not args.all):
+            flag = "✓" if r["approved"] else " "
+            print(f"{flag} {r['en']} | {r['zh']} | papers={r['papers']} conflicts={r['conflicts']}")
+    elif args.command == "approve":
+        print("OK" if store.approve(args.en, args.zh) else f"未找到术语：{args.en}")
+    elif args.command == "remove":
+        print("OK" if store.remove(args.en) else f"未找到术语：{args.en}")
+    elif args.command == "import":
+        for path in args.paths:
+            with open(path, "r", encoding="utf-8") as f:
+                n = store.add_glossary(f.read(), source=os.path.abspath(path))
+            print(f"{path}: {n} 行")
+
+
+if __name__ == "__main__":
+    main()
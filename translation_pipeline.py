@@ -8,19 +8,33 @@ Flow:
     → [Step 2] generate_glossary()        # 第一套提示词 → 术语词典
     → [Step 3] chunk_md_by_headers()      # 按 ## 标题切块
     → [Step 4] restate_chunk() × N       # 第二套提示词 × 每块
-    → [Step 5] 合并 + 注入 YAML 字段 → 输出 _cn.md + _glossary.md
+    → [Step 5] 按原顺序流式写入 _cn.md.part（附 .idx 偏移索引）
+    → [Step 6] fix_untranslated_part_file() # 逐块补译残留英文 → 输出 _cn.md + _glossary.md
+
+Glossary, section level and restated chunks are cached per paper under
+<out_dir>/.cache/, so re-runs only pay for chunks whose inputs changed.
+
+translate_folder() runs the same stages for many files on one shared pool,
+interleaving chunks of different papers under a single concurrency budget.
 """
 
 import os
 import re
+import json
 import time
+import hashlib
 import logging
+import threading
 from pathlib import Path
 from typing import Callable, Dict, List, Optional, Tuple
 
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from terminology_store import (
+    TerminologyStore, TermMatcher, format_glossary_rows, parse_glossary_table,
+)
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -44,6 +58,23 @@ def _get_client() -> OpenAI:
     return OpenAI(api_key=DEEPSEEK_API_KEY, base_url=DEEPSEEK_BASE_URL)
 
 
+_term_store: Optional["TerminologyStore"] = None
+_term_store_lock = threading.Lock()
+
+
+def _get_term_store() -> Optional["TerminologyStore"]:
+    """Process-wide corpus terminology store (translation_results/terminology.db)."""
+    global _term_store
+    with _term_store_lock:
+        if _term_store is None:
+            try:
+                _term_store = TerminologyStore(os.path.join(TRANSLATION_OUT_DIR, "terminology.db"))
+            except Exception as e:
+                logger.warning(f"Terminology store unavailable: {e}")
+                return None
+        return _term_store
+
+
 # ---------------------------------------------------------------------------
 # Prompts
 # ---------------------------------------------------------------------------
@@ -76,6 +107,13 @@ GLOSSARY_USER_TMPL = """\
 {introduction}
 """
 
+GLOSSARY_KNOWN_TMPL = """
+
+【文献库已收录术语】
+以下术语已有统一译法，将直接并入本文词典，请**不要重复列出**，只为上文中未收录的术语构建表格：
+{known}
+"""
+
 RESTATE_SYSTEM = (
     "你是一位资深经济学文献专家，精通计量经济学、发展经济学及中英文经济学学术写作规范，"
     "熟悉《经济研究》《管理世界》等中文顶刊的表达惯例。"
@@ -101,6 +139,135 @@ RESTATE_USER_TMPL = """\
 {chunk}
 """
 
+# ---------------------------------------------------------------------------
+# Artifact cache
+# ---------------------------------------------------------------------------
+
+def _sha(*parts: str) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _prompt_version(*templates: str) -> str:
+    """Short hash of the prompt templates; editing a prompt invalidates its cache entries."""
+    return _sha(*templates)[:12]
+
+
+class TranslationCache:
+    """
+    File-per-entry cache for translation artifacts of one paper.
+
+    Layout: <cache_dir>/<kind>/<key>.txt, where kind is "glossary",
+    "section_level" or "chunk".  Writes go through a temp file + os.replace
+    so concurrent chunk workers never observe a half-written entry.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.cache_dir, kind, f"{key}.txt")
+
+    def get(self, kind: str, key: str) -> Optional[str]:
+        path = self._path(kind, key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, kind: str, key: str, value: str) -> None:
+        path = self._path(kind, key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(value)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Translation cache write failed ({kind}/{key[:12]}): {e}")
+
+
+# ---------------------------------------------------------------------------
+# Streaming output
+# ---------------------------------------------------------------------------
+
+_PART_SEP = b"\n\n"
+
+
+class OrderedPartWriter:
+    """
+    Order-preserving writer for restated chunks.
+
+    Chunks may finish in any order; each one is appended to <path> as soon as
+    every chunk before it has been written, so the part file always holds the
+    contiguous prefix of the paper.  A JSONL sidecar (<path>.idx) records
+    {"idx", "label", "offset", "length"} (byte offsets) for every written
+    chunk, letting later passes read chunks back one at a time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path + ".idx"
+        self._fh = open(path, "wb")
+        self._idx_fh = open(self.index_path, "w", encoding="utf-8")
+        self._pending: Dict[int, Tuple[str, str]] = {}
+        self._next = 0
+        self._offset = 0
+        self._lock = threading.Lock()
+        self.entries: List[Dict] = []
+
+    def submit(self, idx: int, label: str, text: str) -> int:
+        """Queue chunk idx; flush the contiguous prefix. Returns number of chunks on disk."""
+        with self._lock:
+            self._pending[idx] = (label, text)
+            while self._next in self._pending:
+                label_n, text_n = self._pending.pop(self._next)
+                if self._next > 0:
+                    self._fh.write(_PART_SEP)
+                    self._offset += len(_PART_SEP)
+                data = text_n.encode("utf-8")
+                self._fh.write(data)
+                entry = {"idx": self._next, "label": label_n, "offset": self._offset, "length": len(data)}
+                self._offset += len(data)
+                self._idx_fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self.entries.append(entry)
+                self._next += 1
+            self._fh.flush()
+            self._idx_fh.flush()
+            return self._next
+
+    def close(self) -> None:
+        self._fh.close()
+        self._idx_fh.close()
+
+
+def read_part_index(index_path: str) -> List[Dict]:
+    """Load the JSONL sidecar written by OrderedPartWriter."""
+    entries = []
+    with open(index_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entries.append(json.loads(line))
+    return entries
+
+
+def iter_part_chunks(part_path: str, entries: List[Dict]):
+    """Yield (entry, text) for each indexed chunk, reading one chunk at a time."""
+    with open(part_path, "rb") as f:
+        for entry in entries:
+            f.seek(entry["offset"])
+            yield entry, f.read(entry["length"]).decode("utf-8")
+
+
 # ---------------------------------------------------------------------------
 # Step 1: Extract front sections (title / abstract / introduction)
 # ---------------------------------------------------------------------------
@@ -183,21 +350,55 @@ def generate_glossary(
     client: OpenAI,
     model: str = "deepseek-chat",
     log_cb: Optional[Callable[[str], None]] = None,
+    cache: Optional[TranslationCache] = None,
+    term_store: Optional[TerminologyStore] = None,
+    source: str = "",
 ) -> str:
     """
     Call DeepSeek with the first prompt set.
     Returns the glossary as a Markdown table string.
+
+    cache: when given, the glossary is keyed by the front-section text,
+      model, prompt version and the pre-seeded term rows; failed generations
+      are never cached.
+    term_store: corpus terminology store.  Approved terms found in the front
+      sections are pre-seeded into the glossary and listed in the prompt so
+      the LLM only adds unknown terms; the new rows are recorded under source.
     """
     title = sections.get("title") or "(unknown)"
     abstract = sections.get("abstract") or "(摘要未找到)"
     intro = sections.get("introduction") or "(引言未找到)"
 
+    seeds = []
+    if term_store is not None:
+        try:
+            seeds = term_store.seed_rows("\n".join((title, abstract, intro)))
+        except Exception as e:
+            _log(log_cb, f"  [词典] 术语库读取失败：{e}")
+
+    # The seed rows are part of both the prompt and the returned glossary, so
+    # approving or editing a term in the store must miss the cache
+    cache_key = _sha(
+        title, abstract, intro, model,
+        _prompt_version(GLOSSARY_SYSTEM, GLOSSARY_USER_TMPL, GLOSSARY_KNOWN_TMPL),
+        "store" if term_store is not None else "",
+        *(f"{en}\t{zh}" for en, zh, _ in seeds),
+    )
+    if cache is not None:
+        cached = cache.get("glossary", cache_key)
+        if cached is not None:
+            _log(log_cb, f"  [词典] 命中缓存，共 {len(cached)} 字符")
+            return cached
+
     if not sections.get("abstract") and not sections.get("introduction"):
         _log(log_cb, "⚠ 未找到摘要和引言，词典生成可能不完整")
 
     user_msg = GLOSSARY_USER_TMPL.format(
         title=title, abstract=abstract, introduction=intro
     )
+    if seeds:
+        _log(log_cb, f"  [词典] 术语库预填 {len(seeds)} 条术语")
+        user_msg += GLOSSARY_KNOWN_TMPL.format(known="、".join(en for en, _, _ in seeds))
 
     for attempt in range(MAX_RETRIES + 1):
         try:
@@ -212,6 +413,18 @@ def generate_glossary(
             )
             glossary = resp.choices[0].message.content.strip()
             _log(log_cb, f"  [词典] 生成完成，共 {len(glossary)} 字符")
+            if term_store is not None and glossary:
+                try:
+                    term_store.add_glossary(glossary, source=source or title)
+                except Exception as e:
+                    _log(log_cb, f"  [词典] 写入术语库失败：{e}")
+            if seeds:
+                glossary = (
+                    "**文献库术语**\n\n" + format_glossary_rows(seeds, with_notes=False)
+                    + "\n\n**本文新增术语**\n\n" + glossary
+                )
+            if cache is not None and glossary:
+                cache.put("glossary", cache_key, glossary)
             return glossary
         except Exception as e:
             if attempt < MAX_RETRIES:
@@ -244,24 +457,40 @@ Literature Review、Data、Methodology、Results、Conclusion 等）所使用的
 """
 
 
+_HEADING_LINE_RE = re.compile(r'^#{1,6}\s+.*$', re.MULTILINE)
+
+
 def detect_section_level(
     md_text: str,
     client: OpenAI,
     model: str = "deepseek-chat",
     preview_chars: int = 4000,
     log_cb: Optional[Callable[[str], None]] = None,
+    cache: Optional[TranslationCache] = None,
 ) -> str:
     """
     Ask DeepSeek to identify which Markdown header level is used for main sections.
     Uses only the first ~3 pages (preview_chars) of the document.
     Returns one of: "#", "##", "###".
     Falls back to "##" on any error.
+
+    cache: when given, the answer is keyed by the document's heading lines;
+      the error fallback is never cached.
     """
     # Strip YAML frontmatter from preview so it doesn't confuse the model
     yaml_m = _YAML_RE.match(md_text)
     body = md_text[yaml_m.end():] if yaml_m else md_text
     preview = body[:preview_chars]
 
+    cache_key = _sha(
+        "\n".join(_HEADING_LINE_RE.findall(body)), model, _prompt_version(_DETECT_PROMPT)
+    )
+    if cache is not None:
+        cached = cache.get("section_level", cache_key)
+        if cached in ("#", "##", "###"):
+            _log(log_cb, f"  [分块] 命中缓存：章节标题层级 = {cached}")
+            return cached
+
     prompt = _DETECT_PROMPT.format(preview=preview)
 
     try:
@@ -277,6 +506,8 @@ def detect_section_level(
         for level in ("###", "##", "#"):
             if level in answer:
                 _log(log_cb, f"  [分块] 检测结果：章节标题层级 = {level}")
+                if cache is not None:
+                    cache.put("section_level", cache_key, level)
                 return level
         _log(log_cb, f"  [分块] 无法解析回答「{answer}」，使用默认 ##")
         return "##"
@@ -414,11 +645,24 @@ def restate_chunk(
     client: OpenAI,
     model: str = "deepseek-chat",
     log_cb: Optional[Callable[[str], None]] = None,
+    cache: Optional[TranslationCache] = None,
 ) -> str:
     """
     Call DeepSeek with the second prompt set.
     Returns the Chinese restatement of chunk_text.
+
+    cache: when given, results are keyed by (chunk text, glossary, model,
+      prompt version); failed restatements are never cached.
     """
+    cache_key = _sha(
+        chunk_text, _sha(glossary), model,
+        _prompt_version(RESTATE_SYSTEM, RESTATE_USER_TMPL),
+    )
+    if cache is not None:
+        cached = cache.get("chunk", cache_key)
+        if cached is not None:
+            return cached
+
     user_msg = RESTATE_USER_TMPL.format(glossary=glossary, chunk=chunk_text)
 
     for attempt in range(MAX_RETRIES + 1):
@@ -431,7 +675,10 @@ def restate_chunk(
                 ],
                 timeout=TIMEOUT,
             )
-            return _strip_preamble(resp.choices[0].message.content.strip())
+            result = _strip_preamble(resp.choices[0].message.content.strip())
+            if cache is not None and result:
+                cache.put("chunk", cache_key, result)
+            return result
         except Exception as e:
             if attempt < MAX_RETRIES:
                 _log(log_cb, f"    重试 {attempt + 1}：{e}")
@@ -442,56 +689,120 @@ def restate_chunk(
 
 
 # ---------------------------------------------------------------------------
-# Step 5: Full pipeline — one MD file
+# Step 4b: Compact glossary — only the rows a chunk actually uses
 # ---------------------------------------------------------------------------
 
-def translate_md_file(
-    md_path: str,
-    out_dir: Optional[str] = None,
-    log_cb: Optional[Callable[[str], None]] = None,
-    cancel_check: Optional[Callable[[], bool]] = None,
-    model: str = "deepseek-chat",
-    max_chars: int = 5000,
-    max_workers: int = 5,
-) -> Tuple[str, str]:
+_COMPACT_EMPTY = "（本块未涉及词典术语）"
+_SUMMARY_MAX_CHARS = 300
+
+
+def _glossary_summary(glossary: str) -> str:
+    """The research-question sentence(s) the glossary prompt asks for after the table."""
+    paras = [p.strip() for p in re.split(r"\n\s*\n", glossary) if p.strip()]
+    for para in reversed(paras):
+        if "|" in para or para.startswith("**") or para.startswith("#"):
+            continue
+        return para[:_SUMMARY_MAX_CHARS]
+    return ""
+
+
+def compact_glossary(chunk_text: str, matcher: TermMatcher, summary: str = "") -> str:
     """
-    Full restatement pipeline for one MD file.
+    Glossary table restricted to the terms whose English form (or its
+    abbreviation / plural variant) occurs in chunk_text, followed by the
+    paper's research-question summary.
+    """
+    rows = matcher.match(chunk_text)
+    table = format_glossary_rows(rows) if rows else _COMPACT_EMPTY
+    return f"{table}\n\n{summary}" if summary else table
 
-    max_workers: number of parallel DeepSeek calls for chunk restatement (Step 5).
-      1 = sequential; 5 = recommended default; 10 = max reasonable.
 
-    Returns:
-        (cn_md_path, glossary_path)
+
+class PaperJob:
+    """
+    State of one paper between the pipeline stages: prepare_paper() (Steps 1–4),
+    restate_job_chunk() × N (Step 5) and finalize_paper() (Step 6 + save).
+    Splitting the stages lets translate_folder() interleave chunks of several
+    papers on one shared thread pool.
     """
+
+    def __init__(self, md_path: str, stem: str, out_dir: str):
+        self.md_path = md_path
+        self.stem = stem
+        self.out_dir = out_dir
+        self.cn_path = os.path.join(out_dir, f"{stem}_cn.md")
+        self.glossary_path = os.path.join(out_dir, f"{stem}_glossary.md")
+        self.glossary = ""
+        self.term_matcher: Optional[TermMatcher] = None
+        self.glossary_summary = ""
+        self.chunks: List[Tuple[str, str]] = []
+        self.cache: Optional[TranslationCache] = None
+        self.writer: Optional[OrderedPartWriter] = None
+        self.completed = 0
+        self.error = ""
+        self.lock = threading.Lock()
+
+
+def _paper_stem(md_path: str) -> str:
+    stem = Path(md_path).stem
+    for suf in _EXTRACTION_SUFFIXES:
+        if stem.endswith(suf):
+            stem = stem[: -len(suf)]
+            break
+    return stem
+
+
+def _make_log(log_cb: Optional[Callable[[str], None]]) -> Callable[[str], None]:
     def log(msg: str):
         logger.info(msg)
         if log_cb:
             log_cb(msg)
+    return log
 
+
+def _make_check(cancel_check: Optional[Callable[[], bool]]) -> Callable[[], None]:
     def check():
         if cancel_check and cancel_check():
             raise InterruptedError("用户取消")
+    return check
 
-    # Derive clean stem
-    stem = Path(md_path).stem
-    for suf in _EXTRACTION_SUFFIXES:
-        if stem.endswith(suf):
-            stem = stem[: -len(suf)]
-            break
 
+def prepare_paper(
+    md_path: str,
+    client: OpenAI,
+    out_dir: Optional[str] = None,
+    log_cb: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    model: str = "deepseek-chat",
+    max_chars: int = 5000,
+    use_cache: bool = True,
+    use_term_store: bool = True,
+    glossary_mode: str = "full",
+) -> PaperJob:
+    """
+    Steps 1–4 for one MD file: front sections, glossary, section level, chunks.
+    Opens the part file writer so chunks can be submitted in any order.
+
+    use_term_store: pre-seed the glossary from the corpus terminology store
+      and record the newly generated rows in it.
+    glossary_mode: "full" sends the whole glossary with every chunk; "compact"
+      sends only the rows whose terms occur in that chunk (plus the summary).
+    """
+    log = _make_log(log_cb)
+    check = _make_check(cancel_check)
+
+    stem = _paper_stem(md_path)
     if out_dir is None:
         out_dir = os.path.join(TRANSLATION_OUT_DIR, stem)
     os.makedirs(out_dir, exist_ok=True)
-
-    cn_path = os.path.join(out_dir, f"{stem}_cn.md")
-    glossary_path = os.path.join(out_dir, f"{stem}_glossary.md")
+    job = PaperJob(md_path, stem, out_dir)
 
     log(f"[重述] 读取：{md_path}")
     with open(md_path, "r", encoding="utf-8") as f:
         md_text = f.read()
     log(f"[重述] 文本长度：{len(md_text):,} 字符")
 
-    client = _get_client()
+    job.cache = TranslationCache(os.path.join(out_dir, ".cache")) if use_cache else None
 
     # --- Step 1: Extract front sections ---
     log("[重述] Step 1/6  提取标题、摘要、引言...")
@@ -503,76 +814,122 @@ def translate_md_file(
 
     # --- Step 2: Generate glossary ---
     log("[重述] Step 2/6  生成术语词典...")
-    glossary = generate_glossary(sections, client, model=model, log_cb=log)
-    with open(glossary_path, "w", encoding="utf-8") as f:
-        f.write(f"# 术语词典：{sections['title']}\n\n{glossary}\n")
-    log(f"  词典已保存：{glossary_path}")
+    job.glossary = generate_glossary(
+        sections, client, model=model, log_cb=log, cache=job.cache,
+        term_store=_get_term_store() if use_term_store else None, source=stem,
+    )
+    with open(job.glossary_path, "w", encoding="utf-8") as f:
+        f.write(f"# 术语词典：{sections['title']}\n\n{job.glossary}\n")
+    log(f"  词典已保存：{job.glossary_path}")
+    if glossary_mode == "compact":
+        rows = parse_glossary_table(job.glossary)
+        if rows:
+            job.term_matcher = TermMatcher(rows)
+            job.glossary_summary = _glossary_summary(job.glossary)
+            log(f"  精简词典模式：共 {len(rows)} 条术语，逐块按需注入")
+        else:
+            log("  词典无法解析为表格，回退为完整注入")
     check()
 
     # --- Step 3: Detect section header level ---
     log("[重述] Step 3/6  检测章节标题层级...")
-    split_level = detect_section_level(md_text, client, model=model, log_cb=log)
+    split_level = detect_section_level(md_text, client, model=model, log_cb=log, cache=job.cache)
     check()
 
     # --- Step 4: Chunk ---
     log(f"[重述] Step 4/6  按 {split_level} 标题切块（每块 ≤ {max_chars:,} 字符）...")
-    chunks = chunk_md_by_headers(md_text, max_chars=max_chars, split_level=split_level)
-    log(f"  共 {len(chunks)} 块")
+    job.chunks = chunk_md_by_headers(md_text, max_chars=max_chars, split_level=split_level)
+    log(f"  共 {len(job.chunks)} 块")
     check()
 
-    # --- Step 5: Restate each chunk (parallel) ---
-    workers = max(1, min(int(max_workers), len(chunks)))
-    log(f"[重述] Step 5/6  逐块重述（共 {len(chunks)} 块，并发 {workers}）...")
-
-    # Pre-allocate result slots to preserve order
-    restated_parts: List[str] = [""] * len(chunks)
-    completed = [0]  # mutable counter for thread-safe progress logging
+    # Finished chunks are streamed to the part file in document order, so a
+    # crash or cancel still leaves the contiguous prefix on disk.
+    job.writer = OrderedPartWriter(job.cn_path + ".part")
+    return job
 
-    def _restate_one(idx: int, label: str, chunk_text: str) -> None:
-        if cancel_check and cancel_check():
-            restated_parts[idx] = f"<!-- 已取消 -->\n\n{chunk_text}"
-            return
-        short_label = label[:60] if label.startswith("#") else f"[{label[:50]}]"
-        log(f"  开始 [{idx + 1}/{len(chunks)}] {short_label}  ({len(chunk_text):,} 字符)")
-        if label == "__yaml__":
-            # Don't send YAML frontmatter through the restate LLM:
-            # all YAML fields are technical metadata (filenames, dates, extractor)
-            # and don't need Chinese translation.  Sending them to the LLM causes
-            # it to hallucinate full Chinese academic text from the metadata, and
-            # _inject_cn_fields() then fails to find the closing --- at the end.
-            result = _inject_cn_fields(chunk_text, stem)
-        else:
-            result = restate_chunk(chunk_text, glossary, client, model=model)
-            # The LLM sometimes wraps its output in a ---...--- YAML block because
-            # the prompt mentions "YAML frontmatter".  Strip it to avoid spurious
-            # YAML separators scattered throughout the document.
-            result = _strip_leading_yaml(result)
-        restated_parts[idx] = result
-        completed[0] += 1
-        log(f"  完成 [{completed[0]}/{len(chunks)}] {short_label}  → {len(result):,} 字符")
 
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        futures = {
-            executor.submit(_restate_one, i, label, chunk_text): i
-            for i, (label, chunk_text) in enumerate(chunks)
-        }
-        for future in as_completed(futures):
-            future.result()  # re-raise any exception from the thread
+def restate_job_chunk(
+    job: PaperJob,
+    idx: int,
+    client: OpenAI,
+    model: str = "deepseek-chat",
+    log_cb: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None,
+) -> int:
+    """Step 5 for chunk idx of job. Returns the number of chunks finished so far."""
+    log = _make_log(log_cb)
+    label, chunk_text = job.chunks[idx]
+    total = len(job.chunks)
+
+    if cancel_check and cancel_check():
+        job.writer.submit(idx, label, f"<!-- 已取消 -->\n\n{chunk_text}")
+        with job.lock:
+            job.completed += 1
+            return job.completed
+
+    short_label = label[:60] if label.startswith("#") else f"[{label[:50]}]"
+    log(f"  开始 [{idx + 1}/{total}] {short_label}  ({len(chunk_text):,} 字符)")
+    if label == "__yaml__":
+        # Don't send YAML frontmatter through the restate LLM:
+        # all YAML fields are technical metadata (filenames, dates, extractor)
+        # and don't need Chinese translation.  Sending them to the LLM causes
+        # it to hallucinate full Chinese academic text from the metadata, and
+        # _inject_cn_fields() then fails to find the closing --- at the end.
+        result = _inject_cn_fields(chunk_text, job.stem)
+    else:
+        glossary = job.glossary
+        if job.term_matcher is not None:
+            glossary = compact_glossary(chunk_text, job.term_matcher, job.glossary_summary)
+        result = restate_chunk(chunk_text, glossary, client, model=model, cache=job.cache)
+        # The LLM sometimes wraps its output in a ---...--- YAML block because
+        # the prompt mentions "YAML frontmatter".  Strip it to avoid spurious
+        # YAML separators scattered throughout the document.
+        result = _strip_leading_yaml(result)
+    on_disk = job.writer.submit(idx, label, result)
+    with job.lock:
+        job.completed += 1
+        completed = job.completed
+    log(f"  完成 [{completed}/{total}] {short_label}  → {len(result):,} 字符"
+        f"（已落盘 {on_disk}/{total}）")
+    return completed
+
+
+def finalize_paper(
+    job: PaperJob,
+    client: OpenAI,
+    model: str = "deepseek-chat",
+    log_cb: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    max_workers: int = 5,
+    executor=None,
+) -> Tuple[str, str]:
+    """
+    Step 6 + save for a job whose chunks have all been submitted.
+    Patch restatements run on executor, or on a pool of max_workers.
+    """
+    log = _make_log(log_cb)
+    check = _make_check(cancel_check)
 
-    # --- Assemble ---
-    final_text = "\n\n".join(restated_parts)
+    job.writer.close()
+    part_path = job.writer.path
+    log(f"  分块结果已写入：{part_path}")
 
     # --- Step 6: Supplementary restatement — fix missed English blocks ---
     log(f"[重述] Step 6/6  检查并补译残留英文块...")
     check()
-    final_text, n_fixed = fix_untranslated_blocks(
-        final_text,
-        glossary,
+    tmp_path = job.cn_path + ".tmp"
+    n_fixed = fix_untranslated_part_file(
+        part_path,
+        job.writer.entries,
+        tmp_path,
+        job.glossary,
         client,
         model=model,
         log_cb=log,
         cancel_check=cancel_check,
+        cache=job.cache,
+        max_workers=max_workers,
+        executor=executor,
     )
     if n_fixed:
         log(f"  补译完成，共修复 {n_fixed} 个英文块")
@@ -580,11 +937,79 @@ def translate_md_file(
         log("  未发现需补译的英文块")
 
     # --- Save ---
-    with open(cn_path, "w", encoding="utf-8") as f:
-        f.write(final_text)
+    os.replace(tmp_path, job.cn_path)
+    for leftover in (part_path, job.writer.index_path):
+        try:
+            os.remove(leftover)
+        except OSError:
+            pass
+
+    cache = job.cache
+    if cache is not None and cache.hits:
+        log(f"  缓存命中 {cache.hits} 项，新调用 {cache.misses} 项")
+    log(f"[重述] 完成！中文版：{job.cn_path}")
+    return job.cn_path, job.glossary_path
 
-    log(f"[重述] 完成！中文版：{cn_path}")
-    return cn_path, glossary_path
+
+def translate_md_file(
+    md_path: str,
+    out_dir: Optional[str] = None,
+    log_cb: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    model: str = "deepseek-chat",
+    max_chars: int = 5000,
+    max_workers: int = 5,
+    use_cache: bool = True,
+    use_term_store: bool = True,
+    glossary_mode: str = "full",
+) -> Tuple[str, str]:
+    """
+    Full restatement pipeline for one MD file.
+
+    max_workers: number of parallel DeepSeek calls for chunk restatement (Step 5).
+      1 = sequential; 5 = recommended default; 10 = max reasonable.
+    use_cache: reuse glossary / section level / chunk results cached under
+      <out_dir>/.cache/ by earlier runs (after a crash, a prompt tweak, or a
+      max_workers change only the changed chunks are re-sent).
+    use_term_store: pre-seed the glossary from the corpus terminology store.
+    glossary_mode: "full" or "compact" (per-chunk glossary rows, see prepare_paper).
+
+    Returns:
+        (cn_md_path, glossary_path)
+    """
+    log = _make_log(log_cb)
+    client = _get_client()
+
+    job = prepare_paper(
+        md_path, client, out_dir=out_dir, log_cb=log_cb, cancel_check=cancel_check,
+        model=model, max_chars=max_chars, use_cache=use_cache,
+        use_term_store=use_term_store, glossary_mode=glossary_mode,
+    )
+
+    # --- Step 5: Restate each chunk (parallel) ---
+    workers = max(1, min(int(max_workers), len(job.chunks)))
+    log(f"[重述] Step 5/6  逐块重述（共 {len(job.chunks)} 块，并发 {workers}）...")
+
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    restate_job_chunk, job, i, client,
+                    model=model, log_cb=log_cb, cancel_check=cancel_check,
+                )
+                for i in range(len(job.chunks))
+            ]
+            for future in as_completed(futures):
+                future.result()  # re-raise any exception from the thread
+    except BaseException:
+        job.writer.close()
+        raise
+
+    return finalize_paper(
+        job, client, model=model, log_cb=log_cb, cancel_check=cancel_check,
+        max_workers=int(max_workers),
+    )
 
 
 _PREAMBLE_RE = re.compile(
@@ -619,12 +1044,37 @@ def _strip_leading_yaml(text: str) -> str:
 # Step 6: Supplementary restatement — fix missed English blocks
 # ---------------------------------------------------------------------------
 
+# One scan over the whole body: paragraph separators, ASCII letter runs and
+# non-ASCII word runs (CJK etc.).  Digits, punctuation and spaces are skipped.
+# The last group also catches numeric symbols such as ², Ⅱ and ½, which are
+# not letters for str.isalpha(); _segment_en_ratios filters them out.
+_LANG_SCAN_RE = re.compile(r"(\n\n+)|([A-Za-z]+)|([^\W\d_A-Za-z]+)")
+
+
 def _en_ratio(text: str) -> float:
     """Fraction of alphabetic characters that are ASCII (i.e. English letters)."""
-    alpha = [c for c in text if c.isalpha()]
-    if not alpha:
-        return 0.0
-    return sum(1 for c in alpha if c.isascii()) / len(alpha)
+    return _segment_en_ratios(text)[0]
+
+
+def _segment_en_ratios(body: str) -> List[float]:
+    """
+    English-letter ratio of every content segment of re.split(r"(\n\n+)", body),
+    computed in a single counted scan instead of one character list per paragraph.
+    Letters are exactly the str.isalpha() characters, as in the per-paragraph check.
+    """
+    ratios: List[float] = []
+    ascii_n = other_n = 0
+    for m in _LANG_SCAN_RE.finditer(body):
+        if m.group(1):
+            ratios.append(ascii_n / (ascii_n + other_n) if ascii_n + other_n else 0.0)
+            ascii_n = other_n = 0
+        elif m.group(2):
+            ascii_n += m.end() - m.start()
+        else:
+            run = m.group(3)
+            other_n += len(run) if run.isalpha() else sum(1 for c in run if c.isalpha())
+    ratios.append(ascii_n / (ascii_n + other_n) if ascii_n + other_n else 0.0)
+    return ratios
 
 
 def _is_structural_para(para: str) -> bool:
@@ -641,56 +1091,33 @@ def _is_structural_para(para: str) -> bool:
     return False
 
 
-def fix_untranslated_blocks(
-    text: str,
-    glossary: str,
-    client: OpenAI,
-    model: str = "deepseek-chat",
+def _find_english_patches(
+    body: str,
     en_threshold: float = 0.65,
     min_chars: int = 100,
-    max_patch_chars: int = 4000,
-    log_cb: Optional[Callable[[str], None]] = None,
-    cancel_check: Optional[Callable[[], bool]] = None,
-) -> Tuple[str, int]:
+) -> Tuple[List[str], List[Tuple[int, int]]]:
     """
-    Scan assembled Chinese text for large English passages that were missed
-    during initial restatement, re-restate them via DeepSeek, and stitch back.
-
-    Text after the references/bibliography section header is left untouched.
-    Returns (fixed_text, number_of_patches_fixed).
+    Split body into alternating [content, separator, ...] segments and return
+    (segs, patches), where each patch is a (start_seg_idx, end_seg_idx) run of
+    English content segments bridged by their intervening separators.
     """
-    def log(msg: str):
-        logger.info(msg)
-        if log_cb:
-            log_cb(msg)
-
-    # Determine where to stop (references section)
-    ref_m = _REFERENCES_HEADER_RE.search(text)
-    cut_at = ref_m.start() if ref_m else len(text)
-    body, tail = text[:cut_at], text[cut_at:]
-
-    # Split body into alternating [content, separator, content, ...] segments.
     # Even indices = content, odd indices = "\n\n..." separators.
     segs = re.split(r"(\n\n+)", body)
+    ratios = _segment_en_ratios(body)
 
     # Classify each content segment: True = needs restatement
-    def _needs_restate(seg: str) -> bool:
-        return (
-            not _is_structural_para(seg)
-            and _en_ratio(seg) >= en_threshold
-            and len(seg.strip()) >= min_chars
-        )
-
     flags: List[Optional[bool]] = []
     for idx, seg in enumerate(segs):
         if idx % 2 == 1:        # separator
             flags.append(None)
         else:
-            flags.append(_needs_restate(seg))
+            flags.append(
+                ratios[idx // 2] >= en_threshold
+                and len(seg.strip()) >= min_chars
+                and not _is_structural_para(seg)
+            )
 
-    # Find contiguous English "patches": runs of en=True content segments
-    # bridged by their intervening separators.
-    patches: List[Tuple[int, int]] = []  # (start_seg_idx, end_seg_idx)
+    patches: List[Tuple[int, int]] = []
     i = 0
     while i < len(segs):
         if i % 2 == 0 and flags[i]:
@@ -702,39 +1129,209 @@ def fix_untranslated_blocks(
             i = j + 2
         else:
             i += 1
+    return segs, patches
 
-    if not patches:
-        log("[补译] 未发现大段英文块，无需补译")
-        return text, 0
-
-    log(f"[补译] 发现 {len(patches)} 个英文块，逐一补译...")
-    segs_out = list(segs)
 
-    for pi, (start_i, end_i) in enumerate(patches):
+def _submit_patches(
+    segs: List[str],
+    patches: List[Tuple[int, int]],
+    executor,
+    glossary: str,
+    client: OpenAI,
+    model: str,
+    max_patch_chars: int,
+    log_cb: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    cache: Optional[TranslationCache] = None,
+) -> List[Tuple[int, int, list]]:
+    """
+    Submit every patch — split into sub-chunks at paragraph boundaries — to
+    executor.  Returns [(start_i, end_i, [future, ...]), ...] in patch order;
+    a future yields None if the user cancelled before it ran.
+    """
+    def _restate_sub(sub: str) -> Optional[str]:
         if cancel_check and cancel_check():
-            log("[补译] 用户取消")
-            break
+            return None
+        r = restate_chunk(sub, glossary, client, model=model, log_cb=log_cb, cache=cache)
+        return _strip_leading_yaml(r)
 
+    submitted = []
+    for start_i, end_i in patches:
         raw = "".join(segs[start_i: end_i + 1])
-        log(f"[补译] 块 {pi + 1}/{len(patches)}  {len(raw):,} 字符")
-
         # Split oversized blocks at paragraph boundaries before sending
         sub_raws = [t for _, t in _split_by_paragraphs("", raw, max_patch_chars)]
-        restated_subs: List[str] = []
-        for sr in sub_raws:
-            r = restate_chunk(sr, glossary, client, model=model, log_cb=log_cb)
-            r = _strip_leading_yaml(r)
-            restated_subs.append(r)
+        submitted.append((start_i, end_i, [executor.submit(_restate_sub, sr) for sr in sub_raws]))
+    return submitted
+
 
+def _stitch_patches(
+    segs: List[str],
+    submitted: List[Tuple[int, int, list]],
+    log: Callable[[str], None],
+    label: str = "",
+) -> Tuple[List[str], int]:
+    """Wait for submitted patches in order and stitch them back. Returns (segs_out, n_done)."""
+    segs_out = list(segs)
+    n_done = 0
+    for pi, (start_i, end_i, futures) in enumerate(submitted):
+        restated_subs = [f.result() for f in futures]
+        if any(r is None for r in restated_subs):
+            log(f"[补译] {label}块 {pi + 1} 已取消，保留原文")
+            continue
         segs_out[start_i] = "\n\n".join(restated_subs)
         for k in range(start_i + 1, end_i + 1):
             segs_out[k] = ""
+        n_done += 1
+        log(f"[补译] {label}块 {pi + 1}/{len(submitted)} 完成  → {len(segs_out[start_i]):,} 字符")
+    return segs_out, n_done
+
+
+def fix_untranslated_blocks(
+    text: str,
+    glossary: str,
+    client: OpenAI,
+    model: str = "deepseek-chat",
+    en_threshold: float = 0.65,
+    min_chars: int = 100,
+    max_patch_chars: int = 4000,
+    log_cb: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    cache: Optional[TranslationCache] = None,
+    max_workers: int = 5,
+    executor=None,
+) -> Tuple[str, int]:
+    """
+    Scan assembled Chinese text for large English passages that were missed
+    during initial restatement, re-restate them via DeepSeek, and stitch back.
 
-        log(f"[补译] 块 {pi + 1} 完成  → {len(segs_out[start_i]):,} 字符")
+    Patches and their sub-chunks are restated concurrently on executor (or a
+    pool of max_workers created here) and stitched back in document order.
+    Text after the references/bibliography section header is left untouched.
+    Returns (fixed_text, number_of_patches_fixed).
+    """
+    log = _make_log(log_cb)
+
+    # Determine where to stop (references section)
+    ref_m = _REFERENCES_HEADER_RE.search(text)
+    cut_at = ref_m.start() if ref_m else len(text)
+    body, tail = text[:cut_at], text[cut_at:]
+
+    segs, patches = _find_english_patches(body, en_threshold, min_chars)
+    if not patches:
+        log("[补译] 未发现大段英文块，无需补译")
+        return text, 0
+
+    log(f"[补译] 发现 {len(patches)} 个英文块，并发补译...")
+    from concurrent.futures import ThreadPoolExecutor
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)))
+    try:
+        submitted = _submit_patches(
+            segs, patches, executor, glossary, client, model, max_patch_chars,
+            log_cb=log_cb, cancel_check=cancel_check, cache=cache,
+        )
+        segs_out, n_done = _stitch_patches(segs, submitted, log)
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
 
     fixed = "".join(segs_out) + tail
-    log(f"[补译] 全部补译完成，共修复 {len(patches)} 个块")
-    return fixed, len(patches)
+    log(f"[补译] 全部补译完成，共修复 {n_done} 个块")
+    return fixed, n_done
+
+
+def fix_untranslated_part_file(
+    part_path: str,
+    entries: List[Dict],
+    out_path: str,
+    glossary: str,
+    client: OpenAI,
+    model: str = "deepseek-chat",
+    en_threshold: float = 0.65,
+    min_chars: int = 100,
+    max_patch_chars: int = 4000,
+    log_cb: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    cache: Optional[TranslationCache] = None,
+    max_workers: int = 5,
+    executor=None,
+) -> int:
+    """
+    Streaming variant of fix_untranslated_blocks() over an OrderedPartWriter
+    part file: chunks are read back one at a time via the index, patched,
+    and written to out_path in order.  English patches are detected within
+    each chunk; chunks from the references section onward are copied as-is.
+
+    Patches of upcoming chunks are submitted to the pool while earlier chunks
+    are still being stitched, keeping at most ~2 × max_workers sub-chunks in
+    flight so only a small window of chunks is held in memory.
+
+    Returns the number of patches fixed.
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    log = _make_log(log_cb)
+    workers = max(1, int(max_workers))
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+    n_fixed = 0
+    in_refs = False
+    window = deque()  # (entry, segs, tail, submitted)
+    in_flight = [0]
+
+    def _flush_head(out):
+        nonlocal n_fixed
+        entry, segs, tail, submitted = window.popleft()
+        if submitted:
+            segs, n_done = _stitch_patches(segs, submitted, log, label=f"#{entry['idx'] + 1} ")
+            n_fixed += n_done
+            in_flight[0] -= sum(len(f) for _, _, f in submitted)
+        if entry["idx"] > 0:
+            out.write("\n\n")
+        out.write("".join(segs) + tail)
+
+    try:
+        with open(out_path, "w", encoding="utf-8") as out:
+            for entry, chunk in iter_part_chunks(part_path, entries):
+                if in_refs or entry["label"] == "__yaml__":
+                    window.append((entry, [chunk], "", []))
+                else:
+                    ref_m = _REFERENCES_HEADER_RE.search(chunk)
+                    if ref_m:
+                        in_refs = True
+                    cut_at = ref_m.start() if ref_m else len(chunk)
+                    body, tail = chunk[:cut_at], chunk[cut_at:]
+
+                    segs, patches = _find_english_patches(body, en_threshold, min_chars)
+                    submitted = []
+                    if patches and not (cancel_check and cancel_check()):
+                        log(f"[补译] 第 {entry['idx'] + 1} 块发现 {len(patches)} 个英文块")
+                        submitted = _submit_patches(
+                            segs, patches, executor, glossary, client, model, max_patch_chars,
+                            log_cb=log_cb, cancel_check=cancel_check, cache=cache,
+                        )
+                        in_flight[0] += sum(len(f) for _, _, f in submitted)
+                    window.append((entry, segs, tail, submitted))
+
+                # Write finished chunks in order; block on the head once the
+                # pool has enough queued work.
+                while window and (not window[0][3] or in_flight[0] > 2 * workers):
+                    _flush_head(out)
+            while window:
+                _flush_head(out)
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
+
+    if n_fixed:
+        log(f"[补译] 全部补译完成，共修复 {n_fixed} 个块")
+    else:
+        log("[补译] 未发现大段英文块，无需补译")
+    return n_fixed
 
 
 def _inject_cn_fields(yaml_chunk: str, stem: str) -> str:
@@ -754,35 +1351,24 @@ def _inject_cn_fields(yaml_chunk: str, stem: str) -> str:
 # Step 5b: Full pipeline — one PDF file
 # ---------------------------------------------------------------------------
 
-def translate_pdf_file(
+def extract_pdf_to_md(
     pdf_path: str,
-    out_dir: Optional[str] = None,
-    log_cb: Optional[Callable[[str], None]] = None,
-    cancel_check: Optional[Callable[[], bool]] = None,
-    model: str = "deepseek-chat",
-    max_chars: int = 5000,
     extraction_method: str = "PaddleOCR (远程API)",
-    max_workers: int = 5,
-) -> Tuple[str, str]:
+    log_cb: Optional[Callable[[str], None]] = None,
+) -> str:
     """
-    Extract PDF → MD, then restate.
+    Extract PDF → MD into <pdf_dir>/paddleocr_md/ and return the MD path.
 
     extraction_method options (matches Tab 2/3 labels):
       "PaddleOCR (远程API)"  — remote API with auto-fallback (default)
       "PaddleOCR (本地GPU)"  — force local GPU
       "Legacy (pdfplumber)"  — legacy pdfplumber
-
-    Returns (cn_md_path, glossary_path).
     """
-    def log(msg: str):
-        logger.info(msg)
-        if log_cb:
-            log_cb(msg)
+    log = _make_log(log_cb)
 
     log(f"[重述] PDF 提取（{extraction_method}）：{pdf_path}")
     from paddleocr_pipeline import extract_with_fallback, extract_pdf_legacy
 
-    stem = Path(pdf_path).stem
     pdf_out = os.path.join(os.path.dirname(pdf_path), "paddleocr_md")
     os.makedirs(pdf_out, exist_ok=True)
 
@@ -795,6 +1381,26 @@ def translate_pdf_file(
         md_path, _ = extract_with_fallback(pdf_path, out_dir=pdf_out)
 
     log(f"[重述] 提取完成：{md_path}")
+    return md_path
+
+
+def translate_pdf_file(
+    pdf_path: str,
+    out_dir: Optional[str] = None,
+    log_cb: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    model: str = "deepseek-chat",
+    max_chars: int = 5000,
+    extraction_method: str = "PaddleOCR (远程API)",
+    max_workers: int = 5,
+    glossary_mode: str = "full",
+) -> Tuple[str, str]:
+    """
+    Extract PDF → MD (see extract_pdf_to_md), then restate.
+
+    Returns (cn_md_path, glossary_path).
+    """
+    md_path = extract_pdf_to_md(pdf_path, extraction_method=extraction_method, log_cb=log_cb)
 
     return translate_md_file(
         md_path,
@@ -804,9 +1410,218 @@ def translate_pdf_file(
         model=model,
         max_chars=max_chars,
         max_workers=max_workers,
+        glossary_mode=glossary_mode,
     )
 
 
+# ---------------------------------------------------------------------------
+# Step 5c: Folder scheduler — many files, one concurrency budget
+# ---------------------------------------------------------------------------
+
+class _BudgetedSubmitter:
+    """submit() onto executor with every task wrapped by budgeted (see translate_folder)."""
+
+    def __init__(self, executor, budgeted):
+        self._executor = executor
+        self._budgeted = budgeted
+
+    def submit(self, fn, *args, **kwargs):
+        return self._executor.submit(self._budgeted(fn), *args, **kwargs)
+
+
+def translate_folder(
+    files: List[str],
+    log_cb: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    progress_cb: Optional[Callable[[str, Dict], None]] = None,
+    model: str = "deepseek-chat",
+    max_chars: int = 5000,
+    extraction_method: str = "PaddleOCR (远程API)",
+    max_workers: int = 5,
+    max_active_files: Optional[int] = None,
+    use_cache: bool = True,
+    use_term_store: bool = True,
+    glossary_mode: str = "full",
+) -> List[Dict]:
+    """
+    Restate many PDF / MD files on one shared budget of max_workers concurrent
+    DeepSeek calls.
+
+    Every stage of every file is a task on the same pool: extraction + Steps 1–4
+    (prepare), one task per chunk (Step 5) and Step 6 + save (finalize).  Up to
+    max_active_files files (default max_workers + 1) are in flight at once, so
+    the glossary / section detection of the next files run while the current
+    file is still restating, and chunks of short papers are interleaved instead
+    of leaving workers idle.
+
+    progress_cb(path, state) is called on every stage change with
+    state = {"stage": 排队/准备/重述/补译/完成/失败/已取消, "done": n, "total": m,
+             "elapsed": seconds, "error": str}.
+
+    Returns one dict per file (input order):
+        {"path", "status": "完成"/"失败"/"已取消", "cn_path", "glossary_path",
+         "error", "elapsed"}
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    log = _make_log(log_cb)
+    workers = max(1, int(max_workers))
+    active_limit = max(1, int(max_active_files or workers + 1))
+    client = _get_client()
+
+    results: List[Dict] = [
+        {"path": f, "status": "", "cn_path": None, "glossary_path": None, "error": "", "elapsed": 0.0}
+        for f in files
+    ]
+    started_at: Dict[int, float] = {}
+    lock = threading.Lock()
+    all_done = threading.Event()
+    state = {"next": 0, "remaining": len(files)}
+
+    if not files:
+        return results
+
+    def cancelled() -> bool:
+        return bool(cancel_check and cancel_check())
+
+    def report(i: int, stage: str, done: int = 0, total: int = 0, error: str = ""):
+        if progress_cb:
+            elapsed = time.time() - started_at.get(i, time.time())
+            progress_cb(files[i], {
+                "stage": stage, "done": done, "total": total, "elapsed": elapsed, "error": error,
+            })
+
+    def file_log(i: int) -> Callable[[str], None]:
+        prefix = f"[{i + 1}/{len(files)}] "
+
+        def _cb(msg: str):
+            if log_cb:
+                log_cb(prefix + msg.lstrip())
+        return _cb
+
+    def start_next():
+        with lock:
+            if state["next"] >= len(files):
+                return
+            i = state["next"]
+            state["next"] += 1
+        if cancelled():
+            finish(i, "已取消")
+            return
+        executor.submit(prepare_task, i)
+
+    def finish(i: int, status: str, cn_path=None, glossary_path=None, error: str = ""):
+        elapsed = time.time() - started_at.get(i, time.time())
+        results[i].update(status=status, cn_path=cn_path, glossary_path=glossary_path,
+                          error=error, elapsed=elapsed)
+        report(i, status, error=error)
+        with lock:
+            state["remaining"] -= 1
+            if state["remaining"] == 0:
+                all_done.set()
+        start_next()
+
+    # One budget of max_workers concurrent DeepSeek calls shared by both pools:
+    # prepare / chunk tasks and Step 6 patch restatements each hold a slot
+    # while they run.  Finalize tasks only wait on their patches and hold none.
+    budget = threading.BoundedSemaphore(workers)
+
+    def budgeted(fn):
+        def run(*args, **kwargs):
+            with budget:
+                return fn(*args, **kwargs)
+        return run
+
+    @budgeted
+    def prepare_task(i: int):
+        started_at[i] = time.time()
+        path = files[i]
+        report(i, "准备")
+        cb = file_log(i)
+        try:
+            md_path = path
+            if path.lower().endswith(".pdf"):
+                md_path = extract_pdf_to_md(path, extraction_method=extraction_method, log_cb=cb)
+            job = prepare_paper(
+                md_path, client, log_cb=cb, cancel_check=cancel_check,
+                model=model, max_chars=max_chars, use_cache=use_cache,
+                use_term_store=use_term_store, glossary_mode=glossary_mode,
+            )
+        except InterruptedError:
+            finish(i, "已取消")
+            return
+        except Exception as e:
+            cb(f"  ERROR: {e}")
+            finish(i, "失败", error=str(e))
+            return
+
+        total = len(job.chunks)
+        cb(f"[重述] Step 5/6  逐块重述（共 {total} 块，全局并发 {workers}）...")
+        report(i, "重述", 0, total)
+        if total == 0:
+            executor.submit(finalize_task, i, job)
+            return
+        for idx in range(total):
+            executor.submit(chunk_task, i, job, idx)
+
+    @budgeted
+    def chunk_task(i: int, job: PaperJob, idx: int):
+        try:
+            done = restate_job_chunk(
+                job, idx, client, model=model, log_cb=file_log(i), cancel_check=cancel_check,
+            )
+        except Exception as e:
+            with job.lock:
+                job.error = job.error or str(e)
+                job.completed += 1
+                done = job.completed
+        report(i, "重述", done, len(job.chunks))
+        if done == len(job.chunks):
+            executor.submit(finalize_task, i, job)
+
+    def finalize_task(i: int, job: PaperJob):
+        cb = file_log(i)
+        if job.error:
+            job.writer.close()
+            cb(f"  ERROR: {job.error}")
+            finish(i, "失败", error=job.error)
+            return
+        report(i, "补译", len(job.chunks), len(job.chunks))
+        try:
+            cn_path, glossary_path = finalize_paper(
+                job, client, model=model, log_cb=cb, cancel_check=cancel_check,
+                executor=patch_submitter,
+            )
+        except InterruptedError:
+            finish(i, "已取消")
+            return
+        except Exception as e:
+            cb(f"  ERROR: {e}")
+            finish(i, "失败", error=str(e))
+            return
+        finish(i, "完成", cn_path, glossary_path)
+
+    log(f"[重述] 批量模式：{len(files)} 个文件，全局并发 {workers}，同时处理 ≤ {active_limit} 个文件")
+    for i in range(len(files)):
+        report(i, "排队")
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    # Step 6 waits on its patch restatements, so they get their own pool
+    # instead of competing for (and possibly starving) the workers that are
+    # running the finalize tasks themselves; the shared budget still caps the
+    # total number of concurrent calls at workers.
+    patch_executor = ThreadPoolExecutor(max_workers=workers)
+    patch_submitter = _BudgetedSubmitter(patch_executor, budgeted)
+    try:
+        for _ in range(min(active_limit, len(files))):
+            start_next()
+        all_done.wait()
+    finally:
+        executor.shutdown(wait=True)
+        patch_executor.shutdown(wait=True)
+    return results
+
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------